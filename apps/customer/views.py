@@ -5,9 +5,10 @@ from django.utils import timezone
 from .models import Customer, TaskReminder
 from .serializers import CustomerSerializer, TaskReminderSerializer
 from apps.system.utils import ResponseWrapper
+from apps.system.conditional import ConditionalGetMixin
 from rest_framework.permissions import IsAuthenticated
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     """客户管理视图集"""
     queryset = Customer.objects.filter(is_deleted=False)
@@ -3,10 +3,11 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
+from apps.system.conditional import ConditionalGetMixin
 from .models import Equipment, MaintenanceRecord, FaultRecord
 from .serializers import EquipmentSerializer, MaintenanceRecordSerializer, FaultRecordSerializer
 
-class EquipmentViewSet(viewsets.ModelViewSet):
+class EquipmentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     设备管理视图集
     提供设备的增删改查功能
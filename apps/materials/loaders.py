@@ -0,0 +1,141 @@
+"""
+序列化器批量加载
+
+SerializerMethodField 中逐行执行的查询（如按物料查询供应商关联）在列表序列化时会产生
+N+1 查询。BatchLoader 在第一次取某个键时，收集同一页所有对象的键，用一次 IN 查询
+取回整页的结果并缓存，之后同一页的对象直接读取缓存：
+
+    class MaterialDetailSerializer(BatchLoaderMixin, serializers.ModelSerializer):
+        def get_suppliers(self, obj):
+            links = self.batch_load(obj, 'supplier_links', key=lambda o: o.pk, fetch=fetch_supplier_links)
+
+加载器保存在序列化器 context 中，同一次序列化（包括嵌套序列化器）共享。
+"""
+from collections import defaultdict
+
+from django.db.models import Prefetch
+
+from .models import MaterialSupplier
+
+# 视图集提供的 Prefetch 结果保存到这些属性（to_attr），序列化器优先读取
+SUPPLIER_LINKS_ATTR = 'prefetched_supplier_links'
+MATERIAL_LINKS_ATTR = 'prefetched_material_links'
+
+LOADERS_CONTEXT_KEY = '_batch_loaders'
+
+
+class BatchLoader:
+    """按键批量加载并缓存结果"""
+
+    def __init__(self, fetch, default=None):
+        """
+        Args:
+            fetch: fetch(keys) -> {key: value}，一次取回一批键的结果
+            default: 没有结果的键对应的值
+        """
+        self.fetch = fetch
+        self.default = default
+        self.cache = {}
+
+    def prime(self, keys):
+        """批量加载尚未缓存的键"""
+        missing = {key for key in keys if key is not None and key not in self.cache}
+        if not missing:
+            return
+        results = self.fetch(missing)
+        for key in missing:
+            self.cache[key] = results.get(key, self.default)
+
+    def load(self, key, siblings=()):
+        """
+        获取一个键的结果
+
+        Args:
+            key: 要获取的键
+            siblings: 同一批的其它键，未缓存时与 key 一起加载
+        """
+        if key is None:
+            return self.default
+        if key not in self.cache:
+            self.prime([key, *siblings])
+        return self.cache[key]
+
+
+class BatchLoaderMixin:
+    """为 SerializerMethodField 提供按页批量加载"""
+
+    def get_loader(self, name, fetch, default=None):
+        loaders = self.context.setdefault(LOADERS_CONTEXT_KEY, {})
+        if name not in loaders:
+            loaders[name] = BatchLoader(fetch, default)
+        return loaders[name]
+
+    def page_instances(self):
+        """当前正在序列化的一页对象，单个对象序列化时为空"""
+        parent = getattr(self, 'parent', None)
+        instances = getattr(parent, 'instance', None)
+        if instances is None or isinstance(instances, (dict, str, bytes)):
+            return ()
+        try:
+            return list(instances)
+        except TypeError:
+            return ()
+
+    def batch_load(self, obj, name, key, fetch, default=None):
+        """
+        获取 obj 对应的结果，同一页的对象用一次查询加载
+
+        Args:
+            obj: 当前对象
+            name: 加载器名称，同名加载器共享缓存
+            key: key(obj) -> 查询键
+            fetch: fetch(keys) -> {key: value}
+            default: 没有结果时的值
+        """
+        loader = self.get_loader(name, fetch, default)
+        own_key = key(obj)
+        if own_key in loader.cache:
+            return loader.cache[own_key]
+        return loader.load(own_key, (key(instance) for instance in self.page_instances()))
+
+
+def group_by(queryset, field):
+    """按字段值分组为 {值: [对象]}"""
+    groups = defaultdict(list)
+    for item in queryset:
+        groups[getattr(item, field)].append(item)
+    return groups
+
+
+def fetch_supplier_links(material_ids):
+    """按物料批量查询供应商关联"""
+    return group_by(
+        MaterialSupplier.objects.filter(material_id__in=material_ids).select_related('material', 'supplier'),
+        'material_id'
+    )
+
+
+def fetch_material_links(supplier_ids):
+    """按供应商批量查询物料关联"""
+    return group_by(
+        MaterialSupplier.objects.filter(supplier_id__in=supplier_ids).select_related('material'),
+        'supplier_id'
+    )
+
+
+def supplier_links_prefetch():
+    """物料详情使用的供应商关联预加载"""
+    return Prefetch(
+        'supplier_links',
+        queryset=MaterialSupplier.objects.select_related('material', 'supplier'),
+        to_attr=SUPPLIER_LINKS_ATTR
+    )
+
+
+def material_links_prefetch():
+    """供应商详情使用的物料关联预加载"""
+    return Prefetch(
+        'material_links',
+        queryset=MaterialSupplier.objects.select_related('material'),
+        to_attr=MATERIAL_LINKS_ATTR
+    )
@@ -5,6 +5,10 @@ from .models import (
     ProcurementRequirement, ProcurementOrder, ProcurementItem, StatusHistory
 )
 from apps.users.serializers import UserSerializer
+from .loaders import (
+    BatchLoaderMixin, SUPPLIER_LINKS_ATTR, MATERIAL_LINKS_ATTR,
+    fetch_supplier_links, fetch_material_links
+)
 
 
 class MaterialSerializer(serializers.ModelSerializer):
@@ -21,7 +25,7 @@ class MaterialSerializer(serializers.ModelSerializer):
         return obj.get_status_display()
 
 
-class MaterialDetailSerializer(serializers.ModelSerializer):
+class MaterialDetailSerializer(BatchLoaderMixin, serializers.ModelSerializer):
     """物料详情序列化器"""
     status_display = serializers.SerializerMethodField()
     suppliers = serializers.SerializerMethodField()
@@ -37,7 +41,11 @@ class MaterialDetailSerializer(serializers.ModelSerializer):
         return obj.get_status_display()
     
     def get_suppliers(self, obj):
-        material_suppliers = MaterialSupplier.objects.filter(material=obj)
+        # 优先使用视图集预加载的结果，否则按页批量查询
+        material_suppliers = getattr(obj, SUPPLIER_LINKS_ATTR, None)
+        if material_suppliers is None:
+            material_suppliers = self.batch_load(obj, 'supplier_links', key=lambda o: o.pk,
+                                                 fetch=fetch_supplier_links, default=[])
         return MaterialSupplierSerializer(material_suppliers, many=True).data
 
 
@@ -207,7 +215,7 @@ class SupplierSerializer(serializers.ModelSerializer):
         return obj.get_status_display()
 
 
-class SupplierDetailSerializer(serializers.ModelSerializer):
+class SupplierDetailSerializer(BatchLoaderMixin, serializers.ModelSerializer):
     """供应商详情序列化器"""
     status_display = serializers.SerializerMethodField()
     contacts = ContactSerializer(many=True, read_only=True)
@@ -225,7 +233,11 @@ class SupplierDetailSerializer(serializers.ModelSerializer):
         return obj.get_status_display()
     
     def get_materials(self, obj):
-        material_suppliers = MaterialSupplier.objects.filter(supplier=obj)
+        # 优先使用视图集预加载的结果，否则按页批量查询
+        material_suppliers = getattr(obj, MATERIAL_LINKS_ATTR, None)
+        if material_suppliers is None:
+            material_suppliers = self.batch_load(obj, 'material_links', key=lambda o: o.pk,
+                                                 fetch=fetch_material_links, default=[])
         result = []
         for ms in material_suppliers:
             result.append({
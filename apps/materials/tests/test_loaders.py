@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase, TestCase
+
+from apps.materials.loaders import BatchLoader, BatchLoaderMixin, supplier_links_prefetch
+from apps.materials.models import Material, MaterialSupplier, Supplier
+from apps.materials.serializers import MaterialDetailSerializer
+from apps.users.models import User
+
+
+class FakeSerializer(BatchLoaderMixin):
+    def __init__(self, context, page=None):
+        self.context = context
+        self.parent = type('Parent', (), {'instance': page})() if page is not None else None
+
+
+class BatchLoaderTests(SimpleTestCase):
+    """批量加载测试"""
+
+    def setUp(self):
+        self.calls = []
+
+    def fetch(self, keys):
+        self.calls.append(sorted(keys))
+        return {key: key * 10 for key in keys if key != 3}
+
+    def test_loads_siblings_in_one_batch(self):
+        loader = BatchLoader(self.fetch, default=-1)
+        self.assertEqual(loader.load(1, [1, 2, 3]), 10)
+        self.assertEqual(loader.load(2), 20)
+        self.assertEqual(loader.load(3), -1)
+        self.assertEqual(loader.load(None), -1)
+        self.assertEqual(self.calls, [[1, 2, 3]])
+
+    def test_mixin_batches_current_page(self):
+        page = [type('Obj', (), {'pk': pk})() for pk in (1, 2, 4)]
+        context = {}
+        first = FakeSerializer(context, page)
+        values = [first.batch_load(obj, 'numbers', key=lambda o: o.pk, fetch=self.fetch) for obj in page]
+        self.assertEqual(values, [10, 20, 40])
+        self.assertEqual(self.calls, [[1, 2, 4]])
+
+        # 同一 context 的其它序列化器共享缓存
+        other = FakeSerializer(context)
+        self.assertEqual(other.batch_load(page[0], 'numbers', key=lambda o: o.pk, fetch=self.fetch), 10)
+        self.assertEqual(len(self.calls), 1)
+
+
+class MaterialDetailQueryTests(TestCase):
+    """物料详情供应商关联的查询数"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='loader', password='loader-password')
+        supplier = Supplier.objects.create(
+            code='S1', name='面料厂', contact_person='张三', contact_phone='13800000000',
+            address='一号路', created_by=user
+        )
+        for n in range(5):
+            material = Material.objects.create(code=f'M{n}', name=f'面料{n}', category='面料', unit='米', created_by=user)
+            MaterialSupplier.objects.create(material=material, supplier=supplier, created_by=user)
+
+    def test_page_uses_one_batched_query(self):
+        materials = list(Material.objects.all())
+        with self.assertNumQueries(1):
+            data = MaterialDetailSerializer(materials, many=True).data
+        self.assertTrue(all(item['suppliers'][0]['supplier_name'] == '面料厂' for item in data))
+
+    def test_prefetched_links_are_used(self):
+        materials = list(Material.objects.prefetch_related(supplier_links_prefetch()))
+        with self.assertNumQueries(0):
+            data = MaterialDetailSerializer(materials, many=True).data
+        self.assertEqual(len(data[0]['suppliers']), 1)
@@ -4,6 +4,11 @@ from rest_framework.response import Response
 from django.db import transaction
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from apps.system.compiled_serializers import CompiledListMixin
+from apps.system.conditional import ConditionalGetMixin
+from apps.system.queryset_optimizer import OptimizedQuerysetMixin
+from apps.warehouse.models import Warehouse
+from .loaders import supplier_links_prefetch, material_links_prefetch
 from .models import (
     Material, Location, Inventory, InventoryTransaction,
     Supplier, MaterialSupplier, Contact, SupplierEvaluation,
@@ -19,7 +24,7 @@ from .serializers import (
 )
 
 
-class MaterialViewSet(viewsets.ModelViewSet):
+class MaterialViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     物料视图集
     提供物料的增删改查功能
@@ -27,18 +32,27 @@ class MaterialViewSet(viewsets.ModelViewSet):
     queryset = Material.objects.filter(is_deleted=False)
     serializer_class = MaterialSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # 详情包含供应商关联
+    conditional_models = (Material, MaterialSupplier, Supplier)
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return MaterialDetailSerializer
         return MaterialSerializer
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # 详情序列化器读取预加载的供应商关联
+        if self.get_serializer_class() is MaterialDetailSerializer:
+            queryset = queryset.prefetch_related(supplier_links_prefetch())
+        return queryset
+    
     def perform_destroy(self, instance):
         instance.is_deleted = True
         instance.save(update_fields=['is_deleted'])
 
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     库位视图集
     提供库位的增删改查功能
@@ -46,13 +60,15 @@ class LocationViewSet(viewsets.ModelViewSet):
     queryset = Location.objects.filter(is_deleted=False)
     serializer_class = LocationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # 输出仓库名称
+    conditional_models = (Location, Warehouse)
     
     def perform_destroy(self, instance):
         instance.is_deleted = True
         instance.save(update_fields=['is_deleted'])
 
 
-class InventoryViewSet(viewsets.ModelViewSet):
+class InventoryViewSet(CompiledListMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     库存视图集
     提供库存的增删改查功能
@@ -71,7 +87,7 @@ class InventoryViewSet(viewsets.ModelViewSet):
         instance.save(update_fields=['is_deleted'])
 
 
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     供应商视图集
     提供供应商的增删改查功能
@@ -79,18 +95,27 @@ class SupplierViewSet(viewsets.ModelViewSet):
     queryset = Supplier.objects.filter(is_deleted=False)
     serializer_class = SupplierSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # 详情包含联系人和物料关联
+    conditional_models = (Supplier, Contact, MaterialSupplier, Material)
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return SupplierDetailSerializer
         return SupplierSerializer
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # 详情序列化器读取预加载的物料关联
+        if self.get_serializer_class() is SupplierDetailSerializer:
+            queryset = queryset.prefetch_related(material_links_prefetch())
+        return queryset
+    
     def perform_destroy(self, instance):
         instance.is_deleted = True
         instance.save(update_fields=['is_deleted'])
 
 
-class ProcurementRequirementViewSet(viewsets.ModelViewSet):
+class ProcurementRequirementViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     采购需求视图集
     提供采购需求的增删改查功能
@@ -104,7 +129,7 @@ class ProcurementRequirementViewSet(viewsets.ModelViewSet):
         instance.save(update_fields=['is_deleted'])
 
 
-class ProcurementOrderViewSet(viewsets.ModelViewSet):
+class ProcurementOrderViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     采购订单视图集
     提供采购订单的增删改查功能
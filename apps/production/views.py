@@ -4,9 +4,10 @@ from rest_framework.response import Response
 from django.utils import timezone
 from .models import Order, ProductionPlan, CuttingTask, ProductionException, Batch
 from .serializers import OrderSerializer, ProductionPlanSerializer, CuttingTaskSerializer, ProductionExceptionSerializer, BatchSerializer
+from apps.system.queryset_optimizer import OptimizedQuerysetMixin
 from apps.system.utils import ResponseWrapper
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """订单管理视图集"""
     queryset = Order.objects.filter(is_deleted=False)
     serializer_class = OrderSerializer
@@ -87,7 +88,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return ResponseWrapper.error(str(e))
 
-class ProductionPlanViewSet(viewsets.ModelViewSet):
+class ProductionPlanViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """生产计划视图集"""
     queryset = ProductionPlan.objects.filter(is_deleted=False)
     serializer_class = ProductionPlanSerializer
@@ -118,7 +119,7 @@ class ProductionPlanViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return ResponseWrapper.error(str(e))
 
-class CuttingTaskViewSet(viewsets.ModelViewSet):
+class CuttingTaskViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """裁剪任务视图集"""
     queryset = CuttingTask.objects.filter(is_deleted=False)
     serializer_class = CuttingTaskSerializer
@@ -158,7 +159,7 @@ class CuttingTaskViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return ResponseWrapper.error(str(e))
 
-class ProductionExceptionViewSet(viewsets.ModelViewSet):
+class ProductionExceptionViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """生产异常视图集"""
     queryset = ProductionException.objects.filter(is_deleted=False)
     serializer_class = ProductionExceptionSerializer
@@ -185,7 +186,7 @@ class ProductionExceptionViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return ResponseWrapper.error(str(e))
 
-class BatchViewSet(viewsets.ModelViewSet):
+class BatchViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """生产批次视图集"""
     queryset = Batch.objects.filter(is_deleted=False)
     serializer_class = BatchSerializer
@@ -74,6 +74,10 @@ class ScanningHistory(BaseModel):
         verbose_name = '扫码历史'
         verbose_name_plural = verbose_name
         ordering = ['-created_at']
+        indexes = [
+            # 游标分页排序
+            models.Index(fields=['-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.barcode.barcode_number}-{self.operation_type}"
@@ -16,9 +16,12 @@ from .serializers import (
 )
 from apps.materials.models import Material, Location, InventoryTransaction, Inventory
 from apps.production.models import Order
+from apps.system.compiled_serializers import CompiledListMixin
+from apps.system.pagination import CountFreeCursorPagination
+from apps.system.queryset_optimizer import OptimizedQuerysetMixin
 # 已移除ResponseWrapper导入，使用标准的Response
 
-class BarcodeViewSet(viewsets.ModelViewSet):
+class BarcodeViewSet(CompiledListMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     条码视图集
     提供条码的CRUD操作和自定义操作
@@ -616,13 +619,15 @@ class ScanningViewSet(viewsets.ViewSet):
             'quantity': quantity
         })
 
-class ScanningHistoryViewSet(viewsets.ReadOnlyModelViewSet):
+class ScanningHistoryViewSet(CompiledListMixin, OptimizedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     """
     扫码历史视图集
     提供扫码历史的查询操作
     """
     queryset = ScanningHistory.objects.all()
     serializer_class = ScanningHistorySerializer
+    pagination_class = CountFreeCursorPagination
+    ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -662,12 +667,8 @@ class ScanningHistoryViewSet(viewsets.ReadOnlyModelViewSet):
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            return Response({
-                'count': self.paginator.page.paginator.count,
-                'next': self.paginator.get_next_link(),
-                'previous': self.paginator.get_previous_link(),
-                'results': serializer.data
-            })
+            # 游标分页不再有 page.paginator，总数和翻页链接由分页器给出
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
         
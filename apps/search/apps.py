@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class SearchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.search'
+    verbose_name = '全局搜索'
+    
+    def ready(self):
+        """应用就绪时执行的操作"""
+        # 导入信号处理器，用于分面计数缓存失效
+        from . import signals
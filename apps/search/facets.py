@@ -0,0 +1,146 @@
+"""
+搜索分面计数缓存
+
+全局搜索的分面徽标只需要各类型的大致数量，短而宽泛的关键词会让逐类型的
+count() 成为响应时间的主要部分。这里按规范化关键词和类型集合缓存计数，
+通过版本号失效（相关模型保存/删除时递增），超过阈值时返回近似计数。
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.SEARCH_FACETS 覆盖
+DEFAULT_FACET_SETTINGS = {
+    'CACHE_TTL': 60,           # 计数缓存有效期（秒）
+    'APPROX_THRESHOLD': 1000,  # 超过该数量时返回近似计数
+    'APPROX_MODE': 'capped',   # capped: 返回 "1000+"；planner: 使用数据库执行计划估算
+}
+
+VERSION_KEY = 'search:facets:version'
+
+
+def get_facet_settings():
+    """获取分面计数配置"""
+    config = dict(DEFAULT_FACET_SETTINGS)
+    config.update(getattr(settings, 'SEARCH_FACETS', {}))
+    return config
+
+
+def normalize_keyword(keyword):
+    """规范化关键词：去除首尾空白、合并连续空白并转为小写"""
+    return ' '.join(keyword.split()).lower()
+
+
+def get_version():
+    """获取当前分面计数版本号"""
+    try:
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, 1, None)
+            version = cache.get(VERSION_KEY, 1)
+        return version
+    except Exception as e:
+        logger.warning(f'读取搜索分面版本号失败: {str(e)}')
+        return None
+
+
+def bump_version():
+    """递增版本号，使所有已缓存的分面计数失效"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # 版本号尚不存在
+        cache.add(VERSION_KEY, 1, None)
+    except Exception as e:
+        logger.warning(f'更新搜索分面版本号失败: {str(e)}')
+
+
+def make_cache_key(keyword, types, version):
+    """根据规范化关键词、类型集合和版本号生成缓存键"""
+    raw = json.dumps([normalize_keyword(keyword), sorted(types)], ensure_ascii=False)
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'search:facets:{version}:{digest}'
+
+
+def estimate_count(queryset):
+    """使用 PostgreSQL 执行计划中的行数估算，失败时返回 None"""
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    try:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.debug(f'获取执行计划估算行数失败: {str(e)}')
+        return None
+
+
+def count_queryset(queryset, threshold, mode='capped'):
+    """
+    计算查询集数量，超过阈值时返回近似值
+
+    Returns:
+        (count, approximate) 元组
+    """
+    # 只统计到 threshold + 1 行，避免对宽泛关键词做全量 COUNT(*)
+    capped = queryset.order_by().values('pk')[:threshold + 1].count()
+    if capped <= threshold:
+        return capped, False
+
+    if mode == 'planner':
+        estimated = estimate_count(queryset)
+        if estimated is not None and estimated > threshold:
+            return estimated, True
+
+    return threshold, True
+
+
+def format_facet(count, approximate):
+    """格式化分面计数，近似值显示为 "1000+" 的形式"""
+    if approximate:
+        return f'{count}+'
+    return count
+
+
+def get_facet_counts(keyword, querysets):
+    """
+    获取各搜索类型的分面计数
+
+    Args:
+        keyword: 搜索关键词
+        querysets: {类型: 查询集} 字典
+
+    Returns:
+        {类型: {'count': int, 'approximate': bool}} 字典
+    """
+    config = get_facet_settings()
+    version = get_version()
+    cache_key = make_cache_key(keyword, querysets.keys(), version) if version is not None else None
+
+    if cache_key:
+        try:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.warning(f'读取搜索分面缓存失败: {str(e)}')
+
+    counts = {}
+    for search_type, queryset in querysets.items():
+        count, approximate = count_queryset(
+            queryset, config['APPROX_THRESHOLD'], config['APPROX_MODE']
+        )
+        counts[search_type] = {'count': count, 'approximate': approximate}
+
+    if cache_key:
+        try:
+            cache.set(cache_key, counts, config['CACHE_TTL'])
+        except Exception as e:
+            logger.warning(f'写入搜索分面缓存失败: {str(e)}')
+
+    return counts
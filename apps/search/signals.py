@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+
+from apps.customer.models import Customer
+from apps.supplier.models import Supplier
+from apps.production.models import Order
+from apps.materials.models import Inventory, Material
+from .facets import bump_version
+
+# 参与全局搜索的模型，数据变更时使分面计数缓存失效
+SEARCHABLE_MODELS = (Customer, Supplier, Order, Inventory, Material)
+
+
+def invalidate_facet_counts(sender, **kwargs):
+    """搜索相关数据变更时递增分面计数版本号"""
+    bump_version()
+
+
+for model in SEARCHABLE_MODELS:
+    post_save.connect(invalidate_facet_counts, sender=model, dispatch_uid=f'search_facets_save_{model.__name__}')
+    post_delete.connect(invalidate_facet_counts, sender=model, dispatch_uid=f'search_facets_delete_{model.__name__}')
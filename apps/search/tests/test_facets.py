@@ -0,0 +1,51 @@
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from apps.customer.models import Customer
+from apps.search.facets import (
+    normalize_keyword, make_cache_key, format_facet, get_facet_counts,
+    get_version, bump_version
+)
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, SEARCH_FACETS={'APPROX_THRESHOLD': 2})
+class FacetCountTests(TestCase):
+    """搜索分面计数缓存测试类"""
+    
+    def setUp(self):
+        cache.clear()
+    
+    def test_normalize_keyword(self):
+        """关键词规范化"""
+        self.assertEqual(normalize_keyword('  Red   Shirt '), 'red shirt')
+    
+    def test_cache_key_ignores_type_order_and_case(self):
+        """缓存键与类型顺序和关键词大小写无关"""
+        key1 = make_cache_key('Shirt', ['order', 'customer'], 1)
+        key2 = make_cache_key(' shirt', ['customer', 'order'], 1)
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, make_cache_key('shirt', ['customer', 'order'], 2))
+    
+    def test_format_facet(self):
+        """近似计数显示为 N+"""
+        self.assertEqual(format_facet(12, False), 12)
+        self.assertEqual(format_facet(1000, True), '1000+')
+    
+    def test_counts_are_cached(self):
+        """相同关键词和类型集合的计数命中缓存"""
+        querysets = {'customer': Customer.objects.filter(name__icontains='a')}
+        get_facet_counts('a', querysets)
+        with self.assertNumQueries(0):
+            counts = get_facet_counts(' A ', querysets)
+        self.assertEqual(counts['customer'], {'count': 0, 'approximate': False})
+    
+    def test_bump_version_invalidates(self):
+        """版本号递增后缓存失效"""
+        version = get_version()
+        bump_version()
+        self.assertEqual(get_version(), version + 1)
@@ -8,6 +8,7 @@ from apps.supplier.models import Supplier
 from apps.production.models import Order, ProductionPlan
 from apps.materials.models import Inventory
 from apps.materials.models import Material
+from .facets import get_facet_counts, format_facet
 
 class SearchView(APIView):
     """
@@ -28,113 +29,106 @@ class SearchView(APIView):
         results = []
         facets = {}
         total = 0
+        approximate = False
         
-        # 搜索客户
+        # 构建各类型的查询集
+        querysets = {}
         if not types or 'customer' in types:
-            customers = Customer.objects.filter(
+            querysets['customer'] = Customer.objects.filter(
                 Q(name__icontains=keyword) | 
                 Q(contact_person__icontains=keyword) | 
                 Q(phone__icontains=keyword)
             )
-            customer_count = customers.count()
-            if customer_count > 0:
-                facets['customer'] = customer_count
-                total += customer_count
-                if not types or 'customer' in types:
-                    for customer in customers[(page-1)*page_size:page*page_size]:
-                        results.append({
-                            'id': customer.id,
-                            'type': 'customer',
-                            'title': customer.name,
-                            'description': f'联系人: {customer.contact_person}, 电话: {customer.phone}',
-                            'url': f'/customer/detail/{customer.id}'
-                        })
-        
-        # 搜索供应商
         if not types or 'supplier' in types:
-            suppliers = Supplier.objects.filter(
+            querysets['supplier'] = Supplier.objects.filter(
                 Q(name__icontains=keyword) | 
                 Q(contact_person__icontains=keyword) | 
                 Q(phone__icontains=keyword)
             )
-            supplier_count = suppliers.count()
-            if supplier_count > 0:
-                facets['supplier'] = supplier_count
-                total += supplier_count
-                if not types or 'supplier' in types:
-                    for supplier in suppliers[(page-1)*page_size:page*page_size]:
-                        results.append({
-                            'id': supplier.id,
-                            'type': 'supplier',
-                            'title': supplier.name,
-                            'description': f'联系人: {supplier.contact_person}, 电话: {supplier.phone}',
-                            'url': f'/supplier/detail/{supplier.id}'
-                        })
-        
-        # 搜索订单
         if not types or 'order' in types:
-            orders = Order.objects.filter(
+            querysets['order'] = Order.objects.filter(
                 Q(order_number__icontains=keyword) | 
                 Q(product_name__icontains=keyword)
             )
-            order_count = orders.count()
-            if order_count > 0:
-                facets['order'] = order_count
-                total += order_count
-                if not types or 'order' in types:
-                    for order in orders[(page-1)*page_size:page*page_size]:
-                        results.append({
-                            'id': order.id,
-                            'type': 'order',
-                            'title': f'订单 {order.order_number}',
-                            'description': f'产品: {order.product_name}, 数量: {order.quantity}',
-                            'url': f'/production/order/detail/{order.id}'
-                        })
-        
-        # 搜索库存
         if not types or 'inventory' in types:
-            inventories = Inventory.objects.filter(
+            querysets['inventory'] = Inventory.objects.filter(
                 Q(item_name__icontains=keyword) | 
                 Q(item_code__icontains=keyword)
             )
-            inventory_count = inventories.count()
-            if inventory_count > 0:
-                facets['inventory'] = inventory_count
-                total += inventory_count
-                if not types or 'inventory' in types:
-                    for inventory in inventories[(page-1)*page_size:page*page_size]:
-                        results.append({
-                            'id': inventory.id,
-                            'type': 'inventory',
-                            'title': inventory.item_name,
-                            'description': f'编码: {inventory.item_code}, 数量: {inventory.quantity}',
-                            'url': f'/warehouse/inventory/detail/{inventory.id}'
-                        })
-        
-        # 搜索物料
         if not types or 'material' in types:
-            materials = Material.objects.filter(
+            querysets['material'] = Material.objects.filter(
                 Q(name__icontains=keyword) | 
                 Q(code__icontains=keyword)
             )
-            material_count = materials.count()
-            if material_count > 0:
-                facets['material'] = material_count
-                total += material_count
-                if not types or 'material' in types:
-                    for material in materials[(page-1)*page_size:page*page_size]:
-                        results.append({
-                            'id': material.id,
-                            'type': 'material',
-                            'title': material.name,
-                            'description': f'编码: {material.code}',
-                            'url': f'/materials/detail/{material.id}'
-                        })
+        
+        # 分面计数（带缓存，超过阈值时为近似值）
+        facet_counts = get_facet_counts(keyword, querysets)
+        for search_type, facet in facet_counts.items():
+            if facet['count'] > 0:
+                facets[search_type] = format_facet(facet['count'], facet['approximate'])
+                total += facet['count']
+                approximate = approximate or facet['approximate']
+        
+        # 搜索客户
+        if facet_counts.get('customer', {}).get('count'):
+            for customer in querysets['customer'][(page-1)*page_size:page*page_size]:
+                results.append({
+                    'id': customer.id,
+                    'type': 'customer',
+                    'title': customer.name,
+                    'description': f'联系人: {customer.contact_person}, 电话: {customer.phone}',
+                    'url': f'/customer/detail/{customer.id}'
+                })
+        
+        # 搜索供应商
+        if facet_counts.get('supplier', {}).get('count'):
+            for supplier in querysets['supplier'][(page-1)*page_size:page*page_size]:
+                results.append({
+                    'id': supplier.id,
+                    'type': 'supplier',
+                    'title': supplier.name,
+                    'description': f'联系人: {supplier.contact_person}, 电话: {supplier.phone}',
+                    'url': f'/supplier/detail/{supplier.id}'
+                })
+        
+        # 搜索订单
+        if facet_counts.get('order', {}).get('count'):
+            for order in querysets['order'][(page-1)*page_size:page*page_size]:
+                results.append({
+                    'id': order.id,
+                    'type': 'order',
+                    'title': f'订单 {order.order_number}',
+                    'description': f'产品: {order.product_name}, 数量: {order.quantity}',
+                    'url': f'/production/order/detail/{order.id}'
+                })
+        
+        # 搜索库存
+        if facet_counts.get('inventory', {}).get('count'):
+            for inventory in querysets['inventory'][(page-1)*page_size:page*page_size]:
+                results.append({
+                    'id': inventory.id,
+                    'type': 'inventory',
+                    'title': inventory.item_name,
+                    'description': f'编码: {inventory.item_code}, 数量: {inventory.quantity}',
+                    'url': f'/warehouse/inventory/detail/{inventory.id}'
+                })
+        
+        # 搜索物料
+        if facet_counts.get('material', {}).get('count'):
+            for material in querysets['material'][(page-1)*page_size:page*page_size]:
+                results.append({
+                    'id': material.id,
+                    'type': 'material',
+                    'title': material.name,
+                    'description': f'编码: {material.code}',
+                    'url': f'/materials/detail/{material.id}'
+                })
         
         return ResponseWrapper.success({
             'items': results,
             'total': total,
-            'facets': facets
+            'facets': facets,
+            'approximate': approximate
         })
 
 class SearchSuggestionView(APIView):
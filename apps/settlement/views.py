@@ -23,9 +23,10 @@ from .serializers import (
     ApprovalActionSerializer as SettlementApprovalSerializer, 
     PaymentSerializer as SettlementPaymentSerializer
 )
+from apps.system.queryset_optimizer import OptimizedQuerysetMixin
 from apps.system.utils import ResponseWrapper
 
-class SettlementViewSet(viewsets.ModelViewSet):
+class SettlementViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     结算单视图集
     提供结算单的CRUD操作和自定义操作
@@ -280,7 +281,7 @@ class SettlementViewSet(viewsets.ModelViewSet):
             'message': f'成功删除 {len(ids)} 个结算单'
         })
         
-class FactoryViewSet(viewsets.ModelViewSet):
+class FactoryViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     工厂视图集
     提供工厂的CRUD操作和自定义操作
@@ -423,7 +424,7 @@ class FactoryViewSet(viewsets.ModelViewSet):
         serializer = SettlementListSerializer(settlements, many=True)
         return Response(serializer.data)
 
-class ReconciliationViewSet(viewsets.ModelViewSet):
+class ReconciliationViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     对账单视图集
     提供对账单的CRUD操作和自定义操作
@@ -459,20 +460,20 @@ class ReconciliationViewSet(viewsets.ModelViewSet):
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            return ResponseWrapper(
+            return ResponseWrapper.success(
                 data={
                     'items': serializer.data,
                     'total': self.paginator.page.paginator.count
                 },
-                msg="获取对账单列表成功"
+                message="获取对账单列表成功"
             )
         serializer = self.get_serializer(queryset, many=True)
-        return ResponseWrapper(
+        return ResponseWrapper.success(
             data={
                 'items': serializer.data,
                 'total': len(serializer.data)
             },
-            msg="获取对账单列表成功"
+            message="获取对账单列表成功"
         )
     
     def retrieve(self, request, *args, **kwargs):
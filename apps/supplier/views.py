@@ -5,8 +5,9 @@ from django.utils import timezone
 from .models import Supplier, SupplierPerformance, SupplierContract
 from .serializers import SupplierSerializer, SupplierPerformanceSerializer, SupplierContractSerializer
 from apps.system.utils import ResponseWrapper
+from apps.system.conditional import ConditionalGetMixin
 
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """供应商管理视图集"""
     queryset = Supplier.objects.filter(is_deleted=False)
     serializer_class = SupplierSerializer
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+
+
+class SystemConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.system'
+    verbose_name = '系统管理'
+    
+    def ready(self):
+        """应用就绪时执行的操作"""
+        # 安装链路追踪钩子（Web 进程和 Celery worker 都会执行）
+        from . import tracing
+        tracing.install()
+        # 基础数据变更时递增版本号，用于 ETag / Last-Modified
+        from . import conditional
+        conditional.connect_signals()
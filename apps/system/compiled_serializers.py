@@ -0,0 +1,346 @@
+"""
+编译序列化器
+
+对列表接口按需启用（只读）：把 ModelSerializer 的字段集合编译为一个 values_list() 投影
+和一个生成的 row -> dict 函数，跳过模型实例化和逐字段的 get_attribute/to_representation 调度。
+
+- 普通字段按 source 路径投影（supplier.name -> supplier__name），字符串、整数、布尔等类型直接输出，
+  日期、Decimal 等类型调用原字段的 to_representation，输出与 DRF 一致；
+- source='get_xxx_display' 在编译时生成选项映射；
+- 只输出主键的关联字段直接投影外键列；
+- SerializerMethodField 调用原方法，传入按方法中 obj.xxx 属性链构造的轻量行对象，
+  如 obj.material.name if obj.material else '' 只投影 material 外键和 material__name。
+
+不支持的字段（嵌套序列化器、多对多、方法中使用 context 或整体使用 obj 等）在编译时报错，
+启用了编译的视图集会记录警告并退回普通序列化器。
+
+用法:
+    class InventoryViewSet(CompiledListMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
+        ...
+"""
+import inspect
+import logging
+import threading
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.query import ModelIterable
+from django.utils.encoding import force_str
+from rest_framework import serializers
+from rest_framework.pagination import CursorPagination
+from rest_framework.relations import RelatedField
+
+from .queryset_optimizer import DISPLAY_METHOD_RE, MAX_CACHED_PLANS, get_model_field, method_attribute_chains
+from .sparse_fieldsets import SparseFieldsetMixin, prune_serializer
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.COMPILED_SERIALIZERS 覆盖
+DEFAULT_COMPILED_SERIALIZER_SETTINGS = {
+    'ENABLED': True,
+}
+
+# 这些字段的 to_representation 对数据库取出的值不做转换，直接输出
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.EmailField, serializers.SlugField, serializers.URLField,
+    serializers.IntegerField, serializers.BooleanField, serializers.ReadOnlyField,
+)
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_settings():
+    """获取编译序列化器配置"""
+    config = dict(DEFAULT_COMPILED_SERIALIZER_SETTINGS)
+    config.update(getattr(settings, 'COMPILED_SERIALIZERS', {}))
+    return config
+
+
+class CompilationError(ValueError):
+    """序列化器包含无法编译的字段"""
+
+
+class RowProxy:
+    """SerializerMethodField 使用的轻量行对象"""
+
+
+def display_method(field_name, choices):
+    def get_display(self):
+        value = getattr(self, field_name)
+        return choices.get(value, value)
+    return get_display
+
+
+def field_choices(model_field):
+    return {value: force_str(label, strings_only=True) for value, label in model_field.flatchoices}
+
+
+class ProxyNode:
+    """行对象中的一层模型"""
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = {}        # 属性名 -> 列序号
+        self.children = {}       # 关联名 -> (ProxyNode, 外键列序号)
+        self.displays = {}       # get_xxx_display -> 字段名
+
+
+class CompiledSerializer:
+    """编译后的只读序列化器"""
+
+    def __init__(self, serializer_class, fields=None):
+        meta = getattr(serializer_class, 'Meta', None)
+        if not issubclass(serializer_class, serializers.ModelSerializer) or getattr(meta, 'model', None) is None:
+            raise CompilationError(f'{serializer_class.__name__} 不是 ModelSerializer')
+        self.serializer_class = serializer_class
+        self.model = meta.model
+        self.serializer = serializer_class()
+        if fields is not None:
+            prune_serializer(self.serializer, fields)
+        self.lookups = []
+        self._positions = {}
+        self._namespace = {'RowProxy': RowProxy}
+        self._proxy = ProxyNode(self.model)
+        self._uses_proxy = False
+        self.row_to_dict = self._compile()
+
+    def column(self, lookup):
+        """登记投影列，返回列序号"""
+        if lookup not in self._positions:
+            self._positions[lookup] = len(self.lookups)
+            self.lookups.append(lookup)
+        return self._positions[lookup]
+
+    def _bind(self, value, prefix):
+        name = f'_{prefix}{len(self._namespace)}'
+        self._namespace[name] = value
+        return name
+
+    def _resolve_source(self, field_name, source_attrs):
+        """
+        把 source 路径解析为投影列
+
+        Returns:
+            (列序号, 选项映射或 None)
+        """
+        model = self.model
+        path = []
+        for index, name in enumerate(source_attrs):
+            last = index == len(source_attrs) - 1
+            model_field = get_model_field(model, name)
+            if model_field is None:
+                display = DISPLAY_METHOD_RE.fullmatch(name)
+                display_field = get_model_field(model, display.group(1)) if display and last else None
+                if display_field is not None and display_field.concrete:
+                    return self.column('__'.join(path + [display_field.name])), field_choices(display_field)
+                if name == 'pk' and last:
+                    return self.column('__'.join(path + [model._meta.pk.name])), None
+                raise CompilationError(f'字段 {field_name} 的 source 无法投影: {".".join(source_attrs)}')
+            if not model_field.is_relation:
+                if not last:
+                    raise CompilationError(f'字段 {field_name} 的 source 无法投影: {".".join(source_attrs)}')
+                return self.column('__'.join(path + [model_field.name])), None
+            if not (model_field.concrete and (model_field.many_to_one or model_field.one_to_one)):
+                raise CompilationError(f'字段 {field_name} 引用了多值关联: {name}')
+            if last:
+                raise CompilationError(f'字段 {field_name} 输出关联对象: {name}')
+            path.append(model_field.name)
+            model = model_field.related_model
+        raise CompilationError(f'字段 {field_name} 的 source 为空')
+
+    def _register_chain(self, field_name, chain):
+        """把方法中的属性链登记到行对象"""
+        node = self._proxy
+        path = []
+        for name in chain:
+            model_field = get_model_field(node.model, name)
+            if model_field is None:
+                display = DISPLAY_METHOD_RE.fullmatch(name)
+                display_field = get_model_field(node.model, display.group(1)) if display else None
+                if display_field is not None and display_field.concrete:
+                    node.columns[display_field.name] = self.column('__'.join(path + [display_field.name]))
+                    node.displays[name] = (display_field.name, field_choices(display_field))
+                    return
+                if name == 'pk':
+                    node.columns['pk'] = self.column('__'.join(path + [node.model._meta.pk.name]))
+                    return
+                raise CompilationError(f'方法字段 {field_name} 访问了无法投影的属性: {name}')
+            if not model_field.is_relation or (model_field.concrete and name == model_field.attname):
+                node.columns[name] = self.column('__'.join(path + [model_field.name]))
+                return
+            if not (model_field.concrete and (model_field.many_to_one or model_field.one_to_one)):
+                raise CompilationError(f'方法字段 {field_name} 访问了多值关联: {name}')
+            path.append(model_field.name)
+            if name not in node.children:
+                node.children[name] = (ProxyNode(model_field.related_model), self.column('__'.join(path)))
+            node = node.children[name][0]
+
+    def _compile_field(self, field_name, field):
+        """生成单个字段的输出表达式"""
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(self.serializer, field.method_name)
+            try:
+                uses_context = 'context' in inspect.getsource(method)
+            except (OSError, TypeError):
+                uses_context = True
+            chains = method_attribute_chains(method)
+            if uses_context or chains is None:
+                raise CompilationError(f'方法字段 {field_name} 无法编译')
+            for chain, _ in chains:
+                self._register_chain(field_name, chain)
+            self._uses_proxy = True
+            return f'{self._bind(method, "m")}(obj)'
+
+        if isinstance(field, serializers.BaseSerializer):
+            raise CompilationError(f'不支持嵌套序列化器: {field_name}')
+        source_attrs = list(field.source_attrs)
+        if isinstance(field, RelatedField):
+            if not field.use_pk_only_optimization() or len(source_attrs) != 1 or getattr(field, 'pk_field', None):
+                raise CompilationError(f'不支持的关联字段: {field_name}')
+            model_field = get_model_field(self.model, source_attrs[0])
+            if model_field is None or not model_field.concrete or not (model_field.many_to_one or model_field.one_to_one):
+                raise CompilationError(f'不支持的关联字段: {field_name}')
+            if not model_field.target_field.primary_key:
+                raise CompilationError(f'外键未指向主键: {field_name}')
+            return f'row[{self.column(model_field.name)}]'
+        if not source_attrs:
+            raise CompilationError(f"不支持 source='*': {field_name}")
+
+        index, choices = self._resolve_source(field_name, source_attrs)
+        value = f'row[{index}]'
+        if choices is not None:
+            return f'{self._bind(choices, "choices")}.get({value}, {value})'
+        if type(field) in PASSTHROUGH_FIELDS:
+            return value
+        converter = self._bind(field.to_representation, 'c')
+        return f'({converter}({value}) if {value} is not None else None)'
+
+    def _emit_proxy(self, node, var, indent, lines):
+        """生成构造行对象的代码"""
+        attrs = {name: display_method(*spec) for name, spec in node.displays.items()}
+        proxy_class = self._bind(type(f'{node.model.__name__}Row', (RowProxy,), attrs), 'Row')
+        lines.append(f'{indent}{var} = {proxy_class}()')
+        for name, index in node.columns.items():
+            lines.append(f'{indent}{var}.{name} = row[{index}]')
+        for name, (child, fk_index) in node.children.items():
+            child_var = f'{var}_{name}'
+            lines.append(f'{indent}if row[{fk_index}] is None:')
+            lines.append(f'{indent}    {var}.{name} = None')
+            lines.append(f'{indent}else:')
+            self._emit_proxy(child, child_var, indent + '    ', lines)
+            lines.append(f'{indent}    {var}.{name} = {child_var}')
+
+    def _compile(self):
+        items = []
+        for field_name, field in self.serializer.fields.items():
+            if field.write_only:
+                continue
+            items.append(f'{field_name!r}: {self._compile_field(field_name, field)}')
+        if not self.lookups:
+            # 稀疏字段集可能裁剪掉全部字段，values_list() 无参数时会查询所有列
+            self.column(self.model._meta.pk.name)
+
+        lines = ['def row_to_dict(row):']
+        if self._uses_proxy:
+            self._emit_proxy(self._proxy, 'obj', '    ', lines)
+        lines.append('    return {' + ', '.join(items) + '}')
+        self.source = '\n'.join(lines)
+        exec(compile(self.source, f'<compiled {self.serializer_class.__name__}>', 'exec'), self._namespace)
+        return self._namespace['row_to_dict']
+
+    def prepare(self, queryset, extra=()):
+        """
+        把模型查询集转换为投影查询集
+
+        Args:
+            extra: 额外投影的列（如游标分页的排序字段），此时返回具名元组，可按属性读取
+        """
+        if not extra:
+            return queryset.prefetch_related(None).values_list(*self.lookups)
+        lookups = self.lookups + [lookup for lookup in dict.fromkeys(extra) if lookup not in self._positions]
+        return queryset.prefetch_related(None).values_list(*lookups, named=True)
+
+    def serialize_rows(self, rows):
+        row_to_dict = self.row_to_dict
+        return [row_to_dict(row) for row in rows]
+
+    def serialize(self, queryset):
+        return self.serialize_rows(self.prepare(queryset))
+
+
+def get_compiled(serializer_class, fields=None):
+    """获取编译后的序列化器（按类和字段集合缓存），无法编译时返回 None"""
+    key = serializer_class if fields is None else (serializer_class, frozenset(fields))
+    try:
+        return _compiled[key]
+    except KeyError:
+        pass
+    with _compiled_lock:
+        if key in _compiled:
+            return _compiled[key]
+        try:
+            compiled = CompiledSerializer(serializer_class, fields)
+        except CompilationError as e:
+            logger.warning(f'序列化器 {serializer_class.__name__} 无法编译，使用普通序列化: {str(e)}')
+            compiled = None
+        if fields is None or len(_compiled) < MAX_CACHED_PLANS:
+            _compiled[key] = compiled
+        return compiled
+
+
+class CompiledRows(list):
+    """分页后的投影行"""
+
+    def __init__(self, rows, compiled):
+        super().__init__(rows)
+        self.compiled = compiled
+
+
+class CompiledResult:
+    """与序列化器一样通过 .data 取得输出"""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class CompiledListMixin(SparseFieldsetMixin):
+    """
+    列表接口使用编译序列化器
+
+    覆盖了 list() 的视图集同样生效：分页时把查询集转换为投影查询集，
+    get_serializer(page, many=True) 返回编译结果。请求带 ?fields= / ?omit= 时只投影选中的字段。
+    """
+    compiled_actions = ('list',)
+
+    def get_compiled_serializer(self):
+        if getattr(self, 'action', None) not in self.compiled_actions:
+            return None
+        if not get_compiled_settings()['ENABLED']:
+            return None
+        return get_compiled(self.get_serializer_class(), self.get_sparse_fields())
+
+    def paginate_queryset(self, queryset):
+        compiled = None
+        if isinstance(queryset, QuerySet) and issubclass(queryset._iterable_class, ModelIterable):
+            compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().paginate_queryset(queryset)
+        extra = ()
+        if isinstance(self.paginator, CursorPagination):
+            # 游标分页从每页最后一行读取排序字段的值
+            ordering = self.paginator.get_ordering(self.request, queryset, self)
+            extra = [field.lstrip('-') for field in ordering]
+        page = super().paginate_queryset(compiled.prepare(queryset, extra))
+        return None if page is None else CompiledRows(page, compiled)
+
+    def get_serializer(self, *args, **kwargs):
+        instance = args[0] if args else kwargs.get('instance')
+        if kwargs.get('many') and 'data' not in kwargs:
+            if isinstance(instance, CompiledRows):
+                return CompiledResult(instance.compiled.serialize_rows(instance))
+            if isinstance(instance, QuerySet) and issubclass(instance._iterable_class, ModelIterable):
+                compiled = self.get_compiled_serializer()
+                if compiled is not None:
+                    return CompiledResult(compiled.serialize(instance))
+        return super().get_serializer(*args, **kwargs)
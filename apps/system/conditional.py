@@ -0,0 +1,205 @@
+"""
+条件请求（ETag / Last-Modified）
+
+物料、库位、供应商、客户、设备等基础数据很少变化，前端却在每次切换页面时重新拉取。
+每个基础数据表在缓存中维护一个版本号（保存/删除后在事务提交时递增）和最后修改时间，
+列表和详情接口据此生成 ETag 和 Last-Modified：
+
+- ETag 由相关表的版本号、请求路径（含查询参数）、用户和响应格式计算，不查询数据库；
+- 请求带匹配的 If-None-Match（或不早于最后修改时间的 If-Modified-Since）时，
+  在执行视图前直接返回 304 Not Modified，不查询、不序列化；
+- 缓存不可用时退回普通响应。
+
+注意：queryset.update()/bulk_create() 不发送模型信号，批量修改基础数据后需调用 bump_version()。
+
+用法:
+    class LocationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+        conditional_models = (Location, Warehouse)  # 序列化输出依赖的表，默认为查询集的模型
+"""
+import hashlib
+import logging
+import math
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.CONDITIONAL_GET 覆盖
+DEFAULT_CONDITIONAL_GET_SETTINGS = {
+    'ENABLED': True,
+    # 维护版本号的模型，只有这些模型的接口会返回 ETag
+    'MODELS': [
+        'materials.Material', 'materials.Location', 'materials.Supplier', 'materials.MaterialSupplier',
+        'materials.Contact', 'warehouse.Warehouse', 'supplier.Supplier', 'customer.Customer',
+        'equipment.Equipment',
+    ],
+}
+
+VERSION_KEY_PREFIX = 'conditional:version:'
+MODIFIED_KEY_PREFIX = 'conditional:modified:'
+
+_tracked_models = set()
+
+
+def get_conditional_settings():
+    """获取条件请求配置"""
+    config = dict(DEFAULT_CONDITIONAL_GET_SETTINGS)
+    config.update(getattr(settings, 'CONDITIONAL_GET', {}))
+    return config
+
+
+def version_key(model):
+    return f'{VERSION_KEY_PREFIX}{model._meta.label_lower}'
+
+
+def modified_key(model):
+    return f'{MODIFIED_KEY_PREFIX}{model._meta.label_lower}'
+
+
+def bump_version(model):
+    """递增模型的版本号并记录修改时间"""
+    key = version_key(model)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # 版本号尚不存在（或已被淘汰），以毫秒时间戳为初值，避免与淘汰前的版本号重复
+            cache.set(key, int(time.time() * 1000), None)
+        cache.set(modified_key(model), time.time(), None)
+    except Exception as e:
+        logger.warning(f'更新数据版本号失败 {model._meta.label}: {str(e)}')
+
+
+def get_versions(models):
+    """
+    获取多个模型的版本号和最后修改时间
+
+    Returns:
+        (版本号列表, 最后修改时间戳)；缓存不可用时返回 None
+    """
+    keys = [version_key(model) for model in models] + [modified_key(model) for model in models]
+    try:
+        values = cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            now = time.time()
+            for key in missing:
+                cache.add(key, int(now * 1000) if key.startswith(VERSION_KEY_PREFIX) else now, None)
+            values.update(cache.get_many(missing))
+    except Exception as e:
+        logger.warning(f'读取数据版本号失败: {str(e)}')
+        return None
+    if any(key not in values for key in keys):
+        return None
+    count = len(models)
+    return [values[key] for key in keys[:count]], max(values[key] for key in keys[count:])
+
+
+def invalidate_model(sender, **kwargs):
+    """基础数据保存/删除后，在事务提交时递增版本号"""
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+def connect_signals():
+    """为配置的模型注册版本号失效信号，在 AppConfig.ready() 中调用"""
+    for label in get_conditional_settings()['MODELS']:
+        try:
+            model = apps.get_model(label)
+        except (LookupError, ValueError):
+            logger.warning(f'条件请求配置了不存在的模型: {label}')
+            continue
+        _tracked_models.add(model)
+        post_save.connect(invalidate_model, sender=model, dispatch_uid=f'conditional_save_{model._meta.label_lower}')
+        post_delete.connect(invalidate_model, sender=model, dispatch_uid=f'conditional_delete_{model._meta.label_lower}')
+
+
+def etag_matches(etag, if_none_match):
+    """If-None-Match 弱比较"""
+    candidates = parse_etags(if_none_match)
+    if '*' in candidates:
+        return True
+    target = etag.removeprefix('W/')
+    return any(candidate.removeprefix('W/') == target for candidate in candidates)
+
+
+def is_not_modified(request, etag, last_modified):
+    """按 If-None-Match / If-Modified-Since 判断客户端缓存是否仍然有效"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # 同时存在时以 If-None-Match 为准
+        return etag_matches(etag, if_none_match)
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and math.floor(last_modified) <= if_modified_since
+
+
+class NotModified(Exception):
+    """客户端缓存有效，中断视图执行"""
+
+
+class ConditionalGetMixin:
+    """基础数据接口的 ETag / Last-Modified 支持"""
+    conditional_actions = ('list', 'retrieve')
+    conditional_models = ()
+
+    def get_conditional_models(self):
+        return self.conditional_models or (self.queryset.model,)
+
+    def get_conditional_validators(self, request):
+        """
+        计算当前请求的 ETag 和最后修改时间
+
+        Returns:
+            (etag, last_modified)；不适用时返回 None
+        """
+        models = self.get_conditional_models()
+        if any(model not in _tracked_models for model in models):
+            return None
+        versions = get_versions(models)
+        if versions is None:
+            return None
+        numbers, last_modified = versions
+        renderer = getattr(request, 'accepted_renderer', None)
+        raw = '|'.join([
+            ','.join(str(number) for number in numbers),
+            request.get_full_path(),
+            str(getattr(request.user, 'pk', '')),
+            getattr(renderer, 'format', '') or '',
+            request.META.get('HTTP_ACCEPT_LANGUAGE', ''),
+        ])
+        etag = 'W/' + quote_etag(hashlib.md5(raw.encode('utf-8')).hexdigest())
+        return etag, last_modified
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_validators = None
+        if request.method not in ('GET', 'HEAD') or getattr(self, 'action', None) not in self.conditional_actions:
+            return
+        if not get_conditional_settings()['ENABLED']:
+            return
+        self.conditional_validators = self.get_conditional_validators(request)
+        if self.conditional_validators is not None and is_not_modified(request, *self.conditional_validators):
+            raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, 'conditional_validators', None)
+        if validators is not None and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            etag, last_modified = validators
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(math.floor(last_modified))
+            # 允许浏览器缓存，但每次使用前重新验证
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,213 @@
+"""
+系统资源指标采样器
+
+系统内存、CPU和磁盘指标由后台线程按固定间隔采样，不再在每个请求中
+调用 psutil。Prometheus 多进程模式下，同一台主机上只有持有采样锁文件的
+进程负责采样，其它进程跳过，避免重复采样和指标文件膨胀。
+
+这是进程内唯一调用 psutil.cpu_percent(interval=None) 的地方（该调用返回自上次调用
+以来的平均值，多处调用会相互干扰）。其它模块通过 add_listener() 注册回调，
+每次采样后收到同一份读数，例如开发者控制台的系统资源采集（developer.system_collector）。
+
+采样线程只在服务进程中启动：由 project/wsgi.py 和 project/asgi.py 调用
+install_system_metrics_sampler()（runserver 同样加载 WSGI 应用），migrate、shell、
+celery 和测试进程不会启动。fork 出的子进程（如 gunicorn --preload 的 worker）
+会重新启动自己的采样线程。
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+
+import psutil
+from django.conf import settings
+from prometheus_client import Gauge
+
+logger = logging.getLogger('apps')
+
+# 多进程模式下只保留存活进程最近一次写入的值
+SYSTEM_MEMORY_USAGE = Gauge(
+    'system_memory_usage_bytes',
+    'System memory usage in bytes',
+    ['type'],
+    multiprocess_mode='livemostrecent'
+)
+
+SYSTEM_CPU_USAGE = Gauge(
+    'system_cpu_usage_percent',
+    'System CPU usage in percent',
+    [],
+    multiprocess_mode='livemostrecent'
+)
+
+SYSTEM_DISK_USAGE = Gauge(
+    'system_disk_usage_bytes',
+    'System disk usage in bytes',
+    ['type', 'mount'],
+    multiprocess_mode='livemostrecent'
+)
+
+DEFAULT_SAMPLE_INTERVAL = 15          # 采样间隔（秒）
+PARTITION_REFRESH_INTERVAL = 300      # 磁盘分区列表刷新间隔（秒）
+LOCK_FILE_NAME = 'system_sampler.lock'
+
+
+def is_multiprocess_mode():
+    """是否启用了 Prometheus 多进程模式"""
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir'))
+
+
+def read_system(mountpoints=('/',)):
+    """读取一次系统资源使用情况，CPU为自上次调用以来的平均值"""
+    disks = {}
+    for mountpoint in mountpoints:
+        try:
+            disks[mountpoint] = psutil.disk_usage(mountpoint)
+        except OSError:
+            continue
+    return {
+        'timestamp': time.time(),
+        'cpu_usage': psutil.cpu_percent(interval=None),
+        'memory': psutil.virtual_memory(),
+        'disks': disks,
+    }
+
+
+class SystemMetricsSampler(threading.Thread):
+    """后台系统指标采样线程"""
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        super().__init__(name='system-metrics-sampler', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._partitions = []
+        self._partitions_loaded_at = 0
+        self._lock_file = None
+
+    def acquire_leadership(self):
+        """多进程模式下通过文件锁选出唯一的采样进程"""
+        if not is_multiprocess_mode():
+            return True
+        directory = settings.PROMETHEUS_METRICS['DIRECTORY']
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._lock_file = open(os.path.join(directory, LOCK_FILE_NAME), 'w')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            if self._lock_file:
+                self._lock_file.close()
+                self._lock_file = None
+            return False
+
+    def mount_points(self):
+        """获取磁盘挂载点，定期刷新而不是每次采样都遍历分区"""
+        now = time.monotonic()
+        if not self._partitions or now - self._partitions_loaded_at > PARTITION_REFRESH_INTERVAL:
+            self._partitions = [
+                partition.mountpoint for partition in psutil.disk_partitions()
+                if os.path.exists(partition.mountpoint)
+            ]
+            self._partitions_loaded_at = now
+        return self._partitions
+
+    def sample(self):
+        """
+        采样一次系统资源使用情况并更新指标
+
+        Returns:
+            读数字典：timestamp、cpu_usage、memory（virtual_memory 结果）、disks（挂载点 -> disk_usage 结果）
+        """
+        reading = read_system(self.mount_points())
+        # 记录内存使用情况
+        memory = reading['memory']
+        SYSTEM_MEMORY_USAGE.labels(type='total').set(memory.total)
+        SYSTEM_MEMORY_USAGE.labels(type='available').set(memory.available)
+        SYSTEM_MEMORY_USAGE.labels(type='used').set(memory.used)
+
+        # 记录CPU使用情况（自上次采样以来的平均值）
+        SYSTEM_CPU_USAGE.set(reading['cpu_usage'])
+
+        # 记录磁盘使用情况
+        for mountpoint, usage in reading['disks'].items():
+            SYSTEM_DISK_USAGE.labels(type='total', mount=mountpoint).set(usage.total)
+            SYSTEM_DISK_USAGE.labels(type='used', mount=mountpoint).set(usage.used)
+            SYSTEM_DISK_USAGE.labels(type='free', mount=mountpoint).set(usage.free)
+        return reading
+
+    def tick(self):
+        """采样一次并把读数交给注册的回调，不是采样进程时跳过"""
+        global _last_reading
+        # 未获得采样锁的进程定期重试，采样进程退出后由其它进程接管
+        if self._lock_file is None and not self.acquire_leadership():
+            return
+        try:
+            _last_reading = self.sample()
+        except Exception as e:
+            logger.warning(f'系统指标采样失败: {str(e)}')
+            return
+        for listener in list(_listeners):
+            try:
+                listener(_last_reading)
+            except Exception as e:
+                logger.warning(f'系统指标采样回调失败 {getattr(listener, "__qualname__", listener)}: {str(e)}')
+
+    def run(self):
+        # 首次调用 cpu_percent(interval=None) 只建立基线
+        psutil.cpu_percent(interval=None)
+        while not self._stop_event.wait(self.interval):
+            self.tick()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_sampler = None
+_sampler_pid = None
+_sampler_lock = threading.Lock()
+_listeners = []
+_last_reading = None
+_installed = False
+
+
+def add_listener(callback):
+    """注册采样回调，每次采样后在采样线程中以读数字典调用"""
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def latest_reading():
+    """本进程采样线程的最近一次读数，尚未采样（或本进程不是采样进程）时即时读取一次"""
+    return _last_reading or read_system()
+
+
+def start_system_metrics_sampler():
+    """启动当前进程的系统指标采样线程，同一进程内重复调用只启动一次"""
+    global _sampler, _sampler_pid
+    with _sampler_lock:
+        if _sampler is not None and _sampler_pid == os.getpid() and _sampler.is_alive():
+            return _sampler
+        interval = settings.PROMETHEUS_METRICS.get('SYSTEM_SAMPLE_INTERVAL', DEFAULT_SAMPLE_INTERVAL)
+        _sampler = SystemMetricsSampler(interval)
+        _sampler_pid = os.getpid()
+        _sampler.start()
+        return _sampler
+
+
+def _restart_after_fork():
+    """fork 后子进程中只有调用 fork 的线程存活，重新创建锁并启动采样线程"""
+    global _sampler_lock, _last_reading
+    _sampler_lock = threading.Lock()
+    _last_reading = None
+    start_system_metrics_sampler()
+
+
+def install_system_metrics_sampler():
+    """在服务进程入口（project/wsgi.py、project/asgi.py）中调用，按配置启动系统指标采样"""
+    global _installed
+    if _installed or not settings.PROMETHEUS_METRICS.get('SYSTEM_SAMPLER_ENABLED', True):
+        return
+    _installed = True
+    start_system_metrics_sampler()
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -1,7 +1,7 @@
+import re
 import time
 import logging
-import psutil
-import os
+import threading
 from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 from prometheus_client import Counter, Histogram, Gauge
@@ -9,54 +9,116 @@ from prometheus_client import Counter, Histogram, Gauge
 logger = logging.getLogger('apps')
 
 # 定义Prometheus指标
+# endpoint 标签取自URL路由模板（如 api/production/orders/<int:pk>/），
+# 而不是原始路径，避免每个对象ID产生一条新的时间序列
 HTTP_REQUEST_COUNTER = Counter(
     'http_request_total',
     'Total number of HTTP requests',
-    ['method', 'endpoint', 'status']
+    ['method', 'endpoint', 'view', 'status']
 )
 
 HTTP_REQUEST_LATENCY = Histogram(
     'http_request_latency_seconds',
     'HTTP request latency in seconds',
-    ['method', 'endpoint']
+    ['method', 'endpoint', 'view']
 )
 
 ACTIVE_REQUESTS = Gauge(
     'http_active_requests',
     'Number of active HTTP requests',
-    ['method']
+    ['method'],
+    multiprocess_mode='livesum'
 )
 
-SYSTEM_MEMORY_USAGE = Gauge(
-    'system_memory_usage_bytes',
-    'System memory usage in bytes',
-    ['type']
-)
-
-SYSTEM_CPU_USAGE = Gauge(
-    'system_cpu_usage_percent',
-    'System CPU usage in percent',
+HTTP_METRIC_LABELS_DROPPED = Counter(
+    'http_metric_labels_dropped_total',
+    'Number of requests whose endpoint label was replaced by "other" due to the cardinality limit',
     []
 )
 
-SYSTEM_DISK_USAGE = Gauge(
-    'system_disk_usage_bytes',
-    'System disk usage in bytes',
-    ['type', 'mount']
+# 未匹配路由或超出基数上限时使用的标签值
+OTHER_LABEL = 'other'
+KNOWN_METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'}
+DEFAULT_MAX_ENDPOINT_LABELS = 500
+
+
+class EndpointLabelGuard:
+    """
+    endpoint 标签基数限制
+    
+    每个进程最多记录 max_labels 个不同的 (endpoint, view) 组合，
+    超出后新的组合归入 other 并计数。
+    """
+    
+    def __init__(self, max_labels):
+        self.max_labels = max_labels
+        self._seen = set()
+        self._lock = threading.Lock()
+    
+    def check(self, endpoint, view):
+        key = (endpoint, view)
+        if key in self._seen:
+            return endpoint, view
+        with self._lock:
+            if key in self._seen:
+                return endpoint, view
+            if len(self._seen) < self.max_labels:
+                self._seen.add(key)
+                return endpoint, view
+        HTTP_METRIC_LABELS_DROPPED.inc()
+        return OTHER_LABEL, OTHER_LABEL
+
+
+endpoint_label_guard = EndpointLabelGuard(
+    settings.PROMETHEUS_METRICS.get('MAX_ENDPOINT_LABELS', DEFAULT_MAX_ENDPOINT_LABELS)
 )
 
+
+# 路由各段开头的 ^ 和结尾的 $（include() 会把多段正则拼接在一起）
+ROUTE_ANCHOR_RE = re.compile(r'(^|/)\^|\$(?=/|$)')
+
+
+def route_template(resolver_match):
+    """
+    解析结果对应的路由模板（如 api/production/orders/<int:pk>/）
+    
+    正则路由（如DRF路由器生成的）去掉各段首尾的锚点字符，保留字符类中的 ^。
+    没有路由时返回空字符串。
+    """
+    return ROUTE_ANCHOR_RE.sub(r'\1', resolver_match.route or '')
+
+
+def get_metric_labels(request):
+    """
+    根据解析后的URL路由生成指标标签
+    
+    Returns:
+        (method, endpoint, view) 元组
+    """
+    method = request.method if request.method in KNOWN_METHODS else OTHER_LABEL
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None or not resolver_match.route:
+        return method, OTHER_LABEL, OTHER_LABEL
+    
+    endpoint = route_template(resolver_match)
+    view = resolver_match.view_name or OTHER_LABEL
+    endpoint, view = endpoint_label_guard.check(endpoint, view)
+    return method, endpoint, view
+
 class MonitoringMiddleware(MiddlewareMixin):
-    """监控中间件，用于记录请求日志、性能指标和异常信息"""
+    """监控中间件，用于记录请求日志、性能指标和异常信息
+    
+    系统资源指标由后台采样线程记录（见 metrics_sampler，由 WSGI/ASGI 入口启动），
+    请求路径上只做计时和计数。
+    """
     
     def process_request(self, request):
         # 记录请求开始时间
         request.start_time = time.time()
         
         # 增加活跃请求计数
-        ACTIVE_REQUESTS.labels(method=request.method).inc()
-        
-        # 记录系统资源使用情况
-        self._record_system_metrics()
+        request.metrics_method = request.method if request.method in KNOWN_METHODS else OTHER_LABEL
+        ACTIVE_REQUESTS.labels(method=request.metrics_method).inc()
         
         # 记录请求日志
         logger.info(
@@ -70,19 +132,22 @@ class MonitoringMiddleware(MiddlewareMixin):
             duration = time.time() - request.start_time
             
             # 记录Prometheus指标
+            method, endpoint, view = get_metric_labels(request)
             HTTP_REQUEST_COUNTER.labels(
-                method=request.method,
-                endpoint=request.path,
+                method=method,
+                endpoint=endpoint,
+                view=view,
                 status=response.status_code
             ).inc()
             
             HTTP_REQUEST_LATENCY.labels(
-                method=request.method,
-                endpoint=request.path
+                method=method,
+                endpoint=endpoint,
+                view=view
             ).observe(duration)
             
             # 减少活跃请求计数
-            ACTIVE_REQUESTS.labels(method=request.method).dec()
+            ACTIVE_REQUESTS.labels(method=request.metrics_method).dec()
             
             # 记录响应日志
             logger.info(
@@ -94,8 +159,7 @@ class MonitoringMiddleware(MiddlewareMixin):
         return response
     
     def process_exception(self, request, exception):
-        # 减少活跃请求计数
-        ACTIVE_REQUESTS.labels(method=request.method).dec()
+        # 活跃请求计数在 process_response 中减少（异常会被转换为响应）
         
         # 记录异常日志
         logger.error(
@@ -103,22 +167,3 @@ class MonitoringMiddleware(MiddlewareMixin):
             f'{str(exception)}',
             exc_info=True
         )
-    
-    def _record_system_metrics(self):
-        """记录系统资源使用情况"""
-        # 记录内存使用情况
-        memory = psutil.virtual_memory()
-        SYSTEM_MEMORY_USAGE.labels(type='total').set(memory.total)
-        SYSTEM_MEMORY_USAGE.labels(type='available').set(memory.available)
-        SYSTEM_MEMORY_USAGE.labels(type='used').set(memory.used)
-        
-        # 记录CPU使用情况
-        SYSTEM_CPU_USAGE.set(psutil.cpu_percent(interval=None))
-        
-        # 记录磁盘使用情况
-        for partition in psutil.disk_partitions():
-            if os.path.exists(partition.mountpoint):
-                usage = psutil.disk_usage(partition.mountpoint)
-                SYSTEM_DISK_USAGE.labels(type='total', mount=partition.mountpoint).set(usage.total)
-                SYSTEM_DISK_USAGE.labels(type='used', mount=partition.mountpoint).set(usage.used)
-                SYSTEM_DISK_USAGE.labels(type='free', mount=partition.mountpoint).set(usage.free)
\ No newline at end of file
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-19 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('system', '0002_systemalert'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='operationlog',
+            index=models.Index(fields=['-created_at', '-id'], name='sys_operati_created_d3d410_idx'),
+        ),
+    ]
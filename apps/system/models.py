@@ -78,6 +78,10 @@ class OperationLog(models.Model):
         verbose_name_plural = verbose_name
         ordering = ['-created_at']
         db_table = 'sys_operation_log'
+        indexes = [
+            # 游标分页排序
+            models.Index(fields=['-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f'{self.user.username} - {self.operation_type} - {self.operation_module}'
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""
+大表分页
+
+日志、扫码记录、接口指标等持续增长的表使用游标分页，不再对每次列表请求执行 COUNT(*)：
+
+- 游标分页按 (created_at, id) 排序（视图集的 ordering 属性），配合同序的复合索引；
+- 总数按 COUNT_MODE 计算：capped 只统计到阈值（超过时返回阈值并标记为近似值），
+  estimated 使用 PostgreSQL 的 pg_class.reltuples（有过滤条件时使用执行计划估算），none 不返回总数；
+- 未带 cursor 参数的 ?page=N 请求按 OFFSET 取页，兼容现有前端的页码翻页，同样不执行 COUNT(*)。
+
+响应保持 {results, count} 结构；自定义 list() 返回 {items, total} 时读取 paginator.count。
+
+用法:
+    class LogViewSet(viewsets.ReadOnlyModelViewSet):
+        pagination_class = CountFreeCursorPagination
+        ordering = ('-created_at', '-id')
+"""
+import logging
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from apps.search.facets import count_queryset, estimate_count
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.CURSOR_PAGINATION 覆盖
+DEFAULT_CURSOR_PAGINATION_SETTINGS = {
+    'COUNT_MODE': 'capped',    # capped / estimated / none
+    'COUNT_THRESHOLD': 1000,   # capped 模式统计的最大行数
+    'MAX_PAGE_SIZE': 100,
+}
+
+
+def get_pagination_settings():
+    """获取游标分页配置"""
+    config = dict(DEFAULT_CURSOR_PAGINATION_SETTINGS)
+    config.update(getattr(settings, 'CURSOR_PAGINATION', {}))
+    return config
+
+
+def estimate_table_rows(model, using):
+    """使用 pg_class.reltuples 估算表的行数，非 PostgreSQL 或表未分析过时返回 None"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+    except Exception as e:
+        logger.debug(f'读取表行数估算失败 {model._meta.db_table}: {str(e)}')
+        return None
+    # PostgreSQL 14+ 对从未 ANALYZE 的表返回 -1
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def get_count(queryset, mode='capped', threshold=1000):
+    """
+    按模式计算查询集的总数
+
+    Returns:
+        (count, approximate) 元组；none 模式返回 (None, False)
+    """
+    if mode == 'none':
+        return None, False
+    if mode == 'estimated':
+        if queryset.query.has_filters():
+            estimated = estimate_count(queryset)
+        else:
+            estimated = estimate_table_rows(queryset.model, queryset.db)
+        if estimated is not None:
+            return estimated, True
+    return count_queryset(queryset, threshold)
+
+
+class CountFreeCursorPagination(CursorPagination):
+    """不执行 COUNT(*) 的游标分页"""
+    ordering = ('-created_at', '-id')
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.config = get_pagination_settings()
+        self.max_page_size = self.config['MAX_PAGE_SIZE']
+        self.count = None
+        self.count_approximate = False
+        self.page_number = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count, self.count_approximate = get_count(
+            queryset, self.config['COUNT_MODE'], self.config['COUNT_THRESHOLD']
+        )
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_query_param in params:
+            return self.paginate_by_page_number(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_by_page_number(self, queryset, request, view=None):
+        """按页码取页：多取一行判断是否有下一页"""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        try:
+            self.page_number = max(int(request.query_params[self.page_query_param]), 1)
+        except ValueError:
+            self.page_number = 1
+        offset = (self.page_number - 1) * self.page_size
+        rows = list(queryset.order_by(*self.ordering)[offset:offset + self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.has_previous = self.page_number > 1
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if self.page_number is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number is None:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        if self.page_number == 2:
+            return remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(self.base_url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'count_approximate': self.count_approximate,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'].update({
+            'count': {'type': 'integer', 'nullable': True, 'example': 123},
+            'count_approximate': {'type': 'boolean', 'example': False},
+        })
+        return response_schema
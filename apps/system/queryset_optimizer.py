@@ -0,0 +1,370 @@
+"""
+查询集自动优化
+
+根据序列化器声明的字段推导列表/详情接口需要的 select_related、prefetch_related 和 only()，
+避免序列化时逐行访问外键产生的 N+1 查询：
+
+- 普通字段和带 source 的字段：按 source 路径（如 supplier.name、get_status_display）解析；
+- 嵌套序列化器：单个对象走 select_related，many=True 走 prefetch_related，并递归解析子序列化器；
+- PrimaryKeyRelatedField：只需要外键列，不做关联查询；
+- SerializerMethodField：解析 get_xxx 方法的源码，收集以 obj 开头的属性链，
+  如 obj.material.code、obj.location.name、obj.items.all()。
+
+无法确定访问了哪些列时（访问模型属性/方法、把 obj 整体传给其它函数等）该层不使用 only()，
+只保留关联预加载，保证优化不会引入额外的延迟加载查询。
+
+推导结果按序列化器类（和 ?fields= 裁剪后的字段集合）缓存，每种组合只解析一次。
+
+用法:
+    class InventoryViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
+        ...
+"""
+import ast
+import inspect
+import logging
+import re
+import textwrap
+import threading
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from django.db.models.query import ModelIterable
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+from .sparse_fieldsets import SparseFieldsetMixin, prune_serializer
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.QUERYSET_OPTIMIZER 覆盖
+DEFAULT_QUERYSET_OPTIMIZER_SETTINGS = {
+    'ENABLED': True,
+    'USE_ONLY': True,         # 是否根据序列化器字段使用 only() 只查询需要的列
+}
+
+DISPLAY_METHOD_RE = re.compile(r'get_(\w+)_display')
+
+# 按字段集合缓存的计划数量上限，超出后裁剪字段的计划不再缓存
+MAX_CACHED_PLANS = 1024
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def get_optimizer_settings():
+    """获取查询集优化配置"""
+    config = dict(DEFAULT_QUERYSET_OPTIMIZER_SETTINGS)
+    config.update(getattr(settings, 'QUERYSET_OPTIMIZER', {}))
+    return config
+
+
+class PlanNode:
+    """查询计划中的一层模型（根模型或某条关联路径）"""
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = set()
+        self.full = False        # 访问了无法确定的属性，需要加载全部列
+        self.children = {}       # 关联名 -> (select / prefetch, PlanNode)
+
+    def child(self, name, kind, model):
+        if name not in self.children:
+            self.children[name] = (kind, PlanNode(model))
+        return self.children[name][1]
+
+
+class QueryPlan:
+    """由序列化器推导出的查询优化计划"""
+
+    def __init__(self, model, select_related=(), prefetch_related=(), only=None):
+        self.model = model
+        self.select_related = list(select_related)
+        self.prefetch_related = list(prefetch_related)
+        self.only = list(only) if only is not None else None
+
+    def __repr__(self):
+        return (f'QueryPlan(select_related={self.select_related}, '
+                f'prefetch_related={self.prefetch_related}, only={self.only})')
+
+    def apply(self, queryset, use_only=True):
+        """把计划应用到查询集，重复应用不会产生重复的预加载"""
+        if queryset.model is not self.model:
+            return queryset
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        prefetch = [lookup for lookup in self.prefetch_related if lookup not in queryset._prefetch_related_lookups]
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        # 查询集已经指定了 only()/defer() 时保持原样
+        deferred_fields, _ = queryset.query.deferred_loading
+        if use_only and self.only and not deferred_fields:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def method_attribute_chains(method):
+    """
+    解析 SerializerMethodField 方法中以 obj 开头的属性链
+
+    Returns:
+        (属性链列表, 是否只用于真值判断) 的列表；obj 被整体使用时返回 None
+    """
+    try:
+        source = textwrap.dedent(inspect.getsource(method))
+        function = ast.parse(source).body[0]
+    except (OSError, TypeError, SyntaxError, IndexError):
+        return None
+    if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)) or len(function.args.args) < 2:
+        return None
+    obj_name = function.args.args[1].arg
+
+    parents = {}
+    for node in ast.walk(function):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+
+    def is_test(node):
+        """属性链只用于 if obj.material / obj.material is None 这类判断"""
+        parent = parents.get(node)
+        if isinstance(parent, (ast.If, ast.IfExp, ast.While)) and parent.test is node:
+            return True
+        if isinstance(parent, ast.UnaryOp) and isinstance(parent.op, ast.Not):
+            return True
+        if isinstance(parent, ast.BoolOp):
+            # a and b 中 a 只用于判断，b 的用途取决于整个表达式
+            return node is not parent.values[-1] or is_test(parent)
+        if isinstance(parent, ast.Compare) and all(isinstance(op, (ast.Is, ast.IsNot)) for op in parent.ops):
+            return True
+        return False
+
+    chains = []
+    for node in ast.walk(function):
+        if isinstance(node, ast.Name) and node.id == obj_name and isinstance(node.ctx, ast.Load):
+            if not isinstance(parents.get(node), ast.Attribute):
+                # obj 被整体传递或使用，无法确定访问了哪些列
+                return None
+            continue
+        if not isinstance(node, ast.Attribute):
+            continue
+        parent = parents.get(node)
+        if isinstance(parent, ast.Attribute) and parent.value is node:
+            continue
+        chain = []
+        current = node
+        while isinstance(current, ast.Attribute):
+            chain.append(current.attr)
+            current = current.value
+        if isinstance(current, ast.Name) and current.id == obj_name:
+            chains.append((list(reversed(chain)), is_test(node)))
+    return chains
+
+
+def get_model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def walk_chain(node, chain, terminal_full=True):
+    """
+    在计划树中登记一条属性链
+
+    Args:
+        node: 属性链起点所在的模型层
+        chain: 属性名列表
+        terminal_full: 属性链以关联对象结尾时是否需要该对象的全部列
+
+    Returns:
+        属性链以关联结尾时返回关联对象所在的层，否则返回 None
+    """
+    for index, name in enumerate(chain):
+        last = index == len(chain) - 1
+        field = get_model_field(node.model, name)
+        if field is None:
+            display = DISPLAY_METHOD_RE.fullmatch(name)
+            display_field = get_model_field(node.model, display.group(1)) if display else None
+            if display_field is not None and display_field.concrete:
+                node.fields.add(display_field.name)
+            elif name == 'pk':
+                node.fields.add(node.model._meta.pk.name)
+            else:
+                node.full = True
+            return None
+        if not field.is_relation or (field.concrete and name == field.attname and name != field.name):
+            # 普通列，或通过 material_id 直接访问外键列
+            node.fields.add(field.name)
+            return None
+        if field.many_to_one or field.one_to_one:
+            if field.related_model is None:
+                # GenericForeignKey 无法 select_related
+                node.full = True
+                return None
+            if field.concrete:
+                node.fields.add(field.name)
+            child = node.child(name, 'select', field.related_model)
+            if last:
+                child.full = child.full or terminal_full
+                return child
+            node = child
+            continue
+        # 一对多 / 多对多：只有 .all() 能使用预加载结果，.filter()/.count() 等仍会单独查询
+        if last or chain[index + 1] == 'all':
+            child = node.child(name, 'prefetch', field.related_model)
+            child.full = True
+            return child
+        return None
+    return node
+
+
+def collect_serializer(serializer, node):
+    """把序列化器用到的字段登记到计划树"""
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        source_attrs = list(getattr(field, 'source_attrs', None) or [])
+
+        if isinstance(field, serializers.ListSerializer):
+            child = walk_chain(node, source_attrs + ['all'])
+            if child is not None and isinstance(field.child, serializers.ModelSerializer):
+                collect_serializer(field.child, child)
+            continue
+        if isinstance(field, serializers.ModelSerializer):
+            if not source_attrs:
+                collect_serializer(field, node)
+                continue
+            child = walk_chain(node, source_attrs, terminal_full=False)
+            if child is not None:
+                collect_serializer(field, child)
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            node.full = True
+            continue
+        if isinstance(field, ManyRelatedField):
+            walk_chain(node, source_attrs + ['all'])
+            continue
+        if isinstance(field, RelatedField) and field.use_pk_only_optimization() and source_attrs:
+            # 只读取外键列（material_id），不加载关联对象
+            owner = walk_chain(node, source_attrs[:-1], terminal_full=False) if len(source_attrs) > 1 else node
+            if owner is not None:
+                related = get_model_field(owner.model, source_attrs[-1])
+                if related is not None and related.concrete:
+                    owner.fields.add(related.name)
+                else:
+                    walk_chain(owner, source_attrs[-1:])
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            chains = method_attribute_chains(getattr(serializer, field.method_name))
+            if chains is None:
+                node.full = True
+                continue
+            for chain, test_only in chains:
+                walk_chain(node, chain, terminal_full=not test_only)
+            continue
+        if not source_attrs:
+            # source='*'
+            node.full = True
+            continue
+        walk_chain(node, source_attrs)
+
+
+def compile_plan(node, select_related, prefetch_related, only, prefix='', in_prefetch=False):
+    """
+    把计划树展开为 select_related / prefetch_related / only 参数
+
+    需要全部列的层及其下级不再限制列（only 中只保留到该层的关联名），
+    预加载路径无法通过 only() 限制列。
+    """
+    if node.full or in_prefetch:
+        only = None
+    if only is not None:
+        only.update(f'{prefix}{name}' for name in node.fields)
+    for name, (kind, child) in node.children.items():
+        path = f'{prefix}{name}'
+        if kind == 'select' and not in_prefetch:
+            select_related.append(path)
+            if only is not None:
+                only.add(path)
+            compile_plan(child, select_related, prefetch_related, only, f'{path}__', False)
+        else:
+            # 预加载路径下的外键也由 prefetch_related 一并加载
+            prefetch_related.append(path)
+            compile_plan(child, select_related, prefetch_related, None, f'{path}__', True)
+
+
+def build_plan(serializer_class, fields=None):
+    """
+    根据序列化器类推导查询计划
+
+    Args:
+        serializer_class: 序列化器类
+        fields: 只保留这些字段（稀疏字段集），为 None 时使用全部字段
+    """
+    model = getattr(getattr(serializer_class, 'Meta', None), 'model', None)
+    if model is None or not issubclass(serializer_class, serializers.ModelSerializer):
+        return None
+    serializer = serializer_class()
+    if fields is not None:
+        prune_serializer(serializer, fields)
+    root = PlanNode(model)
+    collect_serializer(serializer, root)
+
+    select_related, prefetch_related = [], []
+    only = None if root.full else set()
+    compile_plan(root, select_related, prefetch_related, only)
+    if only is not None:
+        only.add(model._meta.pk.name)
+    return QueryPlan(model, select_related, prefetch_related, sorted(only) if only is not None else None)
+
+
+def get_plan(serializer_class, fields=None):
+    """获取序列化器类的查询计划（按类和字段集合缓存）"""
+    key = serializer_class if fields is None else (serializer_class, frozenset(fields))
+    try:
+        return _plans[key]
+    except KeyError:
+        pass
+    with _plans_lock:
+        if key in _plans:
+            return _plans[key]
+        try:
+            plan = build_plan(serializer_class, fields)
+        except Exception as e:
+            logger.warning(f'推导查询计划失败 {serializer_class.__name__}: {str(e)}')
+            plan = None
+        if fields is None or len(_plans) < MAX_CACHED_PLANS:
+            _plans[key] = plan
+        return plan
+
+
+class OptimizedQuerysetMixin(SparseFieldsetMixin):
+    """
+    视图集查询集自动优化
+
+    在列表和详情接口中按当前序列化器推导的计划优化查询集。
+    覆盖了 get_queryset() 或 list() 的视图集同样生效：
+    计划在 filter_queryset()（默认 list/retrieve 和 get_object）和 paginate_queryset() 中应用。
+    请求带 ?fields= / ?omit= 时按裁剪后的字段推导计划。
+    """
+    optimize_actions = ('list', 'retrieve')
+
+    def optimize_queryset(self, queryset):
+        if not isinstance(queryset, QuerySet) or getattr(self, 'action', None) not in self.optimize_actions:
+            return queryset
+        # values()/values_list() 查询集不返回模型实例，无需也不能再 select_related/only
+        if not issubclass(queryset._iterable_class, ModelIterable):
+            return queryset
+        config = get_optimizer_settings()
+        if not config['ENABLED']:
+            return queryset
+        plan = get_plan(self.get_serializer_class(), self.get_sparse_fields())
+        if plan is None:
+            return queryset
+        return plan.apply(queryset, use_only=config['USE_ONLY'])
+
+    def filter_queryset(self, queryset):
+        return self.optimize_queryset(super().filter_queryset(queryset))
+
+    def paginate_queryset(self, queryset):
+        return super().paginate_queryset(self.optimize_queryset(queryset))
@@ -0,0 +1,47 @@
+"""
+orjson 渲染器
+
+替代 DRF 基于标准库 json 的 JSONRenderer。datetime、date、time、UUID 和 dict/list 子类
+（ReturnDict、OrderedDict 等）由 orjson 直接序列化；Decimal、惰性翻译字符串、QuerySet 等
+其它类型交给 DRF 的 JSONEncoder.default 处理。
+
+与原渲染器的差异：直接放入响应的 datetime 保留微秒（DRF 截断到毫秒），
+序列化器字段输出的时间字符串不受影响。
+"""
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+# 非字符串键与标准库 json 一样转为字符串；UTC 时间输出为 Z 结尾，与 DRF 一致
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+def default(obj):
+    return _encoder.default(obj)
+
+
+def dumps(data, indent=False):
+    """序列化为 UTF-8 编码的 JSON 字节串"""
+    options = ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else ORJSON_OPTIONS
+    return orjson.dumps(data, default=default, option=options)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """基于 orjson 的 JSON 渲染器"""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # 与 JSONRenderer 一样支持 Accept: application/json; indent=4（orjson 只支持2空格缩进）
+        indent = False
+        if accepted_media_type:
+            for part in accepted_media_type.split(';')[1:]:
+                key, _, value = part.strip().partition('=')
+                if key == 'indent' and value.strip().isdigit() and int(value) > 0:
+                    indent = True
+        return dumps(data, indent=indent)
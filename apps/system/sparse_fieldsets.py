@@ -0,0 +1,123 @@
+"""
+稀疏字段集
+
+列表和详情接口支持通过查询参数只返回部分字段:
+    GET /api/materials/inventory/?fields=id,material_name,quantity,status_display
+    GET /api/scanning/barcodes/?omit=created_at,updated_at
+
+未请求的字段从序列化器中移除，SerializerMethodField 不会执行；
+查询集优化（only()）和编译序列化器（values_list()）按裁剪后的字段推导，只查询需要的列。
+只支持顶层字段，未知的字段名忽略。
+"""
+import threading
+
+from django.conf import settings
+from rest_framework import serializers
+
+# 默认配置，可通过 settings.SPARSE_FIELDSETS 覆盖
+DEFAULT_SPARSE_FIELDSET_SETTINGS = {
+    'ENABLED': True,
+    'FIELDS_PARAM': 'fields',
+    'OMIT_PARAM': 'omit',
+}
+
+_field_names = {}
+_field_names_lock = threading.Lock()
+
+
+def get_sparse_settings():
+    """获取稀疏字段集配置"""
+    config = dict(DEFAULT_SPARSE_FIELDSET_SETTINGS)
+    config.update(getattr(settings, 'SPARSE_FIELDSETS', {}))
+    return config
+
+
+def parse_field_list(value):
+    """解析逗号分隔的字段名"""
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def serializer_field_names(serializer_class):
+    """序列化器类的可读字段名（按类缓存）"""
+    try:
+        return _field_names[serializer_class]
+    except KeyError:
+        pass
+    with _field_names_lock:
+        if serializer_class not in _field_names:
+            _field_names[serializer_class] = tuple(
+                name for name, field in serializer_class().fields.items() if not field.write_only
+            )
+        return _field_names[serializer_class]
+
+
+def select_fields(available, fields=None, omit=None):
+    """
+    按 fields/omit 选出保留的字段
+
+    Args:
+        available: 序列化器的字段名（保持顺序）
+        fields: 要返回的字段名，为空或都不是已知字段时返回全部（避免拼写错误得到空对象）
+        omit: 要去掉的字段名
+
+    Returns:
+        保留的字段名元组；未做任何限制时返回 None
+    """
+    if not fields and not omit:
+        return None
+    selected = [name for name in available if name in fields] if fields else []
+    if not selected:
+        selected = list(available)
+    if omit:
+        selected = [name for name in selected if name not in omit]
+    if len(selected) == len(available):
+        return None
+    return tuple(selected)
+
+
+def prune_serializer(serializer, names):
+    """从序列化器（或 many=True 的子序列化器）中移除未选中的字段"""
+    target = serializer.child if isinstance(serializer, serializers.ListSerializer) else serializer
+    keep = set(names)
+    for name in list(target.fields):
+        if name not in keep:
+            target.fields.pop(name)
+    return serializer
+
+
+class SparseFieldsetMixin:
+    """视图集按 ?fields= / ?omit= 裁剪序列化器字段"""
+    sparse_actions = ('list', 'retrieve')
+
+    def get_sparse_fields(self):
+        """
+        当前请求要返回的字段
+
+        Returns:
+            字段名元组；未限制字段时返回 None
+        """
+        request = getattr(self, 'request', None)
+        if request is None or getattr(self, 'action', None) not in self.sparse_actions:
+            return None
+        config = get_sparse_settings()
+        if not config['ENABLED']:
+            return None
+        params = getattr(request, 'query_params', request.GET)
+        fields = parse_field_list(params.get(config['FIELDS_PARAM']))
+        omit = parse_field_list(params.get(config['OMIT_PARAM']))
+        if not fields and not omit:
+            return None
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, serializers.Serializer):
+            return None
+        return select_fields(serializer_field_names(serializer_class), fields, omit)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if 'data' not in kwargs:
+            names = self.get_sparse_fields()
+            if names is not None:
+                prune_serializer(serializer, names)
+        return serializer
@@ -0,0 +1,138 @@
+import json
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from rest_framework import serializers
+from rest_framework.test import APITestCase
+
+from apps.customer.models import Customer
+from apps.materials.models import Inventory, Location, Material
+from apps.materials.serializers import InventoryDetailSerializer, InventorySerializer, MaterialDetailSerializer
+from apps.production.models import Order
+from apps.scanning.models import Barcode, ScanningHistory
+from apps.scanning.serializers import BarcodeSerializer, ScanningHistorySerializer
+from apps.system.compiled_serializers import CompilationError, CompiledSerializer, get_compiled
+from apps.system.renderers import ORJSONRenderer
+from apps.users.models import User
+from apps.warehouse.models import Warehouse
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """orjson 渲染器测试"""
+
+    def test_native_types(self):
+        data = {
+            'amount': Decimal('12.50'),
+            'day': date(2024, 1, 2),
+            'at': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            1: '中文',
+        }
+        body = ORJSONRenderer().render(data)
+        # 与 DRF 的 JSONEncoder 一致，直接放入响应的 Decimal 输出为数字
+        self.assertEqual(json.loads(body), {
+            'amount': 12.5,
+            'day': '2024-01-02',
+            'at': '2024-01-02T03:04:05Z',
+            'id': '12345678-1234-5678-1234-567812345678',
+            '1': '中文',
+        })
+        self.assertIn('中文'.encode(), body)
+
+    def test_none_renders_empty_body(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_indent_from_accept_header(self):
+        body = ORJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+        self.assertIn(b'\n', body)
+
+
+class CompilationTests(SimpleTestCase):
+    """编译范围测试"""
+
+    def test_method_fields_project_only_used_columns(self):
+        compiled = CompiledSerializer(InventorySerializer)
+        for lookup in ('material', 'material__code', 'material__name', 'location', 'location__name', 'status'):
+            self.assertIn(lookup, compiled.lookups)
+        self.assertNotIn('material__specifications', compiled.lookups)
+
+    def test_unsupported_serializers_are_rejected(self):
+        with self.assertRaises(CompilationError):
+            CompiledSerializer(InventoryDetailSerializer)
+        with self.assertRaises(CompilationError):
+            CompiledSerializer(MaterialDetailSerializer)
+        self.assertIsNone(get_compiled(MaterialDetailSerializer))
+
+    def test_context_dependent_methods_are_rejected(self):
+        class RequestAwareSerializer(serializers.ModelSerializer):
+            owner = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Material
+                fields = ['id', 'owner']
+
+            def get_owner(self, obj):
+                return obj.created_by_id == self.context['request'].user.id
+
+        with self.assertRaises(CompilationError):
+            CompiledSerializer(RequestAwareSerializer)
+
+
+class CompiledOutputTests(APITestCase):
+    """编译序列化器输出与 DRF 一致"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='compiled', password='compiled-password')
+        self.client.force_authenticate(self.user)
+        warehouse = Warehouse.objects.create(
+            name='成品仓', address='一号路', contact_person='张三', contact_phone='13800000000', area=100
+        )
+        customer = Customer.objects.create(
+            name='客户', contact_person='李四', contact_phone='13800000001', address='二号路', created_by=self.user
+        )
+        order = Order.objects.create(
+            order_number='O1', customer=customer, product_name='衬衫', quantity=10,
+            unit_price=10, total_amount=100, delivery_date=date(2024, 1, 1), created_by=self.user
+        )
+        barcodes = []
+        for n in range(3):
+            material = Material.objects.create(code=f'M{n}', name=f'面料{n}', category='面料', unit='米', created_by=self.user)
+            location = Location.objects.create(code=f'L{n}', name=f'库位{n}', warehouse=warehouse, created_by=self.user)
+            Inventory.objects.create(
+                material=material, location=location, quantity=n * 5,
+                production_date=date(2024, 1, n + 1), created_by=self.user
+            )
+            barcodes.append(Barcode.objects.create(
+                barcode_number=f'B{n}', barcode_type='material', material=material if n else None,
+                warehouse=warehouse, order=order, created_by=self.user
+            ))
+        ScanningHistory.objects.create(
+            barcode=barcodes[0], operation_type='material_inbound', location_barcode=barcodes[1], created_by=self.user
+        )
+        ScanningHistory.objects.create(barcode=barcodes[2], operation_type='material_inbound', created_by=self.user)
+
+    def assertSameOutput(self, serializer_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        actual = CompiledSerializer(serializer_class).serialize(queryset)
+        self.assertEqual(json.loads(ORJSONRenderer().render(actual)), json.loads(ORJSONRenderer().render(expected)))
+
+    def test_inventory(self):
+        self.assertSameOutput(InventorySerializer, Inventory.objects.all())
+
+    def test_barcodes_with_null_relations(self):
+        self.assertSameOutput(BarcodeSerializer, Barcode.objects.all())
+
+    def test_scan_records(self):
+        self.assertSameOutput(ScanningHistorySerializer, ScanningHistory.objects.all())
+
+    def test_list_endpoint_uses_compiled_path(self):
+        response = self.client.get('/api/materials/inventory/')
+        self.assertEqual(response.status_code, 200)
+        expected = InventorySerializer(Inventory.objects.filter(is_deleted=False), many=True).data
+        self.assertEqual(response.json()['results'], json.loads(ORJSONRenderer().render(expected)))
+
+        response = self.client.get('/api/scanning/barcodes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
@@ -0,0 +1,104 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from apps.materials.models import Contact, Location, Supplier
+from apps.system.conditional import etag_matches, is_not_modified
+from apps.users.models import User
+from apps.warehouse.models import Warehouse
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'conditional-tests',
+    }
+}
+
+
+class ValidatorTests(SimpleTestCase):
+    """条件请求头判断"""
+
+    def test_etag_weak_comparison(self):
+        self.assertTrue(etag_matches('W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches('W/"abc"', '"x", W/"abc"'))
+        self.assertTrue(etag_matches('W/"abc"', '*'))
+        self.assertFalse(etag_matches('W/"abc"', '"abd"'))
+
+    def test_if_none_match_takes_precedence(self):
+        request = RequestFactory().get(
+            '/', HTTP_IF_NONE_MATCH='"other"', HTTP_IF_MODIFIED_SINCE='Wed, 01 Jan 2098 00:00:00 GMT'
+        )
+        self.assertFalse(is_not_modified(request, 'W/"abc"', 1000.0))
+
+    def test_if_modified_since(self):
+        request = RequestFactory().get('/', HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 1970 00:16:40 GMT')
+        self.assertTrue(is_not_modified(request, 'W/"abc"', 1000.5))
+        self.assertFalse(is_not_modified(request, 'W/"abc"', 1001.0))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ConditionalGetAPITests(APITestCase):
+    """基础数据接口的条件请求"""
+
+    url = '/api/materials/locations/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='conditional', password='conditional-password')
+        self.client.force_authenticate(self.user)
+        self.warehouse = Warehouse.objects.create(
+            name='成品仓', address='一号路', contact_person='张三', contact_phone='13800000000', area=100
+        )
+        self.location = Location.objects.create(code='L1', name='库位1', warehouse=self.warehouse, created_by=self.user)
+
+    def test_not_modified_skips_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('mat_location' in query['sql'] for query in context.captured_queries))
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_query_string(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(f'{self.url}?fields=id,name', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_related_table_change_invalidates(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.warehouse.name = '原料仓'
+            self.warehouse.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['warehouse_name'], '原料仓')
+
+    def test_detail(self):
+        url = f'{self.url}{self.location.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.location.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_embedded_contact_change_invalidates_supplier(self):
+        supplier = Supplier.objects.create(
+            code='SUP1', name='辅料厂', contact_person='赵六', contact_phone='13800000003',
+            address='四号路', created_by=self.user
+        )
+        url = f'/api/materials/suppliers/{supplier.pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Contact.objects.create(supplier=supplier, name='联系人', phone='13800000004', created_by=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([contact['name'] for contact in response.json()['contacts']], ['联系人'])
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from apps.system.middleware import EndpointLabelGuard, OTHER_LABEL, get_metric_labels
+
+
+class MetricLabelTests(SimpleTestCase):
+    """HTTP指标标签测试"""
+
+    def make_request(self, method='GET', route=None, view_name=None):
+        resolver_match = None
+        if route is not None:
+            resolver_match = SimpleNamespace(route=route, view_name=view_name)
+        return SimpleNamespace(method=method, resolver_match=resolver_match)
+
+    def test_route_template_used_as_endpoint(self):
+        """使用路由模板而不是原始路径"""
+        request = self.make_request(route='^api/orders/(?P<pk>[^/.]+)/$', view_name='order-detail')
+        self.assertEqual(
+            get_metric_labels(request),
+            ('GET', 'api/orders/(?P<pk>[^/.]+)/', 'order-detail')
+        )
+        # include() 拼接的多段路由
+        request = self.make_request(route='api/production/^orders/(?P<pk>[^/.]+)/$', view_name='order-detail')
+        self.assertEqual(get_metric_labels(request)[1], 'api/production/orders/(?P<pk>[^/.]+)/')
+
+    def test_unresolved_path_is_other(self):
+        """未匹配路由和未知方法归入 other"""
+        request = self.make_request(method='PROPFIND')
+        self.assertEqual(get_metric_labels(request), (OTHER_LABEL, OTHER_LABEL, OTHER_LABEL))
+
+    def test_guard_caps_cardinality(self):
+        """超出上限的新标签归入 other，已记录的标签不受影响"""
+        guard = EndpointLabelGuard(max_labels=2)
+        self.assertEqual(guard.check('a/', 'a'), ('a/', 'a'))
+        self.assertEqual(guard.check('b/', 'b'), ('b/', 'b'))
+        self.assertEqual(guard.check('c/', 'c'), (OTHER_LABEL, OTHER_LABEL))
+        self.assertEqual(guard.check('a/', 'a'), ('a/', 'a'))
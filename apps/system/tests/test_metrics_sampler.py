@@ -0,0 +1,91 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.system import metrics_sampler
+
+
+class SamplerLeadershipTests(SimpleTestCase):
+    """多进程模式下的采样进程选举"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        environ = mock.patch.dict(os.environ, {'prometheus_multiproc_dir': directory.name})
+        environ.start()
+        self.addCleanup(environ.stop)
+        metrics_settings = override_settings(PROMETHEUS_METRICS={'DIRECTORY': directory.name})
+        metrics_settings.enable()
+        self.addCleanup(metrics_settings.disable)
+
+    def release(self, sampler):
+        sampler._lock_file.close()
+        sampler._lock_file = None
+
+    def test_only_one_sampler_holds_the_lock(self):
+        leader = metrics_sampler.SystemMetricsSampler()
+        follower = metrics_sampler.SystemMetricsSampler()
+        self.assertTrue(leader.acquire_leadership())
+        self.assertFalse(follower.acquire_leadership())
+        self.assertIsNone(follower._lock_file)
+
+        # 采样进程退出（锁文件关闭）后由其它进程接管
+        self.release(leader)
+        self.assertTrue(follower.acquire_leadership())
+        self.release(follower)
+
+    def test_single_process_mode_always_samples(self):
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertTrue(metrics_sampler.SystemMetricsSampler().acquire_leadership())
+
+
+class SamplerGaugeTests(SimpleTestCase):
+    """采样结果写入指标"""
+
+    def test_sample_sets_gauges(self):
+        memory = SimpleNamespace(total=8000, available=3000, used=5000)
+        disk = SimpleNamespace(total=100, used=60, free=40)
+        with mock.patch.object(metrics_sampler.psutil, 'virtual_memory', return_value=memory), \
+                mock.patch.object(metrics_sampler.psutil, 'cpu_percent', return_value=42.5), \
+                mock.patch.object(metrics_sampler.psutil, 'disk_usage', return_value=disk):
+            sampler = metrics_sampler.SystemMetricsSampler()
+            sampler._partitions = ['/data']
+            sampler._partitions_loaded_at = float('inf')
+            sampler.sample()
+
+        memory_gauge = metrics_sampler.SYSTEM_MEMORY_USAGE
+        disk_gauge = metrics_sampler.SYSTEM_DISK_USAGE
+        self.assertEqual(memory_gauge.labels(type='total')._value.get(), 8000)
+        self.assertEqual(memory_gauge.labels(type='used')._value.get(), 5000)
+        self.assertEqual(metrics_sampler.SYSTEM_CPU_USAGE._value.get(), 42.5)
+        self.assertEqual(disk_gauge.labels(type='free', mount='/data')._value.get(), 40)
+
+    def test_tick_passes_reading_to_listeners(self):
+        received = []
+        listeners = mock.patch.object(metrics_sampler, '_listeners', [received.append])
+        listeners.start()
+        self.addCleanup(listeners.stop)
+        sampler = metrics_sampler.SystemMetricsSampler()
+        sampler._partitions = ['/']
+        sampler._partitions_loaded_at = float('inf')
+        with mock.patch.dict(os.environ, clear=True), \
+                mock.patch.object(metrics_sampler.psutil, 'cpu_percent', return_value=12.0) as cpu_percent:
+            sampler.tick()
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['cpu_usage'], 12.0)
+        self.assertIn('/', received[0]['disks'])
+        # 回调共用同一份读数，不再各自调用 cpu_percent
+        cpu_percent.assert_called_once_with(interval=None)
+
+    def test_not_started_outside_server_processes(self):
+        """测试和管理命令进程不加载 WSGI/ASGI 入口，不启动采样线程"""
+        self.assertIsNone(metrics_sampler._sampler)
+
+    @override_settings(PROMETHEUS_METRICS={'SYSTEM_SAMPLER_ENABLED': False})
+    def test_install_respects_setting(self):
+        with mock.patch.object(metrics_sampler, 'start_system_metrics_sampler') as start:
+            metrics_sampler.install_system_metrics_sampler()
+        start.assert_not_called()
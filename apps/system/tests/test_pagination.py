@@ -0,0 +1,90 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from apps.materials.models import Material
+from apps.scanning.models import Barcode, ScanningHistory
+from apps.system.models import OperationLog
+from apps.system.pagination import get_count
+from apps.users.models import User
+
+
+class GetCountTests(TestCase):
+    """总数计算模式"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='counter', password='counter-password')
+        for n in range(5):
+            OperationLog.objects.create(
+                user=user, operation_type='query', operation_module='system', operation_desc=f'查询{n}'
+            )
+
+    def test_capped(self):
+        queryset = OperationLog.objects.all()
+        self.assertEqual(get_count(queryset, 'capped', 10), (5, False))
+        self.assertEqual(get_count(queryset, 'capped', 3), (3, True))
+
+    def test_none(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(get_count(OperationLog.objects.all(), 'none'), (None, False))
+
+    def test_estimated_falls_back_to_capped_without_postgresql(self):
+        self.assertEqual(get_count(OperationLog.objects.all(), 'estimated', 10), (5, False))
+
+
+class CursorPaginationAPITests(APITestCase):
+    """扫码记录和操作日志的游标分页"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='cursor', password='cursor-password')
+        self.client.force_authenticate(self.user)
+        material = Material.objects.create(code='M1', name='面料', category='面料', unit='米', created_by=self.user)
+        barcode = Barcode.objects.create(
+            barcode_number='B1', barcode_type='material', material=material, created_by=self.user
+        )
+        self.scans = [
+            ScanningHistory.objects.create(barcode=barcode, operation_type='material_inbound', created_by=self.user)
+            for _ in range(5)
+        ]
+
+    def test_cursor_walks_all_rows_once(self):
+        url, ids = '/api/scanning/scan-records/?page_size=2', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            data = response.json()
+            self.assertEqual(data['count'], 5)
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+        self.assertEqual(ids, sorted((scan.id for scan in self.scans), reverse=True))
+
+    def test_page_number_compatibility(self):
+        data = self.client.get('/api/scanning/scan-records/?page=3&page_size=2').json()
+        self.assertEqual([item['id'] for item in data['results']], [self.scans[0].id])
+        self.assertIsNone(data['next'])
+        self.assertIn('page=2', data['previous'])
+
+    @override_settings(CURSOR_PAGINATION={'COUNT_MODE': 'none'})
+    def test_count_free_mode(self):
+        with CaptureQueriesContext(connection) as context:
+            data = self.client.get('/api/scanning/scan-records/?page_size=2').json()
+        self.assertIsNone(data['count'])
+        self.assertEqual(len(data['results']), 2)
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in context.captured_queries))
+
+    @override_settings(CURSOR_PAGINATION={'COUNT_THRESHOLD': 3})
+    def test_capped_count(self):
+        data = self.client.get('/api/scanning/scan-records/').json()
+        self.assertEqual(data['count'], 3)
+        self.assertTrue(data['count_approximate'])
+
+    def test_log_envelope(self):
+        for n in range(3):
+            OperationLog.objects.create(
+                user=self.user, operation_type='query', operation_module='system', operation_desc=f'查询{n}'
+            )
+        data = self.client.get('/api/system/logs/?page_size=2').json()['data']
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(len(data['items']), 2)
+        self.assertIsNotNone(data['next'])
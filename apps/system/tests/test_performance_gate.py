@@ -0,0 +1,42 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+GATE_SCRIPT = os.path.join(settings.BASE_DIR, 'tools', 'monitor_api_performance.py')
+GATE_DEPENDENCIES = ('requests', 'numpy', 'tabulate', 'matplotlib')
+
+
+@unittest.skipUnless(
+    all(importlib.util.find_spec(name) for name in GATE_DEPENDENCIES), '性能回归检测依赖未安装'
+)
+class LocalGateSmokeTests(SimpleTestCase):
+    """性能回归检测 --local 模式冒烟测试"""
+
+    def test_local_gate_runs_whole_suite(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        output = os.path.join(workdir.name, 'report')
+        result = subprocess.run(
+            [
+                sys.executable, GATE_SCRIPT, '--gate', '--local',
+                '--local-dir', os.path.join(workdir.name, 'local'), '--output', output,
+                '--seed-rows', '5', '--warmup', '0', '--iterations', '2', '--concurrency', '1',
+                '--resamples', '20',
+            ],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=300,
+        )
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+        with open(os.path.join(output, os.listdir(output)[0]), encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertTrue(report['endpoints'])
+        for name, stats in report['endpoints'].items():
+            self.assertEqual(stats['errors'], 0, f"{name}: {stats.get('error_types')}")
+            self.assertEqual(stats['count'], 2)
@@ -0,0 +1,266 @@
+from datetime import date
+
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from apps.customer.models import Customer
+from apps.materials.models import (
+    Contact, Inventory, Location, Material, MaterialSupplier, ProcurementOrder, ProcurementRequirement
+)
+from apps.materials.models import Supplier as MaterialsSupplier
+from apps.materials.serializers import (
+    InventoryDetailSerializer, InventorySerializer, InventoryTransactionSerializer,
+    MaterialDetailSerializer, ProcurementRequirementSerializer
+)
+from apps.production.models import Batch, CuttingTask, Order, ProductionException, ProductionPlan
+from apps.scanning.models import Barcode, ScanningHistory
+from apps.settlement.models import Reconciliation, SettlementBill
+from apps.settlement.serializers import SettlementBillDetailSerializer
+from apps.settlement.views import ReconciliationViewSet
+from apps.supplier.models import Supplier
+from apps.system.queryset_optimizer import build_plan, method_attribute_chains
+from apps.users.models import User
+from apps.warehouse.models import Warehouse
+
+
+class QueryPlanTests(SimpleTestCase):
+    """查询计划推导测试"""
+
+    def test_method_fields_become_select_related(self):
+        plan = build_plan(InventorySerializer)
+        self.assertEqual(sorted(plan.select_related), ['location', 'material'])
+        self.assertEqual(plan.prefetch_related, [])
+        for column in ('id', 'status', 'material', 'material__code', 'material__name', 'location__name'):
+            self.assertIn(column, plan.only)
+        self.assertNotIn('material__specifications', plan.only)
+
+    def test_nested_serializers_follow_source_paths(self):
+        plan = build_plan(InventoryDetailSerializer)
+        self.assertEqual(sorted(plan.select_related), ['location', 'location__warehouse', 'material'])
+        self.assertIn('location__warehouse__name', plan.only)
+
+        plan = build_plan(InventoryTransactionSerializer)
+        self.assertIn('inventory__material', plan.select_related)
+        self.assertIn('inventory__location', plan.select_related)
+        self.assertIn('inventory__material__code', plan.only)
+        self.assertIn('operator', plan.select_related)
+        self.assertIn('operator__username', plan.only)
+
+    def test_many_nested_serializers_are_prefetched(self):
+        plan = build_plan(SettlementBillDetailSerializer)
+        self.assertEqual(plan.select_related, ['supplier'])
+        self.assertEqual(
+            sorted(plan.prefetch_related),
+            ['approval_history', 'approval_history__created_by', 'items', 'payments']
+        )
+
+    def test_primary_key_fields_do_not_join(self):
+        """只输出主键的关联字段只需要外键列"""
+        plan = build_plan(ProcurementRequirementSerializer)
+        self.assertEqual(sorted(plan.select_related), ['approver', 'material', 'requester'])
+        self.assertIn('production_order', plan.only)
+
+    def test_opaque_method_disables_only(self):
+        """obj 被整体传给查询时无法确定访问的列"""
+        self.assertIsNone(method_attribute_chains(MaterialDetailSerializer.get_suppliers))
+        self.assertIsNone(build_plan(MaterialDetailSerializer).only)
+
+    def test_truthiness_checks_do_not_load_whole_relation(self):
+        chains = method_attribute_chains(InventorySerializer.get_location_name)
+        self.assertIn((['location'], True), chains)
+        self.assertIn((['location', 'name'], False), chains)
+
+
+class ListQueryCountTests(APITestCase):
+    """列表接口的查询数不随行数增长"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='optimizer', password='optimizer-password')
+        self.client.force_authenticate(self.user)
+        self.warehouse = Warehouse.objects.create(
+            name='成品仓', address='一号路', contact_person='张三', contact_phone='13800000000', area=100
+        )
+        self.customer = Customer.objects.create(
+            name='客户', contact_person='李四', contact_phone='13800000001', address='二号路', created_by=self.user
+        )
+        self.supplier = Supplier.objects.create(
+            name='面料厂', supplier_type='material', contact_person='王五', contact_phone='13800000002',
+            address='三号路', business_license='L001', tax_number='T001', bank_name='银行',
+            bank_account='6222', payment_terms='月结', created_by=self.user
+        )
+        self.materials_supplier = MaterialsSupplier.objects.create(
+            code='SUP001', name='辅料厂', contact_person='赵六', contact_phone='13800000003',
+            address='四号路', created_by=self.user
+        )
+        self.counter = 0
+
+    def next_number(self):
+        self.counter += 1
+        return self.counter
+
+    def make_material(self):
+        n = self.next_number()
+        return Material.objects.create(code=f'M{n}', name=f'面料{n}', category='面料', unit='米', created_by=self.user)
+
+    def make_location(self):
+        n = self.next_number()
+        return Location.objects.create(code=f'L{n}', name=f'库位{n}', warehouse=self.warehouse, created_by=self.user)
+
+    def make_order(self):
+        n = self.next_number()
+        return Order.objects.create(
+            order_number=f'O{n}', customer=self.customer, product_name='衬衫', quantity=10,
+            unit_price=10, total_amount=100, delivery_date=date(2024, 1, 1), created_by=self.user
+        )
+
+    def make_barcode(self):
+        n = self.next_number()
+        return Barcode.objects.create(
+            barcode_number=f'B{n}', barcode_type='material', material=self.make_material(),
+            warehouse=self.warehouse, order=self.make_order(), created_by=self.user
+        )
+
+    def make_inventory(self):
+        return Inventory.objects.create(material=self.make_material(), location=self.make_location(), created_by=self.user)
+
+    def make_settlement(self):
+        n = self.next_number()
+        return SettlementBill.objects.create(
+            supplier=self.supplier, bill_number=f'ST{n}', period_start=date(2024, 1, 1),
+            period_end=date(2024, 1, 31), created_by=self.user
+        )
+
+    def make_requirement(self):
+        n = self.next_number()
+        return ProcurementRequirement.objects.create(
+            requirement_number=f'R{n}', material=self.make_material(), quantity=1,
+            required_date=date(2024, 1, 1), requester=self.user, approver=self.user,
+            reason='补货', created_by=self.user
+        )
+
+    def make_procurement_order(self):
+        n = self.next_number()
+        return ProcurementOrder.objects.create(
+            order_number=f'PO{n}', supplier=self.materials_supplier, order_date=date(2024, 1, 1),
+            expected_delivery_date=date(2024, 1, 10), purchaser=self.user, approver=self.user,
+            created_by=self.user
+        )
+
+    def make_materials_supplier(self):
+        n = self.next_number()
+        supplier = MaterialsSupplier.objects.create(
+            code=f'SUP{n}', name=f'辅料厂{n}', contact_person='赵六', contact_phone='13800000003',
+            address='四号路', created_by=self.user
+        )
+        Contact.objects.create(supplier=supplier, name='联系人', phone='13800000004', created_by=self.user)
+        MaterialSupplier.objects.create(material=self.make_material(), supplier=supplier, created_by=self.user)
+        return supplier
+
+    def make_reconciliation(self):
+        n = self.next_number()
+        return Reconciliation.objects.create(
+            supplier=self.supplier, reconciliation_number=f'RC{n}', month='2024-01', created_by=self.user
+        )
+
+    def make_plan(self):
+        n = self.next_number()
+        return ProductionPlan.objects.create(
+            order=self.make_order(), plan_number=f'P{n}', start_date=date(2024, 1, 1),
+            end_date=date(2024, 1, 10), responsible_person=self.user
+        )
+
+    def make_cutting_task(self):
+        n = self.next_number()
+        return CuttingTask.objects.create(
+            production_plan=self.make_plan(), task_number=f'CT{n}', material='面料', quantity=10,
+            assigned_to=self.user
+        )
+
+    def make_exception(self):
+        return ProductionException.objects.create(
+            production_plan=self.make_plan(), exception_type='设备', severity='low',
+            description='停机', reported_by=self.user
+        )
+
+    def make_batch(self):
+        n = self.next_number()
+        return Batch.objects.create(
+            production_plan=self.make_plan(), batch_number=f'BT{n}', quantity=10,
+            start_date=date(2024, 1, 1), end_date=date(2024, 1, 10)
+        )
+
+    def make_scan(self):
+        return ScanningHistory.objects.create(
+            barcode=self.make_barcode(), operation_type='material_inbound',
+            location_barcode=self.make_barcode(), created_by=self.user
+        )
+
+    def count_queries(self, url):
+        """url 为视图函数时直接调用（用于没有注册路由的视图集）"""
+        with CaptureQueriesContext(connection) as context:
+            if callable(url):
+                request = APIRequestFactory().get('/')
+                force_authenticate(request, self.user)
+                response = url(request)
+            else:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data if callable(url) else response.content)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url, factory):
+        factory()
+        single = self.count_queries(url)
+        for _ in range(5):
+            factory()
+        self.assertEqual(self.count_queries(url), single, url)
+
+    def test_material_list(self):
+        self.assertConstantQueries('/api/materials/materials/', self.make_material)
+
+    def test_location_list(self):
+        self.assertConstantQueries('/api/materials/locations/', self.make_location)
+
+    def test_inventory_list(self):
+        self.assertConstantQueries('/api/materials/inventory/', self.make_inventory)
+
+    def test_procurement_requirement_list(self):
+        self.assertConstantQueries('/api/materials/procurement/requirements/', self.make_requirement)
+
+    def test_procurement_order_list(self):
+        self.assertConstantQueries('/api/materials/procurement/orders/', self.make_procurement_order)
+
+    def test_settlement_list(self):
+        self.assertConstantQueries('/api/settlement/settlements/', self.make_settlement)
+
+    def test_barcode_list(self):
+        self.assertConstantQueries('/api/scanning/barcodes/', self.make_barcode)
+
+    def test_scan_record_list(self):
+        self.assertConstantQueries('/api/scanning/scan-records/', self.make_scan)
+
+    def test_order_list(self):
+        self.assertConstantQueries('/api/production/orders/', self.make_order)
+
+    def test_materials_supplier_list(self):
+        self.assertConstantQueries('/api/materials/suppliers/', self.make_materials_supplier)
+
+    def test_factory_list(self):
+        self.assertConstantQueries('/api/settlement/factories/', self.make_reconciliation)
+
+    def test_reconciliation_list(self):
+        view = ReconciliationViewSet.as_view({'get': 'list'})
+        self.assertConstantQueries(view, self.make_reconciliation)
+
+    def test_production_plan_list(self):
+        self.assertConstantQueries('/api/production/production-plans/', self.make_plan)
+
+    def test_cutting_task_list(self):
+        self.assertConstantQueries('/api/production/cutting-tasks/', self.make_cutting_task)
+
+    def test_production_exception_list(self):
+        self.assertConstantQueries('/api/production/exceptions/', self.make_exception)
+
+    def test_batch_list(self):
+        self.assertConstantQueries('/api/production/batches/', self.make_batch)
@@ -0,0 +1,100 @@
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from apps.materials.models import Inventory, Location, Material
+from apps.materials.serializers import InventorySerializer, MaterialDetailSerializer
+from apps.system.compiled_serializers import CompiledSerializer
+from apps.system.queryset_optimizer import build_plan
+from apps.system.sparse_fieldsets import parse_field_list, prune_serializer, select_fields
+from apps.users.models import User
+from apps.warehouse.models import Warehouse
+
+
+class SelectFieldsTests(SimpleTestCase):
+    """字段选择测试"""
+
+    available = ('id', 'name', 'status', 'status_display', 'created_at')
+
+    def test_parse(self):
+        self.assertEqual(parse_field_list(' id, name ,,status '), ['id', 'name', 'status'])
+        self.assertEqual(parse_field_list(None), [])
+
+    def test_fields_keep_serializer_order_and_ignore_unknown(self):
+        self.assertEqual(select_fields(self.available, ['status', 'id', 'unknown']), ('id', 'status'))
+
+    def test_omit(self):
+        self.assertEqual(select_fields(self.available, omit=['created_at']), ('id', 'name', 'status', 'status_display'))
+        self.assertEqual(select_fields(self.available, ['id', 'name'], ['name']), ('id',))
+
+    def test_no_restriction(self):
+        self.assertIsNone(select_fields(self.available))
+        self.assertIsNone(select_fields(self.available, omit=['unknown']))
+
+    def test_only_unknown_fields_is_no_restriction(self):
+        """fields 全部拼写错误时返回全部字段，而不是空对象"""
+        self.assertIsNone(select_fields(self.available, ['unknown', 'nmae']))
+        self.assertEqual(select_fields(self.available, ['unknown'], ['created_at']), ('id', 'name', 'status', 'status_display'))
+
+    def test_prune_many_serializer(self):
+        serializer = prune_serializer(InventorySerializer([], many=True), ('id', 'quantity'))
+        self.assertEqual(list(serializer.child.fields), ['id', 'quantity'])
+
+
+class SparsePlanTests(SimpleTestCase):
+    """裁剪字段后的查询计划"""
+
+    def test_unrequested_method_fields_do_not_join(self):
+        plan = build_plan(InventorySerializer, ('id', 'quantity', 'status_display'))
+        self.assertEqual(plan.select_related, [])
+        self.assertEqual(plan.only, ['id', 'quantity', 'status'])
+
+    def test_pruning_opaque_method_enables_only(self):
+        self.assertIsNone(build_plan(MaterialDetailSerializer).only)
+        self.assertEqual(build_plan(MaterialDetailSerializer, ('id', 'name')).only, ['id', 'name'])
+
+    def test_compiled_projection(self):
+        compiled = CompiledSerializer(InventorySerializer, ('id', 'location_name'))
+        self.assertEqual(compiled.lookups, ['id', 'location', 'location__name'])
+
+
+class SparseFieldsetAPITests(APITestCase):
+    """列表接口的稀疏字段集"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='sparse', password='sparse-password')
+        self.client.force_authenticate(user)
+        warehouse = Warehouse.objects.create(
+            name='成品仓', address='一号路', contact_person='张三', contact_phone='13800000000', area=100
+        )
+        for n in range(3):
+            material = Material.objects.create(code=f'M{n}', name=f'面料{n}', category='面料', unit='米', created_by=user)
+            location = Location.objects.create(code=f'L{n}', name=f'库位{n}', warehouse=warehouse, created_by=user)
+            Inventory.objects.create(material=material, location=location, quantity=n, created_by=user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), ' '.join(query['sql'] for query in context.captured_queries)
+
+    def test_fields(self):
+        data, sql = self.get('/api/materials/inventory/?fields=id,quantity,status_display')
+        self.assertEqual(set(data['results'][0]), {'id', 'quantity', 'status_display'})
+        self.assertNotIn('mat_location', sql)
+
+    def test_omit(self):
+        data, _ = self.get('/api/materials/inventory/?omit=material_name,location_name,created_at')
+        self.assertNotIn('material_name', data['results'][0])
+        self.assertIn('batch_number', data['results'][0])
+
+    def test_retrieve(self):
+        inventory = Inventory.objects.first()
+        data, _ = self.get(f'/api/materials/inventory/{inventory.pk}/?fields=id,status')
+        self.assertEqual(set(data), {'id', 'status'})
+
+    def test_uncompiled_list(self):
+        data, sql = self.get('/api/materials/materials/?fields=id,code')
+        self.assertEqual(set(data['results'][0]), {'id', 'code'})
+        self.assertNotIn('specifications', sql)
@@ -0,0 +1,139 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.system import tracing
+
+
+class TracingTests(SimpleTestCase):
+    """链路追踪测试"""
+
+    def setUp(self):
+        patcher = mock.patch.object(tracing, 'get_exporter')
+        self.exporter = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_traceparent_round_trip(self):
+        context = tracing.SpanContext('a' * 32, 'b' * 16, sampled=True)
+        parsed = tracing.SpanContext.from_traceparent(context.to_traceparent())
+        self.assertEqual((parsed.trace_id, parsed.span_id, parsed.sampled), ('a' * 32, 'b' * 16, True))
+        self.assertIsNone(tracing.SpanContext.from_traceparent('garbage'))
+
+    def test_no_span_without_sampled_parent(self):
+        """没有采样的父 span 时不记录"""
+        with tracing.span('db.query', category='db') as record:
+            self.assertIsNone(record)
+        unsampled = tracing.SpanContext('a' * 32, 'b' * 16, sampled=False)
+        with tracing.span('db.query', parent=unsampled) as record:
+            self.assertIsNone(record)
+        self.exporter.submit.assert_not_called()
+
+    def test_child_spans_share_trace_and_feed_server_timing(self):
+        timings = tracing.RequestTimings()
+        token = tracing._request_timings.set(timings)
+        try:
+            with tracing.span('HTTP GET', category='http', root=True) as root:
+                with tracing.span('db.query', category='db') as child:
+                    pass
+                message = tracing.inject({'type': 'order_update'})
+        finally:
+            tracing._request_timings.reset(token)
+
+        self.assertEqual(child.context.trace_id, root.context.trace_id)
+        self.assertEqual(child.parent_id, root.context.span_id)
+        self.assertEqual(tracing.extract(message).trace_id, root.context.trace_id)
+        self.assertEqual(self.exporter.submit.call_count, 2)
+        header = timings.header(root.duration_ms)
+        self.assertIn('db;dur=', header)
+        self.assertIn('total;dur=', header)
+        self.assertNotIn('http', header)
+
+    def test_inject_without_trace_returns_message(self):
+        message = {'type': 'notification_message'}
+        self.assertIs(tracing.inject(message), message)
+
+
+class SamplingTests(SimpleTestCase):
+    """入口采样决策"""
+
+    config = dict(tracing.DEFAULT_TRACING_SETTINGS, SAMPLE_RATE=0, UPSTREAM_SAMPLE_LIMIT=2)
+
+    def setUp(self):
+        patcher = mock.patch.object(tracing, '_forced_samples', tracing.ForcedSampleLimiter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_trusted_upstream_followed(self):
+        self.assertTrue(tracing.is_trusted_upstream('127.0.0.1', self.config))
+        self.assertTrue(tracing.is_trusted_upstream('10.1.2.3', dict(self.config, TRUSTED_UPSTREAMS=['10.0.0.0/8'])))
+        self.assertFalse(tracing.is_trusted_upstream('203.0.113.5', self.config))
+        sampled = tracing.SpanContext('a' * 32, 'b' * 16, sampled=True)
+        for _ in range(5):
+            self.assertTrue(tracing.should_sample(sampled, self.config, trusted=True))
+
+    def test_untrusted_forced_sampling_limited(self):
+        sampled = tracing.SpanContext('a' * 32, 'b' * 16, sampled=True)
+        results = [tracing.should_sample(sampled, self.config) for _ in range(5)]
+        self.assertEqual(results, [True, True, False, False, False])
+
+    def test_untrusted_unsampled_flag_uses_sample_rate(self):
+        unsampled = tracing.SpanContext('a' * 32, 'b' * 16, sampled=False)
+        self.assertTrue(tracing.should_sample(unsampled, dict(self.config, SAMPLE_RATE=1)))
+        self.assertFalse(tracing.should_sample(unsampled, self.config, trusted=True))
+
+
+class ExportFileRotationTests(SimpleTestCase):
+    """导出文件按大小轮转"""
+
+    def test_rotate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'traces.jsonl')
+            for content in ('first', 'second', 'third'):
+                with open(path, 'w') as f:
+                    f.write(content)
+                tracing.rotate_file(path, max_bytes=4, backups=2)
+            self.assertFalse(os.path.exists(path))
+            with open(f'{path}.1') as f:
+                self.assertEqual(f.read(), 'third')
+            with open(f'{path}.2') as f:
+                self.assertEqual(f.read(), 'second')
+            self.assertFalse(os.path.exists(f'{path}.3'))
+
+    def test_small_file_kept(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'traces.jsonl')
+            with open(path, 'w') as f:
+                f.write('ok')
+            tracing.rotate_file(path, max_bytes=1024, backups=2)
+            self.assertTrue(os.path.exists(path))
+
+
+class ServerTimingTests(SimpleTestCase):
+    """Server-Timing 只返回给 DEBUG 环境或管理员"""
+
+    def setUp(self):
+        patcher = mock.patch.object(tracing, 'get_exporter')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.middleware = tracing.TracingMiddleware(lambda request: HttpResponse('ok'))
+
+    def get(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        with override_settings(TRACING={'SAMPLE_RATE': 1}):
+            return self.middleware(request)
+
+    @override_settings(DEBUG=False)
+    def test_hidden_from_anonymous(self):
+        response = self.get(AnonymousUser())
+        self.assertIn('traceparent', response)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(DEBUG=False)
+    def test_shown_to_staff(self):
+        user = mock.Mock(is_authenticated=True, is_staff=True)
+        self.assertIn('Server-Timing', self.get(user))
@@ -0,0 +1,573 @@
+"""
+进程内链路追踪
+
+为单个请求记录以下环节的耗时（span）：
+
+- http        整个请求（TracingMiddleware）
+- view        DRF 视图 dispatch
+- serialize   序列化器 .data
+- db          每次 SQL 执行（connection.execute_wrapper）
+- redis       redis-py 命令和管道（django_redis 缓存、在线状态、事件流）
+- channels    通道层 group_send（跟随事件消息中的 traceparent）
+- celery      Celery 任务（通过任务消息头传递 traceparent）
+
+采样在请求入口决定（head sampling）：来自 TRUSTED_UPSTREAMS 的请求跟随 traceparent 的采样标志；
+其他来源带采样标志的请求每秒最多强制采样 UPSTREAM_SAMPLE_LIMIT 个，其余按 SAMPLE_RATE 随机采样。
+未采样的请求不创建任何 span。
+
+采样的 span 以 OTLP/JSON 格式（resourceSpans）由后台线程批量导出到本地文件（按大小轮转），
+或 POST 到兼容 OTLP/HTTP 的采集器。DEBUG 环境或管理员的采样请求在响应中附带 Server-Timing 头，
+可以直接在浏览器开发者工具中查看各环节耗时。
+"""
+import atexit
+import ipaddress
+import json
+import logging
+import os
+import random
+import secrets
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.TRACING 覆盖
+DEFAULT_TRACING_SETTINGS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.01,           # 头部采样比例
+    'SERVICE_NAME': 'garment-erp',
+    'EXPORT_FILE': os.path.join(settings.BASE_DIR, 'logs', 'traces.jsonl'),
+    'EXPORT_FILE_MAX_BYTES': 50 * 1024 * 1024,  # 导出文件超过该大小时轮转
+    'EXPORT_FILE_BACKUPS': 3,      # 保留的轮转文件数量
+    'EXPORT_ENDPOINT': None,       # OTLP/HTTP 采集器地址，如 http://127.0.0.1:4318/v1/traces
+    'EXPORT_INTERVAL': 2,          # 批量导出间隔（秒）
+    'MAX_QUEUE_SIZE': 10000,       # 待导出 span 上限，超出丢弃最早的
+    'SERVER_TIMING': True,         # 采样的请求是否返回 Server-Timing 头（仅 DEBUG 或管理员）
+    'TRUSTED_UPSTREAMS': ['127.0.0.1', '::1'],  # 信任其 traceparent 采样标志的来源地址或网段
+    'UPSTREAM_SAMPLE_LIMIT': 5,    # 其他来源带采样标志的请求，每秒最多强制采样的数量
+}
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+SPAN_KIND_PRODUCER = 4
+SPAN_KIND_CONSUMER = 5
+
+TRACEPARENT_HEADER = 'HTTP_TRACEPARENT'
+
+_current_span = ContextVar('tracing_current_span', default=None)
+_request_timings = ContextVar('tracing_request_timings', default=None)
+
+
+def get_tracing_settings():
+    """获取链路追踪配置"""
+    config = dict(DEFAULT_TRACING_SETTINGS)
+    config.update(getattr(settings, 'TRACING', {}))
+    return config
+
+
+class SpanContext:
+    """跨进程传递的追踪上下文"""
+
+    __slots__ = ('trace_id', 'span_id', 'sampled')
+
+    def __init__(self, trace_id, span_id, sampled=True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, value):
+        """解析 W3C traceparent，格式错误时返回 None"""
+        try:
+            version, trace_id, span_id, flags = value.strip().split('-')
+            int(trace_id, 16), int(span_id, 16)
+            if len(trace_id) != 32 or len(span_id) != 16 or version == 'ff':
+                return None
+            return cls(trace_id, span_id, bool(int(flags, 16) & 1))
+        except (AttributeError, ValueError):
+            return None
+
+
+class Span:
+    """一个计时环节"""
+
+    __slots__ = ('name', 'category', 'kind', 'context', 'parent_id', 'attributes',
+                 'start_ns', 'end_ns', 'error')
+
+    def __init__(self, name, category, kind, context, parent_id, attributes):
+        self.name = name
+        self.category = category
+        self.kind = kind
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.context.trace_id,
+            'spanId': self.context.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [
+                {'key': key, 'value': otlp_value(value)}
+                for key, value in self.attributes.items() if value is not None
+            ],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+def otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class RequestTimings:
+    """按类别累计请求内各环节的耗时，用于 Server-Timing"""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, category, duration):
+        self.durations[category] = self.durations.get(category, 0.0) + duration
+        self.counts[category] = self.counts.get(category, 0) + 1
+
+    def header(self, total):
+        parts = [
+            f'{category};dur={duration:.1f};desc="{self.counts[category]}"'
+            for category, duration in self.durations.items()
+        ]
+        parts.append(f'total;dur={total:.1f}')
+        return ', '.join(parts)
+
+
+class SpanExporter:
+    """后台批量导出 span"""
+
+    def __init__(self, config):
+        self.config = config
+        self.dropped = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, span):
+        with self._lock:
+            if len(self._queue) >= self.config['MAX_QUEUE_SIZE']:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(span)
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='tracing-exporter', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.config['EXPORT_INTERVAL'])
+            try:
+                self.export()
+            except Exception as e:
+                logger.warning(f'导出链路追踪数据失败: {str(e)}')
+
+    def payload(self, spans):
+        """OTLP/JSON ExportTraceServiceRequest"""
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    {'key': 'service.name', 'value': otlp_value(self.config['SERVICE_NAME'])},
+                    {'key': 'host.name', 'value': otlp_value(socket.gethostname())},
+                    {'key': 'process.pid', 'value': otlp_value(os.getpid())},
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+
+    def export(self):
+        with self._lock:
+            spans = list(self._queue)
+            self._queue.clear()
+        if not spans:
+            return
+        payload = self.payload(spans)
+        endpoint = self.config['EXPORT_ENDPOINT']
+        if endpoint:
+            import requests
+            requests.post(endpoint, json=payload, timeout=5)
+        else:
+            path = self.config['EXPORT_FILE']
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            rotate_file(path, self.config['EXPORT_FILE_MAX_BYTES'], self.config['EXPORT_FILE_BACKUPS'])
+            with open(path, 'a') as f:
+                f.write(json.dumps(payload, ensure_ascii=False) + '\n')
+
+
+def rotate_file(path, max_bytes, backups):
+    """文件达到 max_bytes 时轮转为 path.1 … path.N（与 RotatingFileHandler 相同的命名）"""
+    try:
+        if not max_bytes or os.path.getsize(path) < max_bytes:
+            return
+        for n in range(backups - 1, 0, -1):
+            source = f'{path}.{n}'
+            if os.path.exists(source):
+                os.replace(source, f'{path}.{n + 1}')
+        if backups > 0:
+            os.replace(path, f'{path}.1')
+        else:
+            os.remove(path)
+    except OSError as e:
+        # 多个进程同时轮转时文件可能已被移走
+        logger.debug(f'轮转链路追踪文件失败: {str(e)}')
+
+
+_exporter = None
+
+
+def get_exporter():
+    global _exporter
+    if _exporter is None:
+        _exporter = SpanExporter(get_tracing_settings())
+        atexit.register(_exporter.export)
+    return _exporter
+
+
+def new_trace_id():
+    return secrets.token_hex(16)
+
+
+def new_span_id():
+    return secrets.token_hex(8)
+
+
+def current_context():
+    """当前 span 的上下文，没有采样的 span 时返回 None"""
+    current = _current_span.get()
+    return current.context if current is not None else None
+
+
+def extract(message):
+    """从消息中读取追踪上下文"""
+    return SpanContext.from_traceparent(message.get('traceparent') or '')
+
+
+def inject(message):
+    """把当前追踪上下文写入消息（通道层消息、任务消息头），未采样时原样返回"""
+    context = current_context()
+    if context is None:
+        return message
+    return dict(message, traceparent=context.to_traceparent())
+
+
+@contextmanager
+def span(name, category='internal', kind=SPAN_KIND_INTERNAL, parent=None, root=False, **attributes):
+    """
+    记录一个 span
+
+    没有父 span（且不是 root）时不做任何记录，未采样的请求开销只是一次 ContextVar 读取。
+
+    Args:
+        name: span 名称
+        category: Server-Timing 中的类别
+        kind: OTLP span 类型
+        parent: 显式指定的父上下文（跨线程、跨进程时使用）
+        root: 是否作为新的根 span（由入口处的采样结果决定）
+    """
+    current = _current_span.get()
+    parent_context = parent or (current.context if current is not None else None)
+    if parent_context is None and not root:
+        yield None
+        return
+    if parent_context is not None and not parent_context.sampled:
+        yield None
+        return
+
+    trace_id = parent_context.trace_id if parent_context is not None else new_trace_id()
+    record = Span(
+        name, category, kind,
+        SpanContext(trace_id, new_span_id()),
+        parent_context.span_id if parent_context is not None else None,
+        attributes
+    )
+    token = _current_span.set(record)
+    try:
+        yield record
+    except Exception as e:
+        record.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        _current_span.reset(token)
+        record.end_ns = time.time_ns()
+        timings = _request_timings.get()
+        if timings is not None and category not in ('http', 'internal'):
+            timings.add(category, record.duration_ms)
+        get_exporter().submit(record)
+
+
+class ForcedSampleLimiter:
+    """限制不可信来源通过 traceparent 强制采样的频率（每秒固定窗口）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._window = 0
+        self._count = 0
+
+    def allow(self, limit):
+        now = int(time.monotonic())
+        with self._lock:
+            if now != self._window:
+                self._window = now
+                self._count = 0
+            if self._count >= limit:
+                return False
+            self._count += 1
+            return True
+
+
+_forced_samples = ForcedSampleLimiter()
+_trusted_networks = {}
+
+
+def is_trusted_upstream(remote_addr, config):
+    """请求来源是否在 TRUSTED_UPSTREAMS 中"""
+    upstreams = tuple(config['TRUSTED_UPSTREAMS'])
+    networks = _trusted_networks.get(upstreams)
+    if networks is None:
+        networks = []
+        for upstream in upstreams:
+            try:
+                networks.append(ipaddress.ip_network(upstream, strict=False))
+            except ValueError:
+                logger.warning(f'链路追踪配置了无效的来源地址: {upstream}')
+        networks = _trusted_networks[upstreams] = tuple(networks)
+    try:
+        address = ipaddress.ip_address(remote_addr)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+def should_sample(traceparent, config, trusted=False):
+    """
+    头部采样决策
+
+    可信来源的 traceparent 采样标志（采样或不采样）总是被采纳；
+    其他来源的采样标志受 UPSTREAM_SAMPLE_LIMIT 限制，超出后按 SAMPLE_RATE 随机采样。
+    """
+    if traceparent is not None:
+        if trusted:
+            return traceparent.sampled
+        if traceparent.sampled and _forced_samples.allow(config['UPSTREAM_SAMPLE_LIMIT']):
+            return True
+    return random.random() < config['SAMPLE_RATE']
+
+
+def server_timing_allowed(request):
+    """Server-Timing 暴露内部耗时，只返回给 DEBUG 环境或管理员"""
+    if settings.DEBUG:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated and (user.is_staff or user.is_superuser)
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """SQL 执行 span"""
+    with span('db.query', category='db', kind=SPAN_KIND_CLIENT,
+              **{'db.system': context['connection'].vendor, 'db.statement': sql[:1000]}):
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def traced_databases():
+    """在当前作用域内为所有数据库连接安装 SQL span"""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(db_wrapper))
+        yield
+
+
+class TracingMiddleware:
+    """请求入口：采样决策、根 span 和 Server-Timing 响应头"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_tracing_settings()
+        if not config['ENABLED']:
+            return self.get_response(request)
+        parent = SpanContext.from_traceparent(request.META.get(TRACEPARENT_HEADER, ''))
+        trusted = parent is not None and is_trusted_upstream(request.META.get('REMOTE_ADDR', ''), config)
+        if not should_sample(parent, config, trusted):
+            return self.get_response(request)
+        if parent is not None and not parent.sampled:
+            # 本服务自行决定采样，沿用上游的 trace_id 便于关联
+            parent = SpanContext(parent.trace_id, parent.span_id)
+
+        timings = RequestTimings()
+        timings_token = _request_timings.set(timings)
+        try:
+            with span(f'HTTP {request.method}', category='http', kind=SPAN_KIND_SERVER,
+                      parent=parent, root=True,
+                      **{'http.method': request.method, 'http.target': request.path}) as root_span:
+                with traced_databases():
+                    response = self.get_response(request)
+                resolver_match = getattr(request, 'resolver_match', None)
+                if resolver_match is not None and resolver_match.route:
+                    root_span.name = f'HTTP {request.method} {resolver_match.route}'
+                    root_span.attributes['http.route'] = resolver_match.route
+                root_span.attributes['http.status_code'] = response.status_code
+            if config['SERVER_TIMING'] and server_timing_allowed(request):
+                response['Server-Timing'] = timings.header(root_span.duration_ms)
+            response['traceparent'] = root_span.context.to_traceparent()
+            return response
+        finally:
+            _request_timings.reset(timings_token)
+
+
+def _wrap_method(cls, name, span_name, category, kind=SPAN_KIND_INTERNAL, attributes=None):
+    original = getattr(cls, name)
+    if getattr(original, '_traced', False):
+        return
+
+    def wrapper(self, *args, **kwargs):
+        if _current_span.get() is None:
+            return original(self, *args, **kwargs)
+        extra = attributes(self, *args) if attributes else {}
+        with span(span_name(self, *args) if callable(span_name) else span_name, category=category, kind=kind, **extra):
+            return original(self, *args, **kwargs)
+
+    wrapper._traced = True
+    wrapper.__wrapped__ = original
+    wrapper.__name__ = original.__name__
+    wrapper.__doc__ = original.__doc__
+    setattr(cls, name, wrapper)
+
+
+def _wrap_property(cls, name, span_name, category):
+    prop = getattr(cls, name)
+    if getattr(prop.fget, '_traced', False):
+        return
+
+    def getter(self):
+        if _current_span.get() is None:
+            return prop.fget(self)
+        with span(f'{span_name} {type(self).__name__}', category=category):
+            return prop.fget(self)
+
+    getter._traced = True
+    setattr(cls, name, property(getter, prop.fset, prop.fdel, prop.__doc__))
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install():
+    """安装 DRF、redis 和 Celery 的追踪钩子（幂等）"""
+    global _installed
+    if _installed or not get_tracing_settings()['ENABLED']:
+        return
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+
+        from rest_framework import serializers
+        from rest_framework.views import APIView
+        _wrap_method(
+            APIView, 'dispatch',
+            lambda view, request, *args: f'view {type(view).__name__}', 'view'
+        )
+        _wrap_property(serializers.Serializer, 'data', 'serialize', 'serialize')
+        _wrap_property(serializers.ListSerializer, 'data', 'serialize', 'serialize')
+
+        try:
+            import redis.client
+        except ImportError:
+            pass
+        else:
+            _wrap_method(
+                redis.client.Redis, 'execute_command',
+                lambda client, *args: f'redis {args[0]}' if args else 'redis', 'redis', SPAN_KIND_CLIENT,
+                lambda client, *args: {'db.system': 'redis'}
+            )
+            _wrap_method(
+                redis.client.Pipeline, 'execute',
+                'redis PIPELINE', 'redis', SPAN_KIND_CLIENT,
+                lambda pipe, *args: {'db.system': 'redis', 'redis.commands': len(pipe.command_stack)}
+            )
+
+        install_celery()
+
+
+_celery_spans = {}
+
+
+def install_celery():
+    """通过 Celery 任务消息头传递追踪上下文"""
+    try:
+        from celery import signals
+    except ImportError:
+        return
+
+    @signals.before_task_publish.connect(weak=False)
+    def inject_task_headers(headers=None, **kwargs):
+        context = current_context()
+        if context is not None and headers is not None:
+            headers['traceparent'] = context.to_traceparent()
+
+    @signals.task_prerun.connect(weak=False)
+    def start_task_span(task_id=None, task=None, **kwargs):
+        parent = SpanContext.from_traceparent(getattr(task.request, 'traceparent', None) or '')
+        if parent is None or not parent.sampled:
+            return
+        stack = ExitStack()
+        stack.enter_context(span(f'celery {task.name}', category='celery', kind=SPAN_KIND_CONSUMER,
+                                 parent=parent, **{'celery.task_id': task_id}))
+        stack.enter_context(traced_databases())
+        _celery_spans[task_id] = stack
+
+    @signals.task_postrun.connect(weak=False)
+    def end_task_span(task_id=None, **kwargs):
+        stack = _celery_spans.pop(task_id, None)
+        if stack is not None:
+            stack.close()
@@ -19,6 +19,7 @@ from .serializers_developer import (
     ConfigOverrideSerializer, APITestResultSerializer, SystemHealthStatusSerializer
 )
 from .utils import ResponseWrapper
+from developer.system_collector import latest_sample
 
 class APILogViewSet(viewsets.ModelViewSet):
     """API日志视图集"""
@@ -223,9 +224,9 @@ class SystemHealthView(APIView):
             services.append(self._check_database())
             services.append(self._check_cache())
             
-            # 系统资源使用情况
+            # 系统资源使用情况（CPU读取后台采集的最新采样点，不阻塞请求）
             memory = psutil.virtual_memory()
-            cpu = psutil.cpu_percent(interval=1)
+            cpu = latest_sample()['cpu_usage']
             
             status_data = {
                 'status': self._determine_overall_status(services),
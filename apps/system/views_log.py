@@ -10,6 +10,7 @@ import csv
 import json
 from datetime import datetime
 from .models import OperationLog
+from .pagination import CountFreeCursorPagination
 from .serializers import OperationLogSerializer
 from .utils import ResponseWrapper
 
@@ -21,6 +22,8 @@ class LogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = OperationLog.objects.all()
     serializer_class = OperationLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CountFreeCursorPagination
+    ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -61,7 +64,10 @@ class LogViewSet(viewsets.ReadOnlyModelViewSet):
             serializer = self.get_serializer(page, many=True)
             return ResponseWrapper.success({
                 'items': serializer.data,
-                'total': self.paginator.page.paginator.count
+                'total': self.paginator.count,
+                'total_approximate': self.paginator.count_approximate,
+                'next': self.paginator.get_next_link(),
+                'previous': self.paginator.get_previous_link()
             })
         serializer = self.get_serializer(queryset, many=True)
         return ResponseWrapper.success({
@@ -1,11 +1,30 @@
+import asyncio
 import json
+import logging
+import time
+import uuid
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
+from urllib.parse import parse_qs
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from developer.models import WebSocketSession, WebSocketMessage
+from developer.models import WebSocketSession
+from .groups import user_group, alert_groups_for_user
+from .message_log import MessageLogBuffer, write_messages
+from .streams import last_sequences, read_events
+from . import presence
+from . import framing
 
 User = get_user_model()
+logger = logging.getLogger('apps')
+
+# 通道层事件类型与WebSocket帧类型的对应关系
+EVENT_FRAME_TYPES = {
+    'notification_message': 'notification',
+    'alert_message': 'alert',
+    'order_update': 'order_update',
+}
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     """通知WebSocket消费者"""
@@ -22,7 +41,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             return
         
         # 为每个用户创建一个唯一的组名
-        self.group_name = f"user_{self.user_id}"
+        self.group_name = user_group(self.user_id)
         
         # 将用户添加到组
         await self.channel_layer.group_add(
@@ -30,18 +49,45 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        # 记录会话信息
-        self.session_id = await self.create_websocket_session()
+        # 加入告警广播组，系统告警只需向广播组发送一次
+        self.alert_groups = alert_groups_for_user(self.user)
+        for group in self.alert_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        
+        # 在线状态登记在 Redis 中；会话记录只在需要写消息日志或断开时落库
+        self.session_id = uuid.uuid4()
+        self.session_pk = None
+        self.connected_at = timezone.now()
+        self.client_ip = self.scope.get('client')[0] if self.scope.get('client') else None
+        self.last_presence_touch = time.monotonic()
+        await sync_to_async(presence.register, thread_sensitive=False)(
+            self.session_id, self.user, self.client_ip, self.channel_name
+        )
+        
+        # 消息日志缓冲区及定时写入任务
+        self.message_log = MessageLogBuffer(self.session_pk)
+        self.message_log_lock = asyncio.Lock()
+        self.message_log_task = asyncio.ensure_future(self.message_log_flush_loop())
+        
+        # 协商帧格式：客户端请求 erp.msgpack 子协议时使用二进制帧
+        self.frame_format, subprotocol = framing.negotiate(self.scope.get('subprotocols'))
         
         # 接受WebSocket连接
-        await self.accept()
+        await self.accept(subprotocol=subprotocol)
         
-        # 发送连接成功消息
-        await self.send(text_data=json.dumps({
+        # 发送连接成功消息，附带各事件流当前序号供客户端断线重连时使用
+        await self.send_frame({
             'type': 'connection_established',
             'message': '连接已建立',
-            'session_id': str(self.session_id)
-        }))
+            'session_id': str(self.session_id),
+            'streams': await sync_to_async(last_sequences, thread_sensitive=False)(self.stream_groups)
+        })
+        
+        # 客户端通过 ?resume_from=<seq> 携带个人事件流的最后序号时补发缺失事件
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        resume_from = query.get('resume_from', [None])[0]
+        if resume_from is not None:
+            await self.resume_streams(resume_from)
     
     async def disconnect(self, close_code):
         """处理WebSocket断开连接"""
@@ -52,25 +98,52 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
         
-        # 更新会话状态
-        if hasattr(self, 'session_id'):
-            await self.update_websocket_session_disconnect()
+        for group in getattr(self, 'alert_groups', []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+        
+        if not hasattr(self, 'session_id'):
+            return
+        
+        # 注销在线状态
+        await sync_to_async(presence.unregister, thread_sensitive=False)(self.session_id)
+        
+        # 停止定时写入任务并写入剩余的消息日志
+        if hasattr(self, 'message_log_task'):
+            self.message_log_task.cancel()
+            await self.flush_websocket_messages()
+            if self.message_log.dropped:
+                logger.warning(
+                    f'WebSocket会话 {self.session_id} 消息日志缓冲区溢出，'
+                    f'丢弃 {self.message_log.dropped} 条消息'
+                )
+        
+        # 保存会话汇总记录
+        await self.save_websocket_session_summary()
     
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """处理从WebSocket接收到的消息"""
+        # 收到任何帧都说明连接仍然存活，续期在线状态（按 TOUCH_INTERVAL 节流）
+        await self.touch_presence()
+        is_error = False
         try:
-            text_data_json = json.loads(text_data)
+            if bytes_data is not None:
+                # 先记录占位文本，解码失败时消息日志的 message 列不为空
+                text_data = framing.describe_binary(bytes_data)
+                text_data_json = framing.decode(bytes_data)
+                text_data = json.dumps(text_data_json, default=str)
+            else:
+                text_data_json = json.loads(text_data)
             message_type = text_data_json.get('type')
             
-            # 记录接收到的消息
-            await self.create_websocket_message(text_data, 'incoming')
-            
             # 根据消息类型处理
             if message_type == 'ping':
-                await self.send(text_data=json.dumps({
+                await self.send_frame({
                     'type': 'pong',
                     'timestamp': timezone.now().isoformat()
-                }))
+                })
+            elif message_type == 'resume':
+                # 断线重连后补发缺失事件
+                await self.resume_streams(text_data_json.get('resume_from'))
             elif message_type == 'subscribe':
                 # 处理订阅请求
                 channels = text_data_json.get('channels', [])
@@ -82,94 +155,204 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                             self.channel_name
                         )
                 
-                await self.send(text_data=json.dumps({
+                await self.send_frame({
                     'type': 'subscription_success',
                     'channels': channels
-                }))
+                })
             else:
                 # 未知消息类型
-                await self.send(text_data=json.dumps({
+                is_error = True
+                await self.send_frame({
                     'type': 'error',
                     'message': f'未知的消息类型: {message_type}'
-                }))
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({
+                })
+        except (json.JSONDecodeError, ValueError) as e:
+            is_error = True
+            await self.send_frame({
                 'type': 'error',
-                'message': '无效的JSON格式'
-            }))
+                'message': '无效的JSON格式' if isinstance(e, json.JSONDecodeError) else '无效的消息格式'
+            })
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            is_error = True
+            await self.send_frame({
                 'type': 'error',
                 'message': str(e)
-            }))
+            })
+        
+        # 记录接收到的消息
+        await self.create_websocket_message(text_data, 'incoming', is_error=is_error)
     
     # 处理不同类型的消息
     
+    async def force_disconnect(self, event):
+        """开发者控制台关闭会话（presence.close_session）"""
+        await self.close(code=event.get('code', 4000))
+    
     async def notification_message(self, event):
         """处理通知消息"""
-        # 直接将消息发送到WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'notification',
-            'data': event['data']
-        }))
-        
-        # 记录发送的消息
-        await self.create_websocket_message(json.dumps(event), 'outgoing')
+        await self.send_event(event)
     
     async def alert_message(self, event):
         """处理告警消息"""
-        await self.send(text_data=json.dumps({
-            'type': 'alert',
-            'data': event['data']
-        }))
-        
-        # 记录发送的消息
-        await self.create_websocket_message(json.dumps(event), 'outgoing')
+        await self.send_event(event)
     
     async def order_update(self, event):
         """处理订单更新消息"""
-        await self.send(text_data=json.dumps({
-            'type': 'order_update',
+        await self.send_event(event)
+    
+    async def send_event(self, event, replayed=False):
+        """将通道层事件发送到WebSocket，带有事件流序号时一并发送"""
+        frame = {
+            'type': EVENT_FRAME_TYPES[event['type']],
             'data': event['data']
-        }))
+        }
+        if 'seq' in event:
+            frame['seq'] = event['seq']
+            frame['stream'] = event['stream']
+        if replayed:
+            frame['replayed'] = True
+        await self.send_frame(frame, event_id=None if replayed else event.get('event_id'))
         
         # 记录发送的消息
         await self.create_websocket_message(json.dumps(event), 'outgoing')
     
+    async def send_frame(self, frame, event_id=None):
+        """
+        按协商的格式编码并发送帧
+
+        Args:
+            frame: 帧内容
+            event_id: 事件ID，扇出事件按ID复用同一 worker 内的编码结果
+        """
+        encoded = framing.encode_cached(event_id, frame, self.frame_format)
+        if isinstance(encoded, bytes):
+            await self.send(bytes_data=encoded)
+        else:
+            await self.send(text_data=encoded)
+    
+    # 事件流补发
+    
+    @property
+    def stream_groups(self):
+        """当前连接接收事件的组（个人组和告警广播组）"""
+        return [self.group_name] + list(self.alert_groups)
+    
+    async def resume_streams(self, resume_from):
+        """
+        补发断线期间缺失的事件
+
+        Args:
+            resume_from: 个人事件流的最后序号，或 {流名称: 最后序号} 字典
+        """
+        try:
+            if isinstance(resume_from, dict):
+                positions = {
+                    group: int(seq) for group, seq in resume_from.items()
+                    if group in self.stream_groups
+                }
+            else:
+                positions = {self.group_name: int(resume_from)}
+        except (TypeError, ValueError):
+            await self.send_frame({
+                'type': 'error',
+                'message': '无效的 resume_from 参数'
+            })
+            return
+        
+        for group, after_seq in positions.items():
+            try:
+                events, resync_required = await sync_to_async(read_events, thread_sensitive=False)(group, after_seq)
+            except Exception as e:
+                logger.warning(f'读取WebSocket事件流失败: group={group} error={str(e)}')
+                events, resync_required = [], True
+            
+            if resync_required:
+                # 缺失的事件已超出保留范围，客户端需要重新拉取数据
+                await self.send_frame({
+                    'type': 'resync_required',
+                    'stream': group
+                })
+                continue
+            
+            for event in events:
+                if event.get('type') in EVENT_FRAME_TYPES:
+                    await self.send_event(event, replayed=True)
+    
     # 数据库操作方法
     
     @database_sync_to_async
-    def create_websocket_session(self):
-        """创建WebSocket会话记录"""
-        client_ip = self.scope.get('client')[0] if 'client' in self.scope else None
-        
+    def create_websocket_session(self, disconnected_at=None):
+        """创建WebSocket会话记录，返回主键"""
         session = WebSocketSession.objects.create(
+            session_id=self.session_id,
             user_id=self.user_id,
-            client_ip=client_ip,
-            is_active=True
+            client_ip=self.client_ip,
+            connected_at=self.connected_at,
+            disconnected_at=disconnected_at,
+            last_activity=disconnected_at or timezone.now(),
+            is_active=disconnected_at is None
         )
-        return session.session_id
+        return session.pk
     
     @database_sync_to_async
     def update_websocket_session_disconnect(self):
         """更新WebSocket会话断开状态"""
-        try:
-            session = WebSocketSession.objects.get(session_id=self.session_id)
-            session.is_active = False
-            session.disconnected_at = timezone.now()
-            session.save()
-        except WebSocketSession.DoesNotExist:
-            pass
+        now = timezone.now()
+        WebSocketSession.objects.filter(pk=self.session_pk).update(
+            is_active=False,
+            disconnected_at=now,
+            last_activity=now
+        )
     
-    @database_sync_to_async
-    def create_websocket_message(self, message, direction):
-        """记录WebSocket消息"""
+    async def ensure_websocket_session(self):
+        """确保会话记录已落库（写入消息日志前调用）"""
+        if self.session_pk is None:
+            self.session_pk = await self.create_websocket_session()
+            self.message_log.session_pk = self.session_pk
+        return self.session_pk
+    
+    async def save_websocket_session_summary(self):
+        """断开时保存会话汇总记录"""
         try:
-            session = WebSocketSession.objects.get(session_id=self.session_id)
-            WebSocketMessage.objects.create(
-                session=session,
-                direction=direction,
-                message=message
-            )
-        except WebSocketSession.DoesNotExist:
-            pass
+            if self.session_pk is None:
+                # 连接期间没有写过消息日志，直接保存已断开的会话记录
+                self.session_pk = await self.create_websocket_session(disconnected_at=timezone.now())
+            else:
+                await self.update_websocket_session_disconnect()
+        except Exception as e:
+            logger.error(f'保存WebSocket会话记录失败: session={self.session_id} error={str(e)}')
+    
+    # 在线状态
+    
+    async def touch_presence(self):
+        """心跳续期，按最小间隔节流"""
+        now = time.monotonic()
+        if now - self.last_presence_touch < presence.get_presence_settings()['TOUCH_INTERVAL']:
+            return
+        self.last_presence_touch = now
+        await sync_to_async(presence.touch, thread_sensitive=False)(self.session_id)
+    
+    # 消息日志
+    
+    async def create_websocket_message(self, message, direction, is_error=False):
+        """记录WebSocket消息（写入缓冲区，批量落库）"""
+        if not hasattr(self, 'message_log'):
+            return
+        
+        if self.message_log.add(message, direction, is_error) and not self.message_log_lock.locked():
+            # 达到批量大小，后台写入，不阻塞消息处理
+            asyncio.ensure_future(self.flush_websocket_messages())
+    
+    async def flush_websocket_messages(self):
+        """将缓冲区中的消息批量写入数据库"""
+        async with self.message_log_lock:
+            if len(self.message_log):
+                await self.ensure_websocket_session()
+                await database_sync_to_async(write_messages)(self.message_log.drain())
+    
+    async def message_log_flush_loop(self):
+        """定时写入消息日志"""
+        interval = self.message_log.config['FLUSH_INTERVAL']
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush_websocket_messages()
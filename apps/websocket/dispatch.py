@@ -0,0 +1,214 @@
+"""
+WebSocket事件分发
+
+模型信号处理器不再在 post_save 中同步调用 group_send，而是通过
+transaction.on_commit 在事务提交后把事件交给后台发布线程：
+
+- 事务回滚时事件被丢弃，客户端不会收到未生效的数据；
+- 写接口只需把事件放入内存队列，不再等待 Redis 往返；
+- 发布线程按事件键合并短时间内的重复事件，只发送最新的一条；
+- 每个事件可以指定合并窗口（如订单更新 250ms），窗口内的更新只发送一次。
+"""
+import asyncio
+import atexit
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+from apps.system import tracing
+from .streams import stamp_event
+
+logger = logging.getLogger('apps')
+
+# 分发模式
+DISPATCH_MODE_THREAD = 'thread'  # 后台线程发布（默认）
+DISPATCH_MODE_SYNC = 'sync'      # 事务提交后同步发布，适用于测试和管理命令
+
+# 默认配置，可通过 settings.WEBSOCKET_DISPATCH 覆盖
+DEFAULT_DISPATCH_SETTINGS = {
+    'MODE': DISPATCH_MODE_THREAD,
+    'BATCH_DELAY': 0.05,  # 发布前等待的时间（秒），用于合并同一批次内的重复事件
+    'ORDER_UPDATE_WINDOW': 0.25,  # 订单更新事件的合并窗口（秒）
+    'ORDER_FLUSH_ON_STATUS_CHANGE': True,  # 订单状态变化时立即发送
+}
+
+
+def get_dispatch_settings():
+    """获取事件分发配置"""
+    config = dict(DEFAULT_DISPATCH_SETTINGS)
+    config.update(getattr(settings, 'WEBSOCKET_DISPATCH', {}))
+    return config
+
+
+class EventPublisher:
+    """
+    后台事件发布器
+
+    待发布事件按键保存在字典中，相同键的事件只保留最新一条，
+    发送时间取该键第一条事件的到期时间，持续更新的对象在每个窗口内
+    最多发送一次。发布线程使用独立的事件循环，复用通道层连接。
+    """
+
+    def __init__(self, batch_delay=0.05):
+        self.batch_delay = batch_delay
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._thread = None
+        self._pid = None
+        self._loop = None
+
+    def publish(self, group, message, key=None, delay=None):
+        """
+        加入待发布队列
+
+        Args:
+            group: 目标组名
+            message: 通道层消息
+            key: 合并键，为空时事件不参与合并
+            delay: 合并窗口（秒），为空时使用 batch_delay，为 0 时立即发送
+        """
+        if key is None:
+            key = ('unique', next(self._sequence))
+        if delay is None:
+            delay = self.batch_delay
+        due = time.monotonic() + delay
+        with self._condition:
+            pending = self._pending.get(key)
+            if pending is not None:
+                # 合并：保留最新消息，到期时间取较早者
+                due = min(due, pending[2])
+            self._pending[key] = (group, message, due)
+            self._condition.notify()
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        """按需启动发布线程（fork 后的子进程会重新启动）"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='websocket-event-publisher', daemon=True
+            )
+            self._thread.start()
+
+    def _take_batch(self, now=None):
+        """取出到期的事件，now 为空时取出全部"""
+        with self._condition:
+            if now is None:
+                due_keys = list(self._pending)
+            else:
+                due_keys = [key for key, (_, _, due) in self._pending.items() if due <= now]
+            batch = [self._pending.pop(key)[:2] for key in due_keys]
+        return batch
+
+    def _wait_for_due(self):
+        """等待直到至少有一个事件到期"""
+        with self._condition:
+            while True:
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+                timeout = min(due for _, _, due in self._pending.values()) - time.monotonic()
+                if timeout <= 0:
+                    return
+                self._condition.wait(timeout)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        while True:
+            self._wait_for_due()
+            batch = self._take_batch(time.monotonic())
+            try:
+                self._loop.run_until_complete(self._send_batch(batch))
+            except Exception as e:
+                logger.error(f'WebSocket事件批量发送失败: {str(e)}', exc_info=True)
+
+    async def _send_batch(self, batch):
+        channel_layer = get_channel_layer()
+        # 记录到事件流并分配序号，供客户端重连时补发
+        batch = [(group, prepare_message(group, message)) for group, message in batch]
+        results = await asyncio.gather(
+            *(traced_group_send(channel_layer, group, message) for group, message in batch),
+            return_exceptions=True
+        )
+        for (group, message), result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.error(f'WebSocket事件发送失败: group={group} type={message.get("type")} error={result}')
+
+    def flush(self):
+        """同步发送所有待发布事件（进程退出时调用）"""
+        batch = self._take_batch()
+        if batch:
+            async_to_sync(self._send_batch)(batch)
+
+
+async def traced_group_send(channel_layer, group, message):
+    """发送事件，消息带有采样的追踪上下文时记录 group_send 耗时"""
+    with tracing.span('channels.group_send', category='channels', kind=tracing.SPAN_KIND_PRODUCER,
+                      parent=tracing.extract(message), **{'messaging.destination': group}):
+        await channel_layer.group_send(group, message)
+
+
+def prepare_message(group, message):
+    """
+    发送前处理消息
+
+    分配事件ID（消费者按ID缓存编码后的帧，扇出时只编码一次），
+    并记录到事件流分配序号。
+    """
+    message = dict(message, event_id=uuid.uuid4().hex)
+    return stamp_event(group, message)
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    """获取进程内的事件发布器"""
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = EventPublisher(get_dispatch_settings()['BATCH_DELAY'])
+                atexit.register(_publisher.flush)
+    return _publisher
+
+
+def send_now(group, message):
+    """立即同步发送事件"""
+    async_to_sync(traced_group_send)(get_channel_layer(), group, prepare_message(group, message))
+
+
+def dispatch_event(group, message, key=None, delay=None):
+    """
+    在当前事务提交后发布WebSocket事件
+
+    不在事务中时 on_commit 会立即执行回调。
+
+    Args:
+        group: 目标组名
+        message: 通道层消息，必须包含 type
+        key: 合并键，相同键的待发布事件只发送最新一条
+        delay: 合并窗口（秒），sync 模式下忽略
+    """
+    # 采样的请求把追踪上下文随消息传给发布线程
+    message = tracing.inject(message)
+    if get_dispatch_settings()['MODE'] == DISPATCH_MODE_SYNC:
+        transaction.on_commit(lambda: send_now(group, message))
+    else:
+        transaction.on_commit(lambda: get_publisher().publish(group, message, key, delay))
@@ -0,0 +1,146 @@
+"""
+WebSocket帧编码
+
+默认使用 JSON 文本帧。客户端在握手时请求子协议 erp.msgpack 时，
+服务器返回 msgpack 编码的二进制帧：
+
+- 第一个字节为标志位：0x00 表示原始 msgpack，0x01 表示 zlib 压缩后的 msgpack；
+- 超过 COMPRESS_THRESHOLD 字节的帧会被压缩，适合带宽有限的车间平板；
+- 客户端发送的压缩帧解压后超过 MAX_DECOMPRESSED_SIZE 字节时拒绝，避免压缩炸弹占满 worker 内存。
+
+扇出到多个用户的事件在每个 worker 内只编码一次，编码结果按事件ID缓存。
+"""
+import json
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:  # 未安装 msgpack 时只支持 JSON
+    msgpack = None
+
+SUBPROTOCOL_MSGPACK = 'erp.msgpack'
+
+FORMAT_JSON = 'json'
+FORMAT_MSGPACK = 'msgpack'
+
+FLAG_RAW = b'\x00'
+FLAG_DEFLATE = b'\x01'
+
+# 无法解码的二进制帧在消息日志中记录的十六进制字节数
+BINARY_EXCERPT_BYTES = 64
+
+# 默认配置，可通过 settings.WEBSOCKET_FRAMING 覆盖
+DEFAULT_FRAMING_SETTINGS = {
+    'MSGPACK_ENABLED': True,
+    'COMPRESS_THRESHOLD': 1024,  # 超过该字节数的 msgpack 帧使用 zlib 压缩
+    'COMPRESS_LEVEL': 6,
+    'CACHE_SIZE': 256,           # 每个 worker 缓存的已编码事件帧数量
+    'MAX_DECOMPRESSED_SIZE': 1024 * 1024,  # 客户端压缩帧解压后的最大字节数
+}
+
+
+def get_framing_settings():
+    """获取帧编码配置"""
+    config = dict(DEFAULT_FRAMING_SETTINGS)
+    config.update(getattr(settings, 'WEBSOCKET_FRAMING', {}))
+    return config
+
+
+def negotiate(subprotocols):
+    """
+    根据客户端请求的子协议选择帧格式
+
+    Returns:
+        (帧格式, 接受的子协议) 元组
+    """
+    if msgpack is not None and get_framing_settings()['MSGPACK_ENABLED'] and SUBPROTOCOL_MSGPACK in (subprotocols or []):
+        return FORMAT_MSGPACK, SUBPROTOCOL_MSGPACK
+    return FORMAT_JSON, None
+
+
+def encode(frame, fmt):
+    """编码帧，JSON 返回 str，msgpack 返回 bytes"""
+    if fmt == FORMAT_JSON:
+        return json.dumps(frame)
+
+    config = get_framing_settings()
+    payload = msgpack.packb(frame, use_bin_type=True)
+    if len(payload) > config['COMPRESS_THRESHOLD']:
+        return FLAG_DEFLATE + zlib.compress(payload, config['COMPRESS_LEVEL'])
+    return FLAG_RAW + payload
+
+
+def inflate(payload, max_size):
+    """解压客户端发送的帧，解压后超过 max_size 字节时抛出 ValueError"""
+    decompressor = zlib.decompressobj()
+    try:
+        inflated = decompressor.decompress(payload, max_size)
+    except zlib.error as e:
+        raise ValueError(f'无法解压的二进制帧: {str(e)}') from e
+    if decompressor.unconsumed_tail:
+        raise ValueError(f'压缩帧解压后超过 {max_size} 字节')
+    return inflated
+
+
+def decode(data):
+    """解码客户端发送的二进制帧，格式错误时抛出 ValueError"""
+    if msgpack is None:
+        raise ValueError('未启用 msgpack 帧格式')
+    flag, payload = data[:1], data[1:]
+    if flag not in (FLAG_RAW, FLAG_DEFLATE):
+        raise ValueError('未知的帧标志位')
+    if flag == FLAG_DEFLATE:
+        payload = inflate(payload, get_framing_settings()['MAX_DECOMPRESSED_SIZE'])
+    try:
+        return msgpack.unpackb(payload, raw=False)
+    except Exception as e:
+        # msgpack 的各类解包异常统一为 ValueError
+        raise ValueError(f'无法解码的二进制帧: {str(e)}') from e
+
+
+def describe_binary(data):
+    """二进制帧的日志占位文本：长度和开头部分的十六进制"""
+    excerpt = data[:BINARY_EXCERPT_BYTES].hex()
+    suffix = '...' if len(data) > BINARY_EXCERPT_BYTES else ''
+    return f'<binary {len(data)} bytes: {excerpt}{suffix}>'
+
+
+class FrameCache:
+    """已编码帧的 LRU 缓存，键为 (事件ID, 帧格式)"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_encode(self, key, frame, fmt):
+        cache_key = (key, fmt)
+        with self._lock:
+            encoded = self._data.get(cache_key)
+            if encoded is not None:
+                self._data.move_to_end(cache_key)
+                return encoded
+
+        encoded = encode(frame, fmt)
+        with self._lock:
+            self._data[cache_key] = encoded
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return encoded
+
+
+_frame_cache = None
+
+
+def encode_cached(event_id, frame, fmt):
+    """编码帧，有事件ID时复用同一 worker 内其他连接的编码结果"""
+    global _frame_cache
+    if event_id is None:
+        return encode(frame, fmt)
+    if _frame_cache is None:
+        _frame_cache = FrameCache(get_framing_settings()['CACHE_SIZE'])
+    return _frame_cache.get_or_encode(event_id, frame, fmt)
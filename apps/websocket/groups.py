@@ -0,0 +1,38 @@
+"""
+WebSocket组名定义
+
+集中管理消费者加入的组名，信号处理器按组名推送消息，
+避免在各处拼接字符串。
+"""
+
+# 所有在线用户都会加入的告警广播组
+ALERTS_ALL_GROUP = 'alerts_all'
+
+
+def user_group(user_id):
+    """用户个人组名"""
+    return f'user_{user_id}'
+
+
+def alert_role_group(role):
+    """按角色划分的告警广播组名"""
+    return f'alerts_role_{role}'
+
+
+def alert_groups_for_user(user):
+    """
+    获取用户应加入的告警广播组
+
+    所有活跃用户加入 alerts_all，并按角色加入 alerts_role_<role>；
+    管理员账号（is_staff/is_superuser）同时加入 admin 角色组。
+    """
+    if not user.is_active:
+        return []
+    
+    groups = [ALERTS_ALL_GROUP]
+    role = getattr(user, 'role', None)
+    if role:
+        groups.append(alert_role_group(role))
+    if (user.is_staff or user.is_superuser) and role != 'admin':
+        groups.append(alert_role_group('admin'))
+    return groups
@@ -0,0 +1,121 @@
+"""
+WebSocket消息日志缓冲
+
+消费者不再为每一帧消息单独查询会话并插入一行记录，而是先写入
+固定容量的环形缓冲区，由定时任务或缓冲区达到批量大小时通过
+bulk_create 批量写入数据库。消息时间在加入缓冲区时记录，而不是写入时间。
+"""
+import itertools
+import logging
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+from prometheus_client import Counter
+
+from developer.models import WebSocketMessage
+
+logger = logging.getLogger('apps')
+
+# 采样模式
+LOG_MODE_NONE = 'none'        # 不记录
+LOG_MODE_ERRORS = 'errors'    # 只记录错误消息
+LOG_MODE_SAMPLE = 'sample'    # 每 N 条记录 1 条（错误消息总是记录）
+LOG_MODE_ALL = 'all'          # 全部记录
+
+# 默认配置，可通过 settings.WEBSOCKET_MESSAGE_LOG 覆盖
+DEFAULT_MESSAGE_LOG_SETTINGS = {
+    'MODE': LOG_MODE_ALL,
+    'SAMPLE_RATE': 10,       # sample 模式下每 N 条记录 1 条
+    'BUFFER_SIZE': 1000,     # 环形缓冲区容量，写满后丢弃最旧的消息
+    'BATCH_SIZE': 100,       # 缓冲区达到该数量时立即触发写入
+    'FLUSH_INTERVAL': 2.0,   # 定时写入间隔（秒）
+}
+
+WEBSOCKET_MESSAGE_LOG_DROPPED = Counter(
+    'websocket_message_log_dropped_total',
+    'Number of WebSocket messages dropped from the log buffer',
+    []
+)
+
+
+def get_message_log_settings():
+    """获取消息日志配置"""
+    config = dict(DEFAULT_MESSAGE_LOG_SETTINGS)
+    config.update(getattr(settings, 'WEBSOCKET_MESSAGE_LOG', {}))
+    return config
+
+
+class MessageLogBuffer:
+    """
+    单个WebSocket连接的消息日志环形缓冲区
+
+    缓存会话主键，避免每条消息都查询 WebSocketSession。会话记录在首次
+    写入前才创建，此前 session_pk 为空，写入前由消费者补上。
+    """
+
+    def __init__(self, session_pk, config=None):
+        self.session_pk = session_pk
+        self.config = config or get_message_log_settings()
+        self.buffer = deque(maxlen=self.config['BUFFER_SIZE'])
+        self.dropped = 0
+        self._counter = itertools.count()
+
+    def should_log(self, is_error=False):
+        """根据采样模式判断是否记录该消息"""
+        mode = self.config['MODE']
+        if mode == LOG_MODE_ALL:
+            return True
+        if mode == LOG_MODE_NONE:
+            return False
+        if is_error:
+            return True
+        if mode == LOG_MODE_SAMPLE:
+            return next(self._counter) % max(int(self.config['SAMPLE_RATE']), 1) == 0
+        return False
+
+    def add(self, message, direction, is_error=False):
+        """
+        将消息加入缓冲区
+
+        Returns:
+            缓冲区是否已达到批量写入大小
+        """
+        if not self.should_log(is_error):
+            return False
+
+        if len(self.buffer) == self.buffer.maxlen:
+            # 缓冲区已满（数据库写入跟不上），丢弃最旧的消息
+            self.dropped += 1
+            WEBSOCKET_MESSAGE_LOG_DROPPED.inc()
+
+        self.buffer.append((direction, message, timezone.now()))
+        return len(self.buffer) >= self.config['BATCH_SIZE']
+
+    def drain(self):
+        """取出缓冲区中的全部消息，转换为待写入的模型实例"""
+        objs = []
+        while self.buffer:
+            direction, message, timestamp = self.buffer.popleft()
+            objs.append(WebSocketMessage(
+                session_id=self.session_pk,
+                direction=direction,
+                message=message,
+                timestamp=timestamp
+            ))
+        return objs
+
+    def __len__(self):
+        return len(self.buffer)
+
+
+def write_messages(objs):
+    """批量写入消息记录"""
+    if not objs:
+        return 0
+    try:
+        WebSocketMessage.objects.bulk_create(objs, batch_size=500)
+    except Exception as e:
+        logger.error(f'批量写入WebSocket消息失败: {str(e)}')
+        return 0
+    return len(objs)
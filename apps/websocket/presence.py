@@ -0,0 +1,163 @@
+"""
+WebSocket在线状态登记
+
+在线连接登记在 Redis 中，不再在每次连接/断开时写 WebSocketSession 表：
+
+- ws:presence:<session_id>   哈希，保存连接信息，带心跳过期时间
+- ws:presence:sessions       有序集合，成员为 session_id，分值为最后心跳时间
+
+消费者在连接时登记、收到 ping 时续期、断开时注销。进程异常退出时
+哈希会因过期自动清除，有序集合中的残留成员在读取时剔除。
+close_session() 通过登记的 channel_name 通知所在的消费者断开连接。
+"""
+import logging
+import socket
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.WEBSOCKET_PRESENCE 覆盖
+DEFAULT_PRESENCE_SETTINGS = {
+    'ENABLED': True,
+    'TTL': 90,                # 心跳过期时间（秒），客户端应在此时间内发送 ping
+    'TOUCH_INTERVAL': 10,     # 两次续期之间的最小间隔（秒），避免频繁收到消息时反复写 Redis
+}
+
+PRESENCE_KEY_PREFIX = 'ws:presence:'
+PRESENCE_INDEX_KEY = 'ws:presence:sessions'
+
+
+def get_presence_settings():
+    """获取在线状态配置"""
+    config = dict(DEFAULT_PRESENCE_SETTINGS)
+    config.update(getattr(settings, 'WEBSOCKET_PRESENCE', {}))
+    return config
+
+
+def presence_key(session_id):
+    return f'{PRESENCE_KEY_PREFIX}{session_id}'
+
+
+def get_connection():
+    return get_redis_connection('default')
+
+
+def register(session_id, user, client_ip, channel_name):
+    """登记在线连接"""
+    config = get_presence_settings()
+    if not config['ENABLED']:
+        return
+    ttl = config['TTL']
+    now = time.time()
+    key = presence_key(session_id)
+    try:
+        pipe = get_connection().pipeline()
+        pipe.hset(key, mapping={
+            'session_id': str(session_id),
+            'user_id': user.id,
+            'username': user.username,
+            'client_ip': client_ip or '',
+            'channel_name': channel_name,
+            'server': socket.gethostname(),
+            'connected_at': now,
+            'last_activity': now,
+        })
+        pipe.expire(key, ttl)
+        pipe.zadd(PRESENCE_INDEX_KEY, {str(session_id): now})
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f'登记WebSocket在线状态失败: {str(e)}')
+
+
+def touch(session_id):
+    """心跳续期"""
+    config = get_presence_settings()
+    if not config['ENABLED']:
+        return
+    ttl = config['TTL']
+    now = time.time()
+    key = presence_key(session_id)
+    try:
+        pipe = get_connection().pipeline()
+        pipe.hset(key, 'last_activity', now)
+        pipe.expire(key, ttl)
+        pipe.zadd(PRESENCE_INDEX_KEY, {str(session_id): now})
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f'更新WebSocket在线状态失败: {str(e)}')
+
+
+def unregister(session_id):
+    """注销在线连接"""
+    if not get_presence_settings()['ENABLED']:
+        return
+    try:
+        pipe = get_connection().pipeline()
+        pipe.delete(presence_key(session_id))
+        pipe.zrem(PRESENCE_INDEX_KEY, str(session_id))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f'注销WebSocket在线状态失败: {str(e)}')
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _parse(data):
+    data = {_decode(k): _decode(v) for k, v in data.items()}
+    data['user_id'] = int(data['user_id'])
+    data['connected_at'] = float(data['connected_at'])
+    data['last_activity'] = float(data['last_activity'])
+    return data
+
+
+def get_session(session_id):
+    """获取单个在线连接的信息，不在线时返回 None"""
+    data = get_connection().hgetall(presence_key(session_id))
+    return _parse(data) if data else None
+
+
+def close_session(session_id, code=4000):
+    """
+    通知连接所在的消费者关闭连接
+
+    Returns:
+        连接在线并已发出通知时返回 True
+    """
+    session = get_session(session_id)
+    if session is None:
+        return False
+    async_to_sync(get_channel_layer().send)(session['channel_name'], {'type': 'force_disconnect', 'code': code})
+    return True
+
+
+def list_sessions():
+    """
+    获取当前在线的连接列表，按最后心跳时间倒序
+
+    Returns:
+        连接信息字典列表，时间字段为 Unix 时间戳
+    """
+    connection = get_connection()
+    cutoff = time.time() - get_presence_settings()['TTL']
+    # 剔除已过期的成员
+    connection.zremrangebyscore(PRESENCE_INDEX_KEY, '-inf', cutoff)
+    session_ids = [_decode(member) for member in connection.zrevrange(PRESENCE_INDEX_KEY, 0, -1)]
+    if not session_ids:
+        return []
+
+    pipe = connection.pipeline()
+    for session_id in session_ids:
+        pipe.hgetall(presence_key(session_id))
+    sessions = []
+    for data in pipe.execute():
+        if not data:
+            continue
+        sessions.append(_parse(data))
+    return sessions
@@ -1,19 +1,37 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-import json
 
 from apps.notification.models import Notification
 from apps.system.models_alerts import SystemAlert
 from apps.production.models import Order
 
-channel_layer = get_channel_layer()
+from .groups import ALERTS_ALL_GROUP, alert_role_group, user_group
+from .dispatch import dispatch_event, get_dispatch_settings
+
+
+def broadcast_alert(alert_data, roles=None):
+    """
+    广播系统告警
+
+    Args:
+        alert_data: 告警数据
+        roles: 目标角色列表，为空时发送给所有在线用户。
+               管理员账号同时属于多个角色组，多个角色可能收到重复告警
+    """
+    groups = [alert_role_group(role) for role in roles] if roles else [ALERTS_ALL_GROUP]
+    for group in groups:
+        dispatch_event(
+            group,
+            {
+                'type': 'alert_message',
+                'data': alert_data
+            }
+        )
 
 @receiver(post_save, sender=Notification)
 def notification_created(sender, instance, created, **kwargs):
     """当创建新通知时，通过WebSocket发送实时更新"""
-    if created and instance.user:
+    if created and instance.user_id:
         # 准备通知数据
         notification_data = {
             'id': instance.id,
@@ -24,9 +42,9 @@ def notification_created(sender, instance, created, **kwargs):
             'created_at': instance.created_at.isoformat()
         }
         
-        # 发送到用户的通知频道
-        async_to_sync(channel_layer.group_send)(
-            f"user_{instance.user.id}",
+        # 事务提交后发送到用户的通知频道
+        dispatch_event(
+            user_group(instance.user_id),
             {
                 'type': 'notification_message',
                 'data': notification_data
@@ -47,19 +65,14 @@ def alert_created(sender, instance, created, **kwargs):
             'created_at': instance.created_at.isoformat()
         }
         
-        # 发送到所有用户的告警频道
-        # 注意：这里可能需要根据权限过滤，只发送给有权查看告警的用户
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        
-        for user in User.objects.filter(is_active=True):
-            async_to_sync(channel_layer.group_send)(
-                f"user_{user.id}",
-                {
-                    'type': 'alert_message',
-                    'data': alert_data
-                }
-            )
+        # 发送到告警广播组，由在线用户的消费者在连接时加入
+        broadcast_alert(alert_data)
+
+@receiver(post_init, sender=Order)
+def order_loaded(sender, instance, **kwargs):
+    """记录订单加载时的状态，用于判断保存时状态是否变化"""
+    # 状态字段被 defer 时不在 __dict__ 中，视为未知
+    instance._ws_original_status = instance.__dict__.get('status')
 
 @receiver(post_save, sender=Order)
 def order_updated(sender, instance, created, **kwargs):
@@ -67,7 +80,7 @@ def order_updated(sender, instance, created, **kwargs):
     # 准备订单数据
     order_data = {
         'id': instance.id,
-        'order_no': instance.order_no,
+        'order_no': instance.order_number,
         'status': instance.status,
         'updated_at': instance.updated_at.isoformat()
     }
@@ -78,23 +91,35 @@ def order_updated(sender, instance, created, **kwargs):
     related_users = []
     
     # 添加订单创建者
-    if instance.created_by:
-        related_users.append(instance.created_by)
+    if instance.created_by_id:
+        related_users.append(instance.created_by_id)
     
     # 添加订单负责人
-    if hasattr(instance, 'assigned_to') and instance.assigned_to:
-        related_users.append(instance.assigned_to)
+    if getattr(instance, 'assigned_to_id', None):
+        related_users.append(instance.assigned_to_id)
     
     # 添加客户用户（如果适用）
-    if hasattr(instance, 'customer') and hasattr(instance.customer, 'user') and instance.customer.user:
-        related_users.append(instance.customer.user)
+    if hasattr(instance, 'customer') and getattr(instance.customer, 'user_id', None):
+        related_users.append(instance.customer.user_id)
     
-    # 发送到所有相关用户
-    for user in set(related_users):  # 使用set去重
-        async_to_sync(channel_layer.group_send)(
-            f"user_{user.id}",
+    # 批量更新进度时同一订单会频繁保存，在合并窗口内只发送最新状态；
+    # 状态变化（如开始生产、完成）可配置为立即发送
+    config = get_dispatch_settings()
+    status_changed = created or instance.status != getattr(instance, '_ws_original_status', None)
+    instance._ws_original_status = instance.status
+    if status_changed and config['ORDER_FLUSH_ON_STATUS_CHANGE']:
+        delay = 0
+    else:
+        delay = config['ORDER_UPDATE_WINDOW']
+    
+    # 事务提交后发送到所有相关用户，同一订单的待发送更新只保留最新一条
+    for user_id in set(related_users):  # 使用set去重
+        dispatch_event(
+            user_group(user_id),
             {
                 'type': 'order_update',
                 'data': order_data
-            }
+            },
+            key=('order_update', user_id, instance.id),
+            delay=delay
         )
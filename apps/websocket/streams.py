@@ -0,0 +1,132 @@
+"""
+可恢复的WebSocket事件流
+
+发送到用户组和告警广播组的事件同时追加到 Redis Stream（按组名一个流，
+长度有上限），每条事件带有该流内单调递增的序号 seq。客户端断线重连时
+携带各流最后收到的序号，只补发缺失的事件；如果缺失的事件已超出保留范围，
+通知客户端执行全量刷新。
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django_redis import get_redis_connection
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.WEBSOCKET_STREAMS 覆盖
+DEFAULT_STREAM_SETTINGS = {
+    'ENABLED': True,
+    'MAXLEN': 1000,                         # 每个流保留的最大事件数（近似）
+    'TTL': 24 * 60 * 60,                    # 流无新事件后的保留时间（秒）
+    'GROUP_PREFIXES': ('user_', 'alerts_'),  # 需要记录事件流的组名前缀
+}
+
+STREAM_KEY_PREFIX = 'ws:stream:'
+
+# 原子地递增序号并以 "<seq>-0" 作为ID追加事件
+APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[2])
+redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], seq .. '-0', 'data', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return seq
+"""
+
+
+def get_stream_settings():
+    """获取事件流配置"""
+    config = dict(DEFAULT_STREAM_SETTINGS)
+    config.update(getattr(settings, 'WEBSOCKET_STREAMS', {}))
+    return config
+
+
+def is_streamed(group):
+    """判断该组的事件是否需要记录到事件流"""
+    config = get_stream_settings()
+    return config['ENABLED'] and group.startswith(tuple(config['GROUP_PREFIXES']))
+
+
+def stream_key(group):
+    return f'{STREAM_KEY_PREFIX}{group}'
+
+
+def seq_key(group):
+    return f'{STREAM_KEY_PREFIX}{group}:seq'
+
+
+def get_connection():
+    return get_redis_connection('default')
+
+
+def append_event(group, message):
+    """
+    追加事件到组的事件流
+
+    Returns:
+        事件序号，Redis 不可用时返回 None
+    """
+    config = get_stream_settings()
+    try:
+        seq = get_connection().eval(
+            APPEND_SCRIPT, 2, stream_key(group), seq_key(group),
+            config['MAXLEN'], json.dumps(message, cls=DjangoJSONEncoder), config['TTL']
+        )
+        return int(seq)
+    except Exception as e:
+        logger.warning(f'追加WebSocket事件流失败: group={group} error={str(e)}')
+        return None
+
+
+def stamp_event(group, message):
+    """为需要记录的事件分配序号，返回带 seq/stream 字段的新消息"""
+    if not is_streamed(group):
+        return message
+    seq = append_event(group, message)
+    if seq is None:
+        return message
+    return dict(message, seq=seq, stream=group)
+
+
+def last_sequences(groups):
+    """获取各组事件流当前的最新序号"""
+    groups = [group for group in groups if is_streamed(group)]
+    if not groups:
+        return {}
+    try:
+        values = get_connection().mget([seq_key(group) for group in groups])
+    except Exception as e:
+        logger.warning(f'读取WebSocket事件流序号失败: {str(e)}')
+        return {}
+    return {group: int(value or 0) for group, value in zip(groups, values)}
+
+
+def read_events(group, after_seq):
+    """
+    读取序号大于 after_seq 的事件
+
+    Returns:
+        (events, resync_required) 元组；缺失的事件已被裁剪、流已过期
+        或客户端序号大于服务端序号时 resync_required 为 True
+    """
+    connection = get_connection()
+    last_seq = int(connection.get(seq_key(group)) or 0)
+    if after_seq > last_seq:
+        # 流已过期重建，客户端序号失效
+        return [], True
+    if after_seq == last_seq:
+        return [], False
+
+    entries = connection.xrange(stream_key(group), min=f'{after_seq + 1}-0', max='+')
+    if not entries or int(entries[0][0].split(b'-')[0]) != after_seq + 1:
+        # 最早的缺失事件已超出保留范围
+        return [], True
+
+    events = []
+    for entry_id, fields in entries:
+        event = json.loads(fields[b'data'])
+        event['seq'] = int(entry_id.split(b'-')[0])
+        event['stream'] = group
+        events.append(event)
+    return events, False
@@ -0,0 +1,79 @@
+from unittest import mock
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from apps.websocket.dispatch import EventPublisher, dispatch_event
+
+
+class EventPublisherTests(SimpleTestCase):
+    """WebSocket事件发布器测试类"""
+    
+    def setUp(self):
+        patcher = mock.patch.object(EventPublisher, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.publisher = EventPublisher(batch_delay=0)
+    
+    def test_same_key_keeps_latest(self):
+        self.publisher.publish('user_1', {'type': 'order_update', 'data': {'status': 'pending'}}, key='order-1')
+        self.publisher.publish('user_1', {'type': 'order_update', 'data': {'status': 'processing'}}, key='order-1')
+        batch = self.publisher._take_batch()
+        self.assertEqual(len(batch), 1)
+        self.assertEqual(batch[0][1]['data']['status'], 'processing')
+    
+    def test_events_without_key_are_not_merged(self):
+        self.publisher.publish('alerts_all', {'type': 'alert_message', 'data': {'id': 1}})
+        self.publisher.publish('alerts_all', {'type': 'alert_message', 'data': {'id': 2}})
+        self.assertEqual(len(self.publisher._take_batch()), 2)
+
+
+class DispatchEventTests(TestCase):
+    """事务提交后分发测试类"""
+    
+    @mock.patch('apps.websocket.dispatch.get_publisher')
+    def test_dispatch_waits_for_commit(self, get_publisher):
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatch_event('user_1', {'type': 'notification_message', 'data': {}})
+            get_publisher.return_value.publish.assert_not_called()
+        get_publisher.return_value.publish.assert_called_once()
+    
+    @mock.patch('apps.websocket.dispatch.get_publisher')
+    def test_rollback_discards_event(self, get_publisher):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    dispatch_event('user_1', {'type': 'notification_message', 'data': {}})
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+        self.assertEqual(len(callbacks), 0)
+        get_publisher.return_value.publish.assert_not_called()
+
+
+class EventWindowTests(SimpleTestCase):
+    """事件合并窗口测试类"""
+    
+    def setUp(self):
+        patcher = mock.patch.object(EventPublisher, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.publisher = EventPublisher(batch_delay=0)
+    
+    @mock.patch('apps.websocket.dispatch.time.monotonic', return_value=100.0)
+    def test_event_not_due_within_window(self, monotonic):
+        self.publisher.publish('user_1', {'type': 'order_update', 'data': {}}, key='order-1', delay=0.25)
+        self.assertEqual(self.publisher._take_batch(100.1), [])
+        self.assertEqual(len(self.publisher._take_batch(100.25)), 1)
+    
+    @mock.patch('apps.websocket.dispatch.time.monotonic', return_value=100.0)
+    def test_updates_within_window_keep_first_due_time(self, monotonic):
+        self.publisher.publish('user_1', {'type': 'order_update', 'data': {'v': 1}}, key='order-1', delay=0.25)
+        monotonic.return_value = 100.2
+        self.publisher.publish('user_1', {'type': 'order_update', 'data': {'v': 2}}, key='order-1', delay=0.25)
+        batch = self.publisher._take_batch(100.25)
+        self.assertEqual(batch, [('user_1', {'type': 'order_update', 'data': {'v': 2}})])
+    
+    @mock.patch('apps.websocket.dispatch.time.monotonic', return_value=100.0)
+    def test_immediate_event_flushes_pending_window(self, monotonic):
+        self.publisher.publish('user_1', {'type': 'order_update', 'data': {'v': 1}}, key='order-1', delay=0.25)
+        self.publisher.publish('user_1', {'type': 'order_update', 'data': {'v': 2}}, key='order-1', delay=0)
+        self.assertEqual(len(self.publisher._take_batch(100.0)), 1)
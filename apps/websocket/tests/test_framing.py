@@ -0,0 +1,91 @@
+import json
+import zlib
+from unittest import mock, skipIf
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+from apps.websocket import framing
+from apps.websocket.consumers import NotificationConsumer
+
+
+class FramingTests(SimpleTestCase):
+    """WebSocket帧编码测试类"""
+    
+    def test_json_by_default(self):
+        self.assertEqual(framing.negotiate([]), (framing.FORMAT_JSON, None))
+        frame = {'type': 'pong'}
+        self.assertEqual(json.loads(framing.encode(frame, framing.FORMAT_JSON)), frame)
+    
+    @skipIf(framing.msgpack is None, '未安装 msgpack')
+    def test_negotiate_msgpack(self):
+        self.assertEqual(
+            framing.negotiate(['erp.msgpack']),
+            (framing.FORMAT_MSGPACK, framing.SUBPROTOCOL_MSGPACK)
+        )
+    
+    @skipIf(framing.msgpack is None, '未安装 msgpack')
+    def test_msgpack_roundtrip(self):
+        frame = {'type': 'order_update', 'data': {'id': 1, 'status': 'processing'}}
+        encoded = framing.encode(frame, framing.FORMAT_MSGPACK)
+        self.assertEqual(encoded[:1], framing.FLAG_RAW)
+        self.assertEqual(framing.decode(encoded), frame)
+    
+    @skipIf(framing.msgpack is None, '未安装 msgpack')
+    def test_undecodable_frames_raise_value_error(self):
+        for data in (b'\x01not-zlib', b'\x00\xc1', b'\x09abc', b''):
+            with self.assertRaises(ValueError):
+                framing.decode(data)
+    
+    def test_describe_binary(self):
+        self.assertEqual(framing.describe_binary(b'\x01\xff'), '<binary 2 bytes: 01ff>')
+        described = framing.describe_binary(bytes(100))
+        self.assertTrue(described.startswith('<binary 100 bytes: ' + '00' * 64))
+        self.assertTrue(described.endswith('...>'))
+    
+    @skipIf(framing.msgpack is None, '未安装 msgpack')
+    @override_settings(WEBSOCKET_FRAMING={'COMPRESS_THRESHOLD': 10})
+    def test_large_frame_is_compressed(self):
+        frame = {'type': 'notification', 'data': {'content': '内容' * 100}}
+        encoded = framing.encode(frame, framing.FORMAT_MSGPACK)
+        self.assertEqual(encoded[:1], framing.FLAG_DEFLATE)
+        self.assertEqual(framing.decode(encoded), frame)
+    
+    @skipIf(framing.msgpack is None, '未安装 msgpack')
+    @override_settings(WEBSOCKET_FRAMING={'MAX_DECOMPRESSED_SIZE': 1024})
+    def test_decompression_is_bounded(self):
+        """解压后超过上限的压缩帧被拒绝，不会整体解压"""
+        bomb = framing.FLAG_DEFLATE + zlib.compress(bytes(10 * 1024 * 1024), 9)
+        with self.assertRaises(ValueError):
+            framing.decode(bomb)
+        small = framing.FLAG_DEFLATE + zlib.compress(framing.msgpack.packb({'type': 'ping'}))
+        self.assertEqual(framing.decode(small), {'type': 'ping'})
+    
+    def test_frame_cache_encodes_once(self):
+        cache = framing.FrameCache(maxsize=2)
+        frame = {'type': 'alert', 'data': {'id': 1}}
+        first = cache.get_or_encode('event-1', frame, framing.FORMAT_JSON)
+        # 相同事件ID直接返回缓存结果
+        second = cache.get_or_encode('event-1', {'changed': True}, framing.FORMAT_JSON)
+        self.assertIs(first, second)
+    
+    def test_frame_cache_is_bounded(self):
+        cache = framing.FrameCache(maxsize=2)
+        for i in range(3):
+            cache.get_or_encode(f'event-{i}', {'i': i}, framing.FORMAT_JSON)
+        self.assertEqual(len(cache._data), 2)
+
+
+class ConsumerBinaryFrameTests(SimpleTestCase):
+    """无法解码的二进制帧"""
+    
+    def test_undecodable_frame_is_logged_with_placeholder(self):
+        consumer = NotificationConsumer()
+        consumer.send_frame = mock.AsyncMock()
+        consumer.create_websocket_message = mock.AsyncMock()
+        consumer.touch_presence = mock.AsyncMock()
+        async_to_sync(consumer.receive)(bytes_data=b'\x01\x02\x03')
+        
+        self.assertEqual(consumer.send_frame.await_args.args[0]['type'], 'error')
+        message, direction = consumer.create_websocket_message.await_args.args
+        self.assertEqual(message, '<binary 3 bytes: 010203>')
+        self.assertEqual(direction, 'incoming')
+        self.assertTrue(consumer.create_websocket_message.await_args.kwargs['is_error'])
@@ -0,0 +1,34 @@
+from django.test import SimpleTestCase
+from types import SimpleNamespace
+from apps.websocket.groups import (
+    ALERTS_ALL_GROUP, alert_role_group, alert_groups_for_user, user_group
+)
+
+
+def make_user(role='staff', is_active=True, is_staff=False, is_superuser=False):
+    return SimpleNamespace(
+        role=role, is_active=is_active, is_staff=is_staff, is_superuser=is_superuser
+    )
+
+
+class AlertGroupTests(SimpleTestCase):
+    """告警广播组测试类"""
+    
+    def test_user_group(self):
+        self.assertEqual(user_group(5), 'user_5')
+    
+    def test_staff_joins_all_and_role_group(self):
+        groups = alert_groups_for_user(make_user(role='staff'))
+        self.assertEqual(groups, [ALERTS_ALL_GROUP, alert_role_group('staff')])
+    
+    def test_superuser_joins_admin_group(self):
+        groups = alert_groups_for_user(make_user(role='manager', is_superuser=True))
+        self.assertIn(alert_role_group('admin'), groups)
+        self.assertIn(alert_role_group('manager'), groups)
+    
+    def test_admin_role_not_duplicated(self):
+        groups = alert_groups_for_user(make_user(role='admin', is_staff=True))
+        self.assertEqual(groups.count(alert_role_group('admin')), 1)
+    
+    def test_inactive_user_joins_nothing(self):
+        self.assertEqual(alert_groups_for_user(make_user(is_active=False)), [])
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import SimpleTestCase
+from django.utils import timezone
+from apps.websocket import message_log
+from apps.websocket.message_log import (
+    MessageLogBuffer, DEFAULT_MESSAGE_LOG_SETTINGS,
+    LOG_MODE_NONE, LOG_MODE_ERRORS, LOG_MODE_SAMPLE, LOG_MODE_ALL
+)
+
+
+def make_buffer(**overrides):
+    config = dict(DEFAULT_MESSAGE_LOG_SETTINGS)
+    config.update(overrides)
+    return MessageLogBuffer(session_pk=1, config=config)
+
+
+class MessageLogBufferTests(SimpleTestCase):
+    """WebSocket消息日志缓冲区测试类"""
+    
+    def test_mode_all_logs_everything(self):
+        buffer = make_buffer(MODE=LOG_MODE_ALL)
+        for i in range(5):
+            buffer.add(f'msg{i}', 'incoming')
+        self.assertEqual(len(buffer), 5)
+    
+    def test_mode_none_logs_nothing(self):
+        buffer = make_buffer(MODE=LOG_MODE_NONE)
+        buffer.add('msg', 'incoming', is_error=True)
+        self.assertEqual(len(buffer), 0)
+    
+    def test_mode_errors_only(self):
+        buffer = make_buffer(MODE=LOG_MODE_ERRORS)
+        buffer.add('ok', 'incoming')
+        buffer.add('bad', 'incoming', is_error=True)
+        self.assertEqual([m for _, m, _ in buffer.buffer], ['bad'])
+    
+    def test_mode_sample_one_in_n(self):
+        buffer = make_buffer(MODE=LOG_MODE_SAMPLE, SAMPLE_RATE=3)
+        for i in range(9):
+            buffer.add(f'msg{i}', 'outgoing')
+        self.assertEqual(len(buffer), 3)
+    
+    def test_batch_size_triggers_flush(self):
+        buffer = make_buffer(BATCH_SIZE=2)
+        self.assertFalse(buffer.add('a', 'incoming'))
+        self.assertTrue(buffer.add('b', 'incoming'))
+    
+    def test_overflow_drops_oldest_and_counts(self):
+        buffer = make_buffer(BUFFER_SIZE=2, BATCH_SIZE=10)
+        for message in ('a', 'b', 'c'):
+            buffer.add(message, 'incoming')
+        self.assertEqual(buffer.dropped, 1)
+        self.assertEqual([m for _, m, _ in buffer.buffer], ['b', 'c'])
+    
+    def test_drain_builds_messages_with_cached_session(self):
+        buffer = make_buffer()
+        buffer.add('a', 'incoming')
+        objs = buffer.drain()
+        self.assertEqual(objs[0].session_id, 1)
+        self.assertEqual(objs[0].direction, 'incoming')
+        self.assertEqual(len(buffer), 0)
+    
+    def test_drain_keeps_message_time(self):
+        """写入的记录时间为消息加入缓冲区的时间，而不是写入时间"""
+        buffer = make_buffer()
+        sent_at = timezone.now() - timedelta(seconds=30)
+        with mock.patch.object(message_log.timezone, 'now', return_value=sent_at):
+            buffer.add('a', 'outgoing')
+        self.assertEqual(buffer.drain()[0].timestamp, sent_at)
@@ -0,0 +1,155 @@
+import json
+from types import SimpleNamespace
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+from apps.websocket import presence
+from apps.websocket.consumers import NotificationConsumer
+
+
+class FakeRedis:
+    """模拟 Redis 哈希（带过期时间）和有序集合的最小实现"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.hashes = {}
+        self.expires = {}
+        self.zsets = {}
+        self.results = None
+
+    def pipeline(self):
+        self.results = []
+        return self
+
+    def execute(self):
+        results, self.results = self.results, None
+        return results
+
+    def _record(self, value):
+        if self.results is not None:
+            self.results.append(value)
+        return value
+
+    def _alive(self, key):
+        if key in self.expires and self.expires[key] <= self.clock():
+            self.hashes.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.hashes
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        self._alive(key)
+        self.hashes.setdefault(key, {}).update(
+            {k: str(v).encode() for k, v in (mapping or {field: value}).items()}
+        )
+
+    def hgetall(self, key):
+        return self._record(dict(self.hashes[key]) if self._alive(key) else {})
+
+    def expire(self, key, ttl):
+        self.expires[key] = self.clock() + ttl
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+        self.expires.pop(key, None)
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score <= high]:
+            del zset[member]
+
+    def zrevrange(self, key, start, end):
+        zset = self.zsets.get(key, {})
+        return [member.encode() for member in sorted(zset, key=zset.get, reverse=True)]
+
+
+@override_settings(WEBSOCKET_PRESENCE={'TTL': 90})
+class PresenceTests(SimpleTestCase):
+    """WebSocket在线状态测试类"""
+
+    def setUp(self):
+        self.now = 1000.0
+        self.redis = FakeRedis(lambda: self.now)
+        for patcher in (
+            mock.patch.object(presence, 'get_connection', return_value=self.redis),
+            mock.patch.object(presence.time, 'time', side_effect=lambda: self.now),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = SimpleNamespace(id=7, username='zhangsan')
+
+    def register(self, session_id, channel_name='specific.abc!1'):
+        presence.register(session_id, self.user, '10.0.0.1', channel_name)
+
+    def test_register_and_list(self):
+        self.register('s1')
+        self.now += 5
+        self.register('s2')
+        sessions = presence.list_sessions()
+        self.assertEqual([s['session_id'] for s in sessions], ['s2', 's1'])
+        self.assertEqual(sessions[0]['user_id'], 7)
+        self.assertEqual(sessions[0]['username'], 'zhangsan')
+        self.assertEqual(sessions[0]['client_ip'], '10.0.0.1')
+        self.assertEqual(sessions[1]['connected_at'], 1000.0)
+
+    def test_heartbeat_extends_expiry(self):
+        self.register('s1')
+        self.register('s2')
+        self.now += 60
+        presence.touch('s1')
+        self.now += 60
+        sessions = presence.list_sessions()
+        self.assertEqual([s['session_id'] for s in sessions], ['s1'])
+        self.assertEqual(sessions[0]['last_activity'], 1060.0)
+        # 过期成员已从索引中剔除
+        self.assertNotIn('s2', self.redis.zsets[presence.PRESENCE_INDEX_KEY])
+        self.assertIsNone(presence.get_session('s2'))
+
+    def test_unregister(self):
+        self.register('s1')
+        presence.unregister('s1')
+        self.assertEqual(presence.list_sessions(), [])
+
+    def test_close_session_notifies_consumer_channel(self):
+        self.register('s1', channel_name='specific.abc!9')
+        channel_layer = mock.Mock()
+        channel_layer.send = mock.AsyncMock()
+        with mock.patch.object(presence, 'get_channel_layer', return_value=channel_layer):
+            self.assertTrue(presence.close_session('s1'))
+            self.assertFalse(presence.close_session('missing'))
+        channel_layer.send.assert_awaited_once_with('specific.abc!9', {'type': 'force_disconnect', 'code': 4000})
+
+
+class ConsumerPresenceTests(SimpleTestCase):
+    """消费者收到消息时续期在线状态"""
+
+    def make_consumer(self):
+        consumer = NotificationConsumer()
+        consumer.session_id = 's1'
+        consumer.user_id = 7
+        consumer.last_presence_touch = float('-inf')
+        consumer.channel_layer = mock.Mock(group_add=mock.AsyncMock())
+        consumer.channel_name = 'specific.abc!1'
+        consumer.send_frame = mock.AsyncMock()
+        consumer.create_websocket_message = mock.AsyncMock()
+        return consumer
+
+    def test_any_frame_refreshes_presence(self):
+        """前端客户端不一定发送 ping，任何消息都续期"""
+        consumer = self.make_consumer()
+        with mock.patch.object(presence, 'touch') as touch:
+            async_to_sync(consumer.receive)(text_data=json.dumps({'type': 'subscribe', 'channels': ['orders']}))
+        touch.assert_called_once_with('s1')
+
+    def test_refresh_is_throttled(self):
+        consumer = self.make_consumer()
+        with mock.patch.object(presence, 'touch') as touch:
+            async_to_sync(consumer.receive)(text_data=json.dumps({'type': 'ping'}))
+            async_to_sync(consumer.receive)(text_data='not json')
+        touch.assert_called_once_with('s1')
@@ -0,0 +1,79 @@
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from apps.websocket import streams
+
+
+class FakeRedis:
+    """模拟 Redis Stream 的最小实现"""
+    
+    def __init__(self):
+        self.values = {}
+        self.entries = {}
+    
+    def get(self, key):
+        return self.values.get(key)
+    
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+    
+    def eval(self, script, numkeys, stream, seq, maxlen, data, ttl):
+        value = int(self.values.get(seq, 0)) + 1
+        self.values[seq] = value
+        entries = self.entries.setdefault(stream, [])
+        entries.append((f'{value}-0'.encode(), {b'data': data.encode()}))
+        del entries[:-int(maxlen)]
+        return value
+    
+    def xrange(self, stream, min, max):
+        start = int(min.split('-')[0])
+        return [e for e in self.entries.get(stream, []) if int(e[0].split(b'-')[0]) >= start]
+
+
+@override_settings(WEBSOCKET_STREAMS={'MAXLEN': 3})
+class EventStreamTests(SimpleTestCase):
+    """WebSocket事件流测试类"""
+    
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(streams, 'get_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def publish(self, count, group='user_1'):
+        return [
+            streams.stamp_event(group, {'type': 'order_update', 'data': {'n': i}})
+            for i in range(count)
+        ]
+    
+    def test_sequence_is_monotonic(self):
+        events = self.publish(3)
+        self.assertEqual([e['seq'] for e in events], [1, 2, 3])
+        self.assertEqual(events[0]['stream'], 'user_1')
+    
+    def test_unstreamed_group_not_stamped(self):
+        message = {'type': 'order_update', 'data': {}}
+        self.assertIs(streams.stamp_event('orders_1', message), message)
+    
+    def test_resume_replays_missed_events(self):
+        self.publish(3)
+        events, resync = streams.read_events('user_1', 1)
+        self.assertFalse(resync)
+        self.assertEqual([e['seq'] for e in events], [2, 3])
+    
+    def test_resume_up_to_date(self):
+        self.publish(2)
+        self.assertEqual(streams.read_events('user_1', 2), ([], False))
+    
+    def test_resume_past_retention_requires_resync(self):
+        self.publish(5)
+        events, resync = streams.read_events('user_1', 1)
+        self.assertTrue(resync)
+        self.assertEqual(events, [])
+    
+    def test_resume_ahead_of_server_requires_resync(self):
+        self.publish(1)
+        self.assertTrue(streams.read_events('user_1', 10)[1])
+    
+    def test_last_sequences(self):
+        self.publish(2)
+        self.assertEqual(streams.last_sequences(['user_1', 'alerts_all']), {'user_1': 2, 'alerts_all': 0})
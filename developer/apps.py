@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class DeveloperConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'developer'
+    
+    def ready(self):
+        """应用就绪时执行的操作"""
+        # 导入信号处理器，用于登记登录会话
+        from . import signals
+        # 注册为系统指标采样回调（采样线程只在服务进程中运行）
+        from . import system_collector
+        system_collector.install_system_collector()
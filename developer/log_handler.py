@@ -0,0 +1,196 @@
+"""
+SystemLog 数据库日志处理器
+
+日志记录在请求线程中只做格式化并放入有界队列，由后台线程每隔 flush_interval 秒
+（或积累到 batch_size 条时）用 bulk_create 批量写入 SystemLog，记录时间取日志产生的时间。
+
+- 队列满时丢弃新记录，丢弃数按级别计数（system_log_dropped_total）；
+- 后台线程每隔 PRUNE_INTERVAL 秒删除 RETENTION_DAYS 天之前的记录（分批删除，
+  多个进程通过缓存锁保证同一时间只有一个执行）；
+- 进程退出时（atexit / logging.shutdown）写入剩余记录。
+
+在 LOGGING 中配置：
+    'database': {
+        'class': 'developer.log_handler.DatabaseLogHandler',
+        'level': 'INFO',
+        'capacity': 10000,
+        'flush_interval': 0.5,
+    }
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from prometheus_client import Counter
+
+# 不要使用 apps 日志器：写入失败的日志不能再进入本处理器
+logger = logging.getLogger(__name__)
+
+SYSTEM_LOG_DROPPED = Counter(
+    'system_log_dropped_total',
+    'Number of log records dropped by the database log handler',
+    ['level']
+)
+
+# 本处理器写库时产生的 SQL 日志不再记录
+IGNORED_LOGGERS = ('django.db.backends', __name__)
+
+DEFAULT_RETENTION_DAYS = 30
+PRUNE_INTERVAL = 3600        # 清理过期记录的间隔（秒）
+PRUNE_BATCH_SIZE = 5000      # 每批删除的记录数
+PRUNE_LOCK_KEY = 'system_log:prune'
+MAX_MESSAGE_LENGTH = 10000
+
+
+class DatabaseLogHandler(logging.Handler):
+    """异步批量写入 SystemLog 的日志处理器"""
+
+    def __init__(self, level=logging.NOTSET, capacity=10000, flush_interval=0.5,
+                 batch_size=500, retention_days=DEFAULT_RETENTION_DAYS):
+        super().__init__(level)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self.dropped = {}
+        self._queue = deque()
+        self._queue_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+        self._pruned_at = 0.0
+        atexit.register(self.close)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _drop(self, level):
+        self.dropped[level] = self.dropped.get(level, 0) + 1
+        SYSTEM_LOG_DROPPED.labels(level=level).inc()
+
+    def enqueue(self, entry):
+        """放入队列，队列满时丢弃新记录"""
+        with self._queue_lock:
+            if len(self._queue) >= self.capacity:
+                self._drop(entry['level'])
+                return
+            self._queue.append(entry)
+            full = len(self._queue) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def emit(self, record):
+        if record.name.startswith(IGNORED_LOGGERS):
+            return
+        worker = self._worker
+        if worker is not None and threading.get_ident() == worker.ident:
+            return
+        try:
+            trace = None
+            if record.exc_info:
+                trace = self.formatter.formatException(record.exc_info) if self.formatter else \
+                    logging.Formatter().formatException(record.exc_info)
+            self.enqueue({
+                'logger_name': record.name[:100],
+                'level': record.levelname if record.levelname in ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL') else 'INFO',
+                'message': record.getMessage()[:MAX_MESSAGE_LENGTH],
+                'trace': trace,
+                'timestamp': datetime.fromtimestamp(record.created, tz=dt_timezone.utc),
+            })
+            self.ensure_worker()
+        except Exception:
+            self.handleError(record)
+
+    def ensure_worker(self):
+        """启动后台写入线程（fork 后的子进程会重新启动）"""
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._queue_lock:
+            if self._worker is not None and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run, name='system-log-writer', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def take_batch(self):
+        """取出队列中的全部记录"""
+        with self._queue_lock:
+            entries = list(self._queue)
+            self._queue.clear()
+        return entries
+
+    def write(self, entries):
+        """批量写入数据库"""
+        from django.apps import apps
+        if not apps.ready:
+            return False
+        from .models import SystemLog
+
+        SystemLog.objects.bulk_create([
+            SystemLog(
+                logger_name=entry['logger_name'],
+                level=entry['level'],
+                message=entry['message'],
+                trace=entry['trace'],
+                timestamp=entry['timestamp'],
+            )
+            for entry in entries
+        ], batch_size=self.batch_size)
+        return True
+
+    def flush(self):
+        entries = self.take_batch()
+        if not entries:
+            return
+        try:
+            if not self.write(entries):
+                # 应用尚未加载完成，放回队列下次再写
+                for entry in entries:
+                    self.enqueue(entry)
+        except Exception as e:
+            for entry in entries:
+                self._drop(entry['level'])
+            logger.warning(f'写入系统日志失败，丢弃 {len(entries)} 条: {str(e)}')
+
+    def prune(self):
+        """删除保留期之前的记录"""
+        now = time.monotonic()
+        if not self.retention_days or now - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        from django.core.cache import cache
+        from .models import SystemLog
+
+        if not cache.add(PRUNE_LOCK_KEY, os.getpid(), PRUNE_INTERVAL):
+            return
+        cutoff = datetime.now(tz=dt_timezone.utc) - timedelta(days=self.retention_days)
+        while True:
+            ids = list(SystemLog.objects.filter(timestamp__lt=cutoff).order_by().values_list('id', flat=True)[:PRUNE_BATCH_SIZE])
+            if not ids:
+                break
+            SystemLog.objects.filter(id__in=ids).delete()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            try:
+                self.prune()
+            except Exception as e:
+                logger.warning(f'清理过期系统日志失败: {str(e)}')
+
+    def close(self):
+        """停止后台线程并写入剩余记录"""
+        self._stop_event.set()
+        self._wakeup.set()
+        worker = self._worker
+        if worker is not None and self._worker_pid == os.getpid() and worker.is_alive():
+            worker.join(timeout=5)
+        self.flush()
+        super().close()
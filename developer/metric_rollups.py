@@ -0,0 +1,392 @@
+"""
+API调用指标汇总
+
+每个进程在内存中按 (分钟, 路由模板, 请求方法) 累计调用次数、错误次数、
+状态码分布和响应时间直方图，由后台线程定期写入 APIMetricRollup 表。
+写入失败时数据放回累加器，下次写入时重试。FLUSH_INTERVAL 为 0 时（测试环境）
+不启动写入线程，需要显式调用 flush()。
+统计接口基于汇总表计算，不再扫描每个请求一行的 APIMetric 表。
+
+APIMetric 只保留采样的明细：慢请求、服务端错误和按比例随机抽样的请求。
+
+响应时间直方图使用对数分桶（相邻桶边界之比为 GROWTH），相对误差不超过
+GROWTH - 1，可以跨分钟、跨进程直接相加后计算分位数。
+"""
+import atexit
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.API_METRICS 覆盖
+DEFAULT_API_METRICS_SETTINGS = {
+    'ENABLED': True,
+    'PATH_PREFIX': '/api/',          # 只统计该前缀下的请求
+    'FLUSH_INTERVAL': 30,            # 汇总写入间隔（秒），为0时不启动写入线程
+    'RAW_SAMPLE_RATE': 0.01,         # 明细随机采样比例
+    'RAW_SLOW_THRESHOLD': 1000,      # 超过该响应时间（毫秒）的请求总是保留明细
+    'RAW_KEEP_ERRORS': True,         # 是否总是保留 5xx 请求明细
+}
+
+# 写入失败时最多保留的明细条数，超出时丢弃最早的
+MAX_PENDING_RAW = 10000
+
+GROWTH = 1.05
+_LOG_GROWTH = math.log(GROWTH)
+
+
+def get_api_metrics_settings():
+    """获取API指标汇总配置"""
+    config = dict(DEFAULT_API_METRICS_SETTINGS)
+    config.update(getattr(settings, 'API_METRICS', {}))
+    return config
+
+
+def bucket_index(value):
+    """响应时间（毫秒）所在的直方图桶，小于1毫秒的归入0号桶"""
+    if value < 1:
+        return 0
+    return int(math.log(value) / _LOG_GROWTH) + 1
+
+
+def bucket_value(index):
+    """桶的代表值（上下边界的中点）"""
+    if index == 0:
+        return 0.5
+    lower = GROWTH ** (index - 1)
+    return lower * (1 + GROWTH) / 2
+
+
+class LatencyHistogram:
+    """对数分桶的响应时间直方图"""
+
+    def __init__(self, buckets=None):
+        self.buckets = defaultdict(int)
+        if buckets:
+            self.merge(buckets)
+
+    def record(self, value):
+        self.buckets[bucket_index(value)] += 1
+
+    def merge(self, buckets):
+        """合并另一个直方图（支持从 JSON 读出的字符串键）"""
+        if isinstance(buckets, LatencyHistogram):
+            buckets = buckets.buckets
+        for index, count in buckets.items():
+            self.buckets[int(index)] += count
+
+    @property
+    def count(self):
+        return sum(self.buckets.values())
+
+    def percentile(self, pct):
+        """计算分位数（毫秒），没有数据时返回 None"""
+        total = self.count
+        if not total:
+            return None
+        rank = max(math.ceil(pct / 100 * total), 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return round(bucket_value(index), 2)
+        return round(bucket_value(max(self.buckets)), 2)
+
+    def to_json(self):
+        return {str(index): count for index, count in self.buckets.items()}
+
+
+class RollupCell:
+    """单个 (分钟, 端点, 方法) 的累计值"""
+
+    __slots__ = ('count', 'error_count', 'total_time', 'max_time', 'status_counts', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.error_count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.status_counts = defaultdict(int)
+        self.histogram = LatencyHistogram()
+
+    def record(self, status_code, duration):
+        self.count += 1
+        if status_code >= 400:
+            self.error_count += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.status_counts[str(status_code)] += 1
+        self.histogram.record(duration)
+
+    def merge(self, other):
+        """合并另一个单元格的累计值"""
+        self.count += other.count
+        self.error_count += other.error_count
+        self.total_time += other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        for status_code, count in other.status_counts.items():
+            self.status_counts[status_code] += count
+        self.histogram.merge(other.histogram)
+
+
+class MetricAccumulator:
+    """
+    进程内的API指标累加器
+
+    record 在请求路径上只做字典更新；flush 由后台线程调用，
+    把已累计的汇总和采样明细批量写入数据库。
+    """
+
+    def __init__(self):
+        self._cells = {}
+        self._raw = []
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, method, status_code, duration, raw=None):
+        """
+        记录一次请求
+
+        Args:
+            endpoint: 路由模板
+            method: 请求方法
+            status_code: 响应状态码
+            duration: 响应时间（毫秒）
+            raw: 需要保留明细时传入 APIMetric 字段字典，记录时间取调用本方法的时间
+        """
+        minute = int(time.time() // 60) * 60
+        if raw is not None:
+            raw.setdefault('timestamp', timezone.now())
+        key = (minute, endpoint, method)
+        with self._lock:
+            cell = self._cells.get(key)
+            if cell is None:
+                cell = self._cells[key] = RollupCell()
+            cell.record(status_code, duration)
+            if raw is not None:
+                self._raw.append(raw)
+
+    def take(self):
+        """取出当前累计的全部数据"""
+        with self._lock:
+            cells, self._cells = self._cells, {}
+            raw, self._raw = self._raw, []
+        return cells, raw
+
+    def restore(self, cells, raw):
+        """把写入失败的数据放回累加器"""
+        with self._lock:
+            for key, cell in cells.items():
+                current = self._cells.get(key)
+                if current is None:
+                    self._cells[key] = cell
+                else:
+                    current.merge(cell)
+            self._raw[:0] = raw
+            del self._raw[:-MAX_PENDING_RAW]
+
+    def flush(self):
+        """写入汇总表和采样明细，失败时放回累加器"""
+        cells, raw = self.take()
+        if not cells and not raw:
+            return
+        from .models import APIMetric, APIMetricRollup
+
+        rollups = [
+            APIMetricRollup(
+                bucket=datetime.fromtimestamp(minute, tz=dt_timezone.utc),
+                endpoint=endpoint[:255],
+                method=method,
+                count=cell.count,
+                error_count=cell.error_count,
+                total_time=round(cell.total_time, 3),
+                max_time=round(cell.max_time, 3),
+                status_counts=dict(cell.status_counts),
+                histogram=cell.histogram.to_json(),
+            )
+            for (minute, endpoint, method), cell in cells.items()
+        ]
+        try:
+            # 汇总和明细在同一事务中写入，重试时不会重复计数
+            with transaction.atomic():
+                APIMetricRollup.objects.bulk_create(rollups)
+                if raw:
+                    APIMetric.objects.bulk_create([APIMetric(**fields) for fields in raw])
+        except Exception as e:
+            logger.warning(f'写入API指标汇总失败，下次重试: {str(e)}')
+            self.restore(cells, raw)
+
+
+class RollupFlusher(threading.Thread):
+    """定期写入汇总的后台线程"""
+
+    def __init__(self, accumulator, interval):
+        super().__init__(name='api-metric-rollup', daemon=True)
+        self.accumulator = accumulator
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.accumulator.flush()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_accumulator = None
+_accumulator_pid = None
+_accumulator_lock = threading.Lock()
+
+
+def get_accumulator():
+    """获取当前进程的累加器（fork 后的子进程会重新创建并启动写入线程）"""
+    global _accumulator, _accumulator_pid
+    if _accumulator is not None and _accumulator_pid == os.getpid():
+        return _accumulator
+    with _accumulator_lock:
+        if _accumulator is None or _accumulator_pid != os.getpid():
+            accumulator = MetricAccumulator()
+            interval = get_api_metrics_settings()['FLUSH_INTERVAL']
+            if interval:
+                RollupFlusher(accumulator, interval).start()
+                atexit.register(accumulator.flush)
+            _accumulator = accumulator
+            _accumulator_pid = os.getpid()
+    return _accumulator
+
+
+def should_keep_raw(status_code, duration, config):
+    """是否保留该请求的明细记录"""
+    if duration >= config['RAW_SLOW_THRESHOLD']:
+        return True
+    if config['RAW_KEEP_ERRORS'] and status_code >= 500:
+        return True
+    return random.random() < config['RAW_SAMPLE_RATE']
+
+
+class APIMetricMiddleware:
+    """API调用指标采集中间件"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_api_metrics_settings()
+        if not config['ENABLED'] or not request.path.startswith(config['PATH_PREFIX']):
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = (time.perf_counter() - start) * 1000
+
+        try:
+            self.record(request, response, duration, config)
+        except Exception as e:
+            logger.warning(f'记录API指标失败: {str(e)}')
+        return response
+
+    def record(self, request, response, duration, config):
+        from apps.system.middleware import get_metric_labels
+
+        method, endpoint, _ = get_metric_labels(request)
+        raw = None
+        if method in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE') and should_keep_raw(response.status_code, duration, config):
+            user = getattr(request, 'user', None)
+            raw = {
+                'endpoint': request.path[:255],
+                'method': method,
+                'status_code': response.status_code,
+                'response_time': int(duration),
+                'user_id': user.id if user is not None and user.is_authenticated else None,
+                'ip_address': request.META.get('REMOTE_ADDR') or None,
+            }
+        get_accumulator().record(endpoint, method, response.status_code, duration, raw)
+
+
+def build_statistics(rows, slowest_count=10):
+    """
+    根据汇总行计算统计信息
+
+    Args:
+        rows: 汇总行字典的可迭代对象，包含 endpoint、method、count、error_count、
+              total_time、status_counts、histogram
+        slowest_count: 返回最慢接口的数量
+
+    Returns:
+        与原明细统计相同结构的字典（overall、by_method、by_status、slowest_apis），
+        并附带响应时间分位数
+    """
+    overall_histogram = LatencyHistogram()
+    by_method = defaultdict(lambda: {'count': 0, 'total_time': 0.0})
+    by_status = defaultdict(int)
+    by_endpoint = defaultdict(lambda: {'count': 0, 'total_time': 0.0, 'histogram': LatencyHistogram()})
+    total_calls = error_count = 0
+    total_time = 0.0
+
+    for row in rows:
+        total_calls += row['count']
+        error_count += row['error_count']
+        total_time += row['total_time']
+        overall_histogram.merge(row['histogram'])
+
+        method = by_method[row['method']]
+        method['count'] += row['count']
+        method['total_time'] += row['total_time']
+
+        for status_code, count in row['status_counts'].items():
+            by_status[int(status_code)] += count
+
+        endpoint = by_endpoint[(row['endpoint'], row['method'])]
+        endpoint['count'] += row['count']
+        endpoint['total_time'] += row['total_time']
+        endpoint['histogram'].merge(row['histogram'])
+
+    overall = {
+        'total_calls': total_calls,
+        'avg_response_time': total_time / total_calls if total_calls else None,
+        'success_count': total_calls - error_count,
+        'error_count': error_count,
+        'success_rate': (total_calls - error_count) / total_calls * 100 if total_calls else 0,
+        'p50': overall_histogram.percentile(50),
+        'p95': overall_histogram.percentile(95),
+        'p99': overall_histogram.percentile(99),
+    }
+
+    slowest_apis = sorted(
+        (
+            {
+                'endpoint': endpoint,
+                'method': method,
+                'avg_time': data['total_time'] / data['count'],
+                'count': data['count'],
+                'p95': data['histogram'].percentile(95),
+                'p99': data['histogram'].percentile(99),
+            }
+            for (endpoint, method), data in by_endpoint.items() if data['count']
+        ),
+        key=lambda item: item['avg_time'],
+        reverse=True
+    )[:slowest_count]
+
+    return {
+        'overall': overall,
+        'by_method': [
+            {'method': method, 'count': data['count'], 'avg_time': data['total_time'] / data['count'] if data['count'] else None}
+            for method, data in sorted(by_method.items())
+        ],
+        'by_status': [
+            {'status_code': status_code, 'count': count}
+            for status_code, count in sorted(by_status.items())
+        ],
+        'slowest_apis': slowest_apis,
+    }
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.19 on 2026-10-19 10:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('developer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='websocketsession',
+            name='connected_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='连接时间'),
+        ),
+        migrations.AlterField(
+            model_name='websocketsession',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='最后活动时间'),
+        ),
+    ]
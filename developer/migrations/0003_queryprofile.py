@@ -0,0 +1,38 @@
+# Generated by Django 4.2.19 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('developer', '0002_websocketsession_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=255, verbose_name='API端点')),
+                ('view_name', models.CharField(blank=True, default='', max_length=255, verbose_name='视图名称')),
+                ('method', models.CharField(max_length=10, verbose_name='请求方法')),
+                ('status_code', models.IntegerField(verbose_name='状态码')),
+                ('response_time', models.IntegerField(help_text='毫秒', verbose_name='响应时间')),
+                ('query_count', models.IntegerField(verbose_name='查询次数')),
+                ('db_time', models.FloatField(help_text='毫秒', verbose_name='数据库耗时')),
+                ('duplicate_count', models.IntegerField(default=0, verbose_name='重复查询次数')),
+                ('n_plus_one', models.BooleanField(default=False, verbose_name='疑似N+1')),
+                ('details', models.JSONField(default=dict, help_text='重复查询指纹和最慢语句', verbose_name='剖析详情')),
+                ('timestamp', models.DateTimeField(auto_now_add=True, verbose_name='记录时间')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='users.user', verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '查询剖析',
+                'verbose_name_plural': '查询剖析',
+                'ordering': ['-timestamp'],
+            },
+        ),
+    ]
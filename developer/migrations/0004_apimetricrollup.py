@@ -0,0 +1,34 @@
+# Generated by Django 4.2.19 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('developer', '0003_queryprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIMetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(db_index=True, verbose_name='统计分钟')),
+                ('endpoint', models.CharField(max_length=255, verbose_name='路由模板')),
+                ('method', models.CharField(max_length=10, verbose_name='请求方法')),
+                ('count', models.IntegerField(verbose_name='调用次数')),
+                ('error_count', models.IntegerField(default=0, verbose_name='错误次数')),
+                ('total_time', models.FloatField(help_text='毫秒', verbose_name='总响应时间')),
+                ('max_time', models.FloatField(help_text='毫秒', verbose_name='最大响应时间')),
+                ('status_counts', models.JSONField(default=dict, verbose_name='状态码分布')),
+                ('histogram', models.JSONField(default=dict, help_text='对数分桶计数', verbose_name='响应时间直方图')),
+            ],
+            options={
+                'verbose_name': 'API调用指标汇总',
+                'verbose_name_plural': 'API调用指标汇总',
+                'ordering': ['-bucket'],
+                'indexes': [models.Index(fields=['endpoint', 'method', 'bucket'], name='developer_a_endpoin_86f9f8_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.19 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('developer', '0004_apimetricrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['-timestamp'], name='developer_s_timesta_84ea9d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['level', '-timestamp'], name='developer_s_level_b3a1a5_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.19 on 2026-10-19 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('developer', '0005_systemlog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='apimetric',
+            index=models.Index(fields=['-timestamp', '-id'], name='developer_a_timesta_4f6254_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='websocketmessage',
+            index=models.Index(fields=['-timestamp', '-id'], name='developer_w_timesta_91db0c_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.19 on 2026-10-19 11:54
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('developer', '0007_systemlog_record_timestamp'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apimetric',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='记录时间'),
+        ),
+    ]
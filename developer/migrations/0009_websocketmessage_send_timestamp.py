@@ -0,0 +1,19 @@
+# Generated by Django 4.2.19 on 2026-10-19 11:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('developer', '0008_apimetric_request_timestamp'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='websocketmessage',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='时间戳'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from apps.users.models import User
 import uuid
@@ -46,17 +47,49 @@ class APIMetric(models.Model):
     response_time = models.IntegerField(_('响应时间'), help_text='毫秒')
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('用户'))
     ip_address = models.GenericIPAddressField(_('IP地址'), null=True, blank=True)
-    timestamp = models.DateTimeField(_('记录时间'), auto_now_add=True)
+    timestamp = models.DateTimeField(_('记录时间'), default=timezone.now)
     
     class Meta:
         verbose_name = _('API调用指标')
         verbose_name_plural = _('API调用指标')
         ordering = ['-timestamp']
+        indexes = [
+            # 游标分页排序
+            models.Index(fields=['-timestamp', '-id']),
+        ]
     
     def __str__(self):
         return f'{self.method} {self.endpoint} - {self.status_code}'
 
 
+class APIMetricRollup(models.Model):
+    """
+    API调用指标分钟汇总
+
+    每个进程每次写入一行，同一分钟、同一端点可能有多行，查询时再合并
+    """
+    bucket = models.DateTimeField(_('统计分钟'), db_index=True)
+    endpoint = models.CharField(_('路由模板'), max_length=255)
+    method = models.CharField(_('请求方法'), max_length=10)
+    count = models.IntegerField(_('调用次数'))
+    error_count = models.IntegerField(_('错误次数'), default=0)
+    total_time = models.FloatField(_('总响应时间'), help_text='毫秒')
+    max_time = models.FloatField(_('最大响应时间'), help_text='毫秒')
+    status_counts = models.JSONField(_('状态码分布'), default=dict)
+    histogram = models.JSONField(_('响应时间直方图'), default=dict, help_text='对数分桶计数')
+    
+    class Meta:
+        verbose_name = _('API调用指标汇总')
+        verbose_name_plural = _('API调用指标汇总')
+        ordering = ['-bucket']
+        indexes = [
+            models.Index(fields=['endpoint', 'method', 'bucket']),
+        ]
+    
+    def __str__(self):
+        return f'{self.method} {self.endpoint} - {self.bucket}'
+
+
 class SystemLog(models.Model):
     """系统日志模型"""
     LEVEL_CHOICES = (
@@ -71,12 +104,17 @@ class SystemLog(models.Model):
     level = models.CharField(_('日志级别'), max_length=10, choices=LEVEL_CHOICES)
     message = models.TextField(_('日志消息'))
     trace = models.TextField(_('堆栈跟踪'), null=True, blank=True)
-    timestamp = models.DateTimeField(_('记录时间'), auto_now_add=True)
+    # 由日志处理器写入日志产生的时间（LogRecord.created），而不是批量写库的时间
+    timestamp = models.DateTimeField(_('记录时间'), default=timezone.now)
     
     class Meta:
         verbose_name = _('系统日志')
         verbose_name_plural = _('系统日志')
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp']),
+            models.Index(fields=['level', '-timestamp']),
+        ]
     
     def __str__(self):
         return f'{self.level} - {self.logger_name} - {self.timestamp}'
@@ -119,14 +157,18 @@ class ConfigItem(models.Model):
 
 
 class WebSocketSession(models.Model):
-    """WebSocket会话模型"""
+    """
+    WebSocket会话模型
+
+    在线状态由 Redis 维护（apps.websocket.presence），这里只保存会话汇总记录
+    """
     session_id = models.UUIDField(_('会话ID'), default=uuid.uuid4, editable=False, unique=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_('用户'))
     client_ip = models.GenericIPAddressField(_('客户端IP'), null=True, blank=True)
-    connected_at = models.DateTimeField(_('连接时间'), auto_now_add=True)
+    connected_at = models.DateTimeField(_('连接时间'), default=timezone.now)
     disconnected_at = models.DateTimeField(_('断开时间'), null=True, blank=True)
     is_active = models.BooleanField(_('是否活跃'), default=True)
-    last_activity = models.DateTimeField(_('最后活动时间'), auto_now=True)
+    last_activity = models.DateTimeField(_('最后活动时间'), default=timezone.now)
     
     class Meta:
         verbose_name = _('WebSocket会话')
@@ -147,12 +189,40 @@ class WebSocketMessage(models.Model):
     session = models.ForeignKey(WebSocketSession, on_delete=models.CASCADE, related_name='messages', verbose_name=_('会话'))
     direction = models.CharField(_('方向'), max_length=10, choices=DIRECTION_CHOICES)
     message = models.TextField(_('消息内容'))
-    timestamp = models.DateTimeField(_('时间戳'), auto_now_add=True)
+    timestamp = models.DateTimeField(_('时间戳'), default=timezone.now)
     
     class Meta:
         verbose_name = _('WebSocket消息')
         verbose_name_plural = _('WebSocket消息')
         ordering = ['-timestamp']
+        indexes = [
+            # 游标分页排序
+            models.Index(fields=['-timestamp', '-id']),
+        ]
     
     def __str__(self):
         return f'{self.get_direction_display()} - {self.timestamp}'
+
+
+class QueryProfile(models.Model):
+    """请求级ORM查询剖析记录"""
+    endpoint = models.CharField(_('API端点'), max_length=255)
+    view_name = models.CharField(_('视图名称'), max_length=255, blank=True, default='')
+    method = models.CharField(_('请求方法'), max_length=10)
+    status_code = models.IntegerField(_('状态码'))
+    response_time = models.IntegerField(_('响应时间'), help_text='毫秒')
+    query_count = models.IntegerField(_('查询次数'))
+    db_time = models.FloatField(_('数据库耗时'), help_text='毫秒')
+    duplicate_count = models.IntegerField(_('重复查询次数'), default=0)
+    n_plus_one = models.BooleanField(_('疑似N+1'), default=False)
+    details = models.JSONField(_('剖析详情'), default=dict, help_text='重复查询指纹和最慢语句')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('用户'))
+    timestamp = models.DateTimeField(_('记录时间'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('查询剖析')
+        verbose_name_plural = _('查询剖析')
+        ordering = ['-timestamp']
+    
+    def __str__(self):
+        return f'{self.method} {self.endpoint} - {self.query_count} queries'
@@ -0,0 +1,322 @@
+"""
+线上采样剖析
+
+开发者在控制台开启一次剖析会话（保存在缓存中，所有 worker 可见），各 worker 的
+SamplingProfilerMiddleware 每隔 CHECK_INTERVAL 秒检查一次会话状态，发现新会话后在本进程内：
+
+- 启动采样线程，每隔 interval 秒通过 sys._current_frames() 记录调用栈，
+  指定 URL 模式时只采样正在处理匹配请求的线程；
+- 对匹配的请求（最多 requests 个）用 cProfile 记录确定性统计。
+
+达到时长或请求数后，结果写入 DIRECTORY：
+    <session_id>-<pid>.collapsed   折叠调用栈，可直接用 flamegraph.pl / speedscope 打开
+    <session_id>-<pid>.prof        cProfile 统计（pstats 格式）
+
+未开启会话时中间件只做一次时间比较，开启后开销由采样间隔和请求数上限控制。
+"""
+import cProfile
+import glob
+import io
+import logging
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.SAMPLING_PROFILER 覆盖
+DEFAULT_PROFILER_SETTINGS = {
+    'ENABLED': True,
+    'DIRECTORY': os.path.join(settings.BASE_DIR, 'profiles'),
+    'SAMPLE_INTERVAL': 0.01,     # 默认采样间隔（秒）
+    'MIN_SAMPLE_INTERVAL': 0.005,
+    'MAX_SECONDS': 300,          # 单次会话最长时间（秒）
+    'MAX_REQUESTS': 200,         # 单次会话最多剖析的请求数
+    'MAX_STACK_DEPTH': 64,
+    'CHECK_INTERVAL': 1,         # worker 检查会话状态的间隔（秒）
+}
+
+SESSION_CACHE_KEY = 'developer:profiler:session'
+RESULT_KINDS = {
+    'collapsed': '.collapsed',
+    'pstats': '.prof',
+}
+
+
+def get_profiler_settings():
+    """获取采样剖析配置"""
+    config = dict(DEFAULT_PROFILER_SETTINGS)
+    config.update(getattr(settings, 'SAMPLING_PROFILER', {}))
+    return config
+
+
+def arm(seconds, requests=None, url_pattern=None, interval=None, user=None):
+    """
+    开启剖析会话
+
+    Args:
+        seconds: 剖析时长（秒），不超过 MAX_SECONDS
+        requests: 剖析的请求数上限，不超过 MAX_REQUESTS
+        url_pattern: 请求路径正则，为空时采样进程内所有线程
+        interval: 采样间隔（秒）
+        user: 开启会话的用户名
+
+    Returns:
+        会话信息字典
+    """
+    config = get_profiler_settings()
+    if url_pattern:
+        re.compile(url_pattern)
+    seconds = min(float(seconds), config['MAX_SECONDS'])
+    session = {
+        'session_id': uuid.uuid4().hex[:12],
+        'seconds': seconds,
+        'requests': min(int(requests or config['MAX_REQUESTS']), config['MAX_REQUESTS']),
+        'url_pattern': url_pattern or None,
+        'interval': max(float(interval or config['SAMPLE_INTERVAL']), config['MIN_SAMPLE_INTERVAL']),
+        'started_at': time.time(),
+        'created_by': user,
+    }
+    cache.set(SESSION_CACHE_KEY, session, int(seconds) + 60)
+    return session
+
+
+def disarm():
+    """停止当前会话，各 worker 在下次检查时写出结果"""
+    cache.delete(SESSION_CACHE_KEY)
+
+
+def current_session():
+    session = cache.get(SESSION_CACHE_KEY)
+    if session and time.time() - session['started_at'] >= session['seconds']:
+        return None
+    return session
+
+
+def frame_label(frame):
+    """调用栈中一帧的名称，去掉折叠格式中的分隔符"""
+    code = frame.f_code
+    filename = code.co_filename
+    # 只保留相对路径，缩短火焰图标签
+    for prefix in sys.path:
+        if prefix and filename.startswith(prefix):
+            filename = filename[len(prefix):].lstrip(os.sep)
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':').replace(' ', '_')
+
+
+def collapse_stack(frame, max_depth):
+    """把帧链转换为折叠格式（根在前）"""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class ProfilingRun:
+    """单个 worker 内的一次剖析"""
+
+    def __init__(self, session, config):
+        self.session = session
+        self.config = config
+        self.pattern = re.compile(session['url_pattern']) if session['url_pattern'] else None
+        self.deadline = session['started_at'] + session['seconds']
+        self.stacks = Counter()
+        self.samples = 0
+        self.request_count = 0
+        self.stats = None
+        self.finished = False
+        self._threads = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name='sampling-profiler', daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def matches(self, path):
+        return self.pattern is None or bool(self.pattern.search(path))
+
+    def begin_request(self):
+        """开始剖析一个请求，超过请求数上限时返回 None"""
+        with self._lock:
+            if self.finished or self.request_count >= self.session['requests']:
+                return None
+            self.request_count += 1
+            self._threads.add(threading.get_ident())
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def end_request(self, profile):
+        profile.disable()
+        with self._lock:
+            self._threads.discard(threading.get_ident())
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+            done = self.request_count >= self.session['requests']
+        if done:
+            self.finish()
+
+    def sample(self):
+        """记录一次调用栈"""
+        own = threading.get_ident()
+        max_depth = self.config['MAX_STACK_DEPTH']
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            if self.pattern is not None and thread_id not in self._threads:
+                continue
+            self.stacks[collapse_stack(frame, max_depth)] += 1
+        self.samples += 1
+
+    def _sample_loop(self):
+        interval = self.session['interval']
+        while not self._stop_event.wait(interval):
+            if time.time() >= self.deadline:
+                break
+            self.sample()
+        self.finish()
+
+    def output_path(self, kind):
+        return os.path.join(
+            self.config['DIRECTORY'], f"{self.session['session_id']}-{os.getpid()}{RESULT_KINDS[kind]}"
+        )
+
+    def finish(self):
+        """停止采样并写出结果（只执行一次）"""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+        self._stop_event.set()
+        # 等待采样线程退出，避免写出时调用栈计数仍在变化
+        if threading.current_thread() is not self._sampler and self._sampler.is_alive():
+            self._sampler.join(timeout=1)
+        try:
+            os.makedirs(self.config['DIRECTORY'], exist_ok=True)
+            if self.stacks:
+                with open(self.output_path('collapsed'), 'w') as f:
+                    for stack, count in self.stacks.most_common():
+                        f.write(f'{stack} {count}\n')
+            if self.stats is not None:
+                self.stats.dump_stats(self.output_path('pstats'))
+            logger.info(
+                f"剖析会话 {self.session['session_id']} 结束: "
+                f'samples={self.samples} requests={self.request_count}'
+            )
+        except Exception as e:
+            logger.warning(f'写出剖析结果失败: {str(e)}')
+
+
+def list_results():
+    """列出本机已有的剖析结果，按会话分组"""
+    directory = get_profiler_settings()['DIRECTORY']
+    results = {}
+    for path in glob.glob(os.path.join(directory, '*-*.*')):
+        name = os.path.basename(path)
+        session_id, _, rest = name.partition('-')
+        kind = next((k for k, suffix in RESULT_KINDS.items() if rest.endswith(suffix)), None)
+        if kind is None:
+            continue
+        entry = results.setdefault(session_id, {'session_id': session_id, 'kinds': set(), 'workers': set(), 'modified': 0})
+        entry['kinds'].add(kind)
+        entry['workers'].add(rest.split('.')[0])
+        entry['modified'] = max(entry['modified'], os.path.getmtime(path))
+    return sorted(
+        ({**entry, 'kinds': sorted(entry['kinds']), 'workers': len(entry['workers'])} for entry in results.values()),
+        key=lambda entry: entry['modified'],
+        reverse=True
+    )
+
+
+def load_result(session_id, kind):
+    """
+    合并同一会话各 worker 的结果
+
+    Returns:
+        文件内容（bytes），没有结果时返回 None
+    """
+    if not re.fullmatch(r'[0-9a-f]+', session_id or '') or kind not in RESULT_KINDS:
+        return None
+    directory = get_profiler_settings()['DIRECTORY']
+    paths = sorted(glob.glob(os.path.join(directory, f'{session_id}-*{RESULT_KINDS[kind]}')))
+    if not paths:
+        return None
+
+    if kind == 'collapsed':
+        stacks = Counter()
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack:
+                        stacks[stack] += int(count)
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common()).encode('utf-8')
+
+    stats = pstats.Stats(*paths, stream=io.StringIO())
+    return marshal.dumps(stats.stats)
+
+
+class SamplingProfilerMiddleware:
+    """按需开启的采样剖析中间件"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_profiler_settings()
+        self.run = None
+        self._seen_sessions = set()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def active_run(self):
+        """检查会话状态，必要时启动或结束本进程的剖析"""
+        now = time.monotonic()
+        if now - self._checked_at < self.config['CHECK_INTERVAL']:
+            return self.run
+        with self._lock:
+            if now - self._checked_at < self.config['CHECK_INTERVAL']:
+                return self.run
+            self._checked_at = now
+            try:
+                session = current_session()
+            except Exception:
+                session = None
+            run = self.run
+            if run is not None and (session is None or session['session_id'] != run.session['session_id']):
+                run.finish()
+                run = None
+            # 同一会话在本进程只执行一次
+            if run is None and session is not None and session['session_id'] not in self._seen_sessions:
+                self._seen_sessions.add(session['session_id'])
+                run = ProfilingRun(session, self.config)
+                run.start()
+            self.run = run
+            return run
+
+    def __call__(self, request):
+        if not self.config['ENABLED']:
+            return self.get_response(request)
+        run = self.active_run()
+        if run is None or run.finished or not run.matches(request.path):
+            return self.get_response(request)
+
+        profile = run.begin_request()
+        if profile is None:
+            return self.get_response(request)
+        try:
+            return self.get_response(request)
+        finally:
+            run.end_request(profile)
@@ -0,0 +1,252 @@
+"""
+请求级ORM查询剖析
+
+按需记录单个请求内执行的SQL：查询次数、数据库总耗时、重复的查询形状和最慢的语句。
+同一查询形状（去掉参数后的SQL）在一个请求内重复出现达到阈值时标记为疑似 N+1。
+
+开启方式：
+1. 请求头 X-Query-Profile: 1（需开启 HEADER_ENABLED），只对 DEBUG 环境或已登录的
+   管理员/开发者生效，其他请求不保存剖析记录、不返回 X-Query-* 响应头；
+2. 开发者控制台的调试模式（DebugModeView），按 SAMPLE_RATE 采样剖析。
+
+未开启时中间件只读取一个请求头和进程内缓存的开关状态，不安装 execute_wrapper。
+"""
+import hashlib
+import logging
+import random
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.QUERY_PROFILER 覆盖
+DEFAULT_QUERY_PROFILER_SETTINGS = {
+    'ENABLED': True,
+    'HEADER_ENABLED': False,      # 是否允许通过请求头开启剖析
+    'SAMPLE_RATE': 0.1,           # 调试模式下的采样比例
+    'CHECK_INTERVAL': 5,          # 调试模式开关在进程内的缓存时间（秒）
+    'N_PLUS_ONE_THRESHOLD': 5,    # 同一查询形状重复多少次视为 N+1
+    'SLOWEST_COUNT': 5,           # 记录最慢语句的数量
+    'DUPLICATE_COUNT': 10,        # 记录重复查询指纹的数量
+    'MAX_SQL_LENGTH': 2000,       # 保存的SQL最大长度
+}
+
+PROFILE_HEADER = 'HTTP_X_QUERY_PROFILE'
+QUERY_PROFILE_CACHE_KEY = 'QUERY_PROFILING'
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def get_profiler_settings():
+    """获取查询剖析配置"""
+    config = dict(DEFAULT_QUERY_PROFILER_SETTINGS)
+    config.update(getattr(settings, 'QUERY_PROFILER', {}))
+    return config
+
+
+def normalize_sql(sql):
+    """将SQL规整为查询形状：去掉字面量，合并长度不同的 IN 列表"""
+    shape = _STRING_RE.sub('?', sql)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _IN_LIST_RE.sub('(...)', shape)
+    return _WHITESPACE_RE.sub(' ', shape).strip()
+
+
+def fingerprint(sql):
+    """查询形状指纹"""
+    return hashlib.md5(normalize_sql(sql).encode('utf-8')).hexdigest()[:16]
+
+
+class QueryProfiler:
+    """
+    查询记录器，作为 connection.execute_wrapper 使用
+
+    只记录每个查询的指纹、SQL和耗时，汇总在请求结束后进行。
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.queries.append((context['connection'].alias, sql, duration))
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    @property
+    def db_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def summarize(self, config=None):
+        """
+        汇总剖析结果
+
+        Returns:
+            字典，包含 query_count、db_time、duplicate_count、n_plus_one、duplicates、slowest
+        """
+        config = config or get_profiler_settings()
+        max_length = config['MAX_SQL_LENGTH']
+
+        groups = {}
+        for alias, sql, duration in self.queries:
+            key = fingerprint(sql)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    'fingerprint': key,
+                    'database': alias,
+                    'sql': sql[:max_length],
+                    'count': 0,
+                    'total_time': 0.0,
+                }
+            group['count'] += 1
+            group['total_time'] += duration
+
+        duplicates = sorted(
+            (group for group in groups.values() if group['count'] > 1),
+            key=lambda group: group['count'],
+            reverse=True
+        )
+        for group in duplicates:
+            group['total_time'] = round(group['total_time'], 3)
+            group['n_plus_one'] = group['count'] >= config['N_PLUS_ONE_THRESHOLD']
+
+        slowest = sorted(self.queries, key=lambda query: query[2], reverse=True)[:config['SLOWEST_COUNT']]
+
+        return {
+            'query_count': self.query_count,
+            'db_time': round(self.db_time, 3),
+            'duplicate_count': sum(group['count'] - 1 for group in duplicates),
+            'n_plus_one': any(group['n_plus_one'] for group in duplicates),
+            'duplicates': duplicates[:config['DUPLICATE_COUNT']],
+            'slowest': [
+                {'database': alias, 'sql': sql[:max_length], 'time': round(duration, 3)}
+                for alias, sql, duration in slowest
+            ],
+        }
+
+
+class QueryProfilerMiddleware:
+    """
+    ORM查询剖析中间件
+
+    剖析结果保存到 developer.QueryProfile，并通过响应头
+    X-Query-Count / X-Query-Time 返回给调用方。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._debug_enabled = False
+        self._debug_checked_at = 0.0
+
+    def debug_mode_enabled(self, config):
+        """调试模式开关，进程内缓存 CHECK_INTERVAL 秒，避免每个请求访问缓存"""
+        now = time.monotonic()
+        if now - self._debug_checked_at >= config['CHECK_INTERVAL']:
+            self._debug_checked_at = now
+            try:
+                self._debug_enabled = bool(cache.get(QUERY_PROFILE_CACHE_KEY))
+            except Exception:
+                self._debug_enabled = False
+        return self._debug_enabled
+
+    def header_requested(self, request, config):
+        return config['HEADER_ENABLED'] and request.META.get(PROFILE_HEADER, '').lower() in ('1', 'true', 'yes')
+
+    def header_allowed(self, request):
+        """
+        请求头开启的剖析是否生效：DEBUG 环境，或已登录的管理员/开发者组成员
+
+        在视图执行之后判断，DRF 的 Token/JWT 认证结果此时已写回 request.user。
+        """
+        if settings.DEBUG:
+            return True
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return False
+        return (
+            user.is_staff or
+            user.is_superuser or
+            user.groups.filter(name__icontains='developer').exists()
+        )
+
+    def should_profile(self, request, config):
+        if not config['ENABLED']:
+            return False
+        if self.header_requested(request, config):
+            return True
+        return self.debug_mode_enabled(config) and random.random() < config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        config = get_profiler_settings()
+        if not self.should_profile(request, config):
+            return self.get_response(request)
+        # 调试模式采样的请求不区分用户；只由请求头开启的剖析需要在请求结束后校验身份
+        sampled = not self.header_requested(request, config)
+
+        profiler = QueryProfiler()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(profiler))
+            response = self.get_response(request)
+        response_time = (time.perf_counter() - start) * 1000
+        if not sampled and not self.header_allowed(request):
+            return response
+
+        summary = profiler.summarize(config)
+        response['X-Query-Count'] = str(summary['query_count'])
+        response['X-Query-Time'] = f"{summary['db_time']:.1f}ms"
+        if summary['n_plus_one']:
+            response['X-Query-N-Plus-One'] = 'true'
+            logger.warning(
+                f'疑似N+1查询: {request.method} {request.path} '
+                f"queries={summary['query_count']} duplicates={summary['duplicate_count']}"
+            )
+
+        self.save_profile(request, response, response_time, summary)
+        return response
+
+    def save_profile(self, request, response, response_time, summary):
+        """保存剖析记录（在剖析范围之外执行，不计入统计）"""
+        from apps.system.middleware import route_template
+        from .models import QueryProfile
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        endpoint = request.path
+        view_name = ''
+        if resolver_match is not None:
+            endpoint = route_template(resolver_match) or request.path
+            view_name = resolver_match.view_name or ''
+
+        user = getattr(request, 'user', None)
+        try:
+            QueryProfile.objects.create(
+                endpoint=endpoint[:255],
+                view_name=view_name[:255],
+                method=request.method,
+                status_code=response.status_code,
+                response_time=int(response_time),
+                query_count=summary['query_count'],
+                db_time=summary['db_time'],
+                duplicate_count=summary['duplicate_count'],
+                n_plus_one=summary['n_plus_one'],
+                details={'duplicates': summary['duplicates'], 'slowest': summary['slowest']},
+                user=user if user is not None and user.is_authenticated else None,
+            )
+        except Exception as e:
+            logger.warning(f'保存查询剖析记录失败: {str(e)}')
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .models import (
     SystemMonitor, APIMetric, SystemLog, ConfigItem,
-    WebSocketSession, WebSocketMessage
+    WebSocketSession, WebSocketMessage, QueryProfile
 )
 from apps.users.serializers import UserSerializer
 
@@ -27,6 +27,25 @@ class APIMetricSerializer(serializers.ModelSerializer):
             'id', 'endpoint', 'method', 'status_code', 'response_time',
             'user', 'user_display', 'ip_address', 'timestamp'
         ]
+        read_only_fields = ['timestamp']
+    
+    def get_user_display(self, obj):
+        if obj.user:
+            return obj.user.username
+        return None
+
+
+class QueryProfileSerializer(serializers.ModelSerializer):
+    """查询剖析记录序列化器"""
+    user_display = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = QueryProfile
+        fields = [
+            'id', 'endpoint', 'view_name', 'method', 'status_code', 'response_time',
+            'query_count', 'db_time', 'duplicate_count', 'n_plus_one', 'details',
+            'user', 'user_display', 'timestamp'
+        ]
     
     def get_user_display(self, obj):
         if obj.user:
@@ -44,6 +63,7 @@ class SystemLogSerializer(serializers.ModelSerializer):
             'id', 'logger_name', 'level', 'level_display', 
             'message', 'trace', 'timestamp'
         ]
+        read_only_fields = ['timestamp']
 
 
 class ConfigItemSerializer(serializers.ModelSerializer):
@@ -112,6 +132,7 @@ class WebSocketMessageSerializer(serializers.ModelSerializer):
             'id', 'session', 'session_info', 'direction', 'direction_display',
             'message', 'timestamp'
         ]
+        read_only_fields = ['timestamp']
     
     def get_session_info(self, obj):
         return {
@@ -0,0 +1,217 @@
+"""
+登录会话登记
+
+按用户索引的会话登记表保存在 Redis 中，会话管理接口不再遍历 django_session 表
+并逐个解码、逐个查询用户：
+
+- sessions:registry:users           有序集合，成员为 user_id，分值为该用户最近一次活动时间
+- sessions:registry:user:<user_id>  有序集合，成员为 session_key，分值为会话过期时间
+- sessions:registry:<session_key>   哈希，保存 user_id、IP、登录时间和最后活动时间，随会话过期
+
+登录时登记，登出或终止时注销，最后活动时间由中间件按 TOUCH_INTERVAL 节流更新。
+过期会话的哈希由 Redis 自动清除，索引中的残留成员在读取时剔除。
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY as SESSION_USER_KEY
+from django_redis import get_redis_connection
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.SESSION_REGISTRY 覆盖
+DEFAULT_SESSION_REGISTRY_SETTINGS = {
+    'ENABLED': True,
+    'TOUCH_INTERVAL': 60,     # 同一会话两次更新最后活动时间的最小间隔（秒）
+}
+
+USERS_KEY = 'sessions:registry:users'
+USER_KEY_PREFIX = 'sessions:registry:user:'
+SESSION_KEY_PREFIX = 'sessions:registry:'
+
+# 本进程最近一次更新各会话活动时间的时刻，超过上限时清空
+_touched = {}
+MAX_TOUCHED = 10000
+
+
+def get_registry_settings():
+    """获取会话登记配置"""
+    config = dict(DEFAULT_SESSION_REGISTRY_SETTINGS)
+    config.update(getattr(settings, 'SESSION_REGISTRY', {}))
+    return config
+
+
+def get_connection():
+    return get_redis_connection('default')
+
+
+def user_key(user_id):
+    return f'{USER_KEY_PREFIX}{user_id}'
+
+
+def session_key(key):
+    return f'{SESSION_KEY_PREFIX}{key}'
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def register(session, user, ip_address):
+    """登录时登记会话"""
+    if not get_registry_settings()['ENABLED'] or not session.session_key:
+        return
+    now = time.time()
+    expire_at = session.get_expiry_date().timestamp()
+    ttl = max(int(expire_at - now), 1)
+    try:
+        pipe = get_connection().pipeline()
+        pipe.hset(session_key(session.session_key), mapping={
+            'session_key': session.session_key,
+            'user_id': user.pk,
+            'ip_address': ip_address or '',
+            'login_at': now,
+            'last_activity': now,
+            'expire_at': expire_at,
+        })
+        pipe.expire(session_key(session.session_key), ttl)
+        pipe.zadd(user_key(user.pk), {session.session_key: expire_at})
+        pipe.expire(user_key(user.pk), ttl)
+        pipe.zadd(USERS_KEY, {str(user.pk): now})
+        pipe.execute()
+        _touched[session.session_key] = time.monotonic()
+    except Exception as e:
+        logger.warning(f'登记登录会话失败: {str(e)}')
+
+
+def touch(session):
+    """
+    更新会话最后活动时间
+
+    按 TOUCH_INTERVAL 节流，节流判断只使用 Cookie 中的会话键，不加载会话和用户
+    """
+    config = get_registry_settings()
+    key = session.session_key
+    if not config['ENABLED'] or not key:
+        return
+    now_monotonic = time.monotonic()
+    if now_monotonic - _touched.get(key, 0) < config['TOUCH_INTERVAL']:
+        return
+    if len(_touched) >= MAX_TOUCHED:
+        _touched.clear()
+    _touched[key] = now_monotonic
+
+    user_id = session.get(SESSION_USER_KEY)
+    if user_id is None:
+        return
+
+    now = time.time()
+    expire_at = session.get_expiry_date().timestamp()
+    ttl = max(int(expire_at - now), 1)
+    try:
+        connection = get_connection()
+        # 登记表中没有该会话（如功能上线前登录的会话）时补登记
+        if not connection.exists(session_key(key)):
+            pipe = connection.pipeline()
+            pipe.hset(session_key(key), mapping={
+                'session_key': key, 'user_id': user_id, 'ip_address': '',
+                'login_at': now, 'last_activity': now, 'expire_at': expire_at,
+            })
+        else:
+            pipe = connection.pipeline()
+            pipe.hset(session_key(key), mapping={'last_activity': now, 'expire_at': expire_at})
+        pipe.expire(session_key(key), ttl)
+        pipe.zadd(user_key(user_id), {key: expire_at})
+        pipe.expire(user_key(user_id), ttl)
+        pipe.zadd(USERS_KEY, {str(user_id): now})
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f'更新登录会话活动时间失败: {str(e)}')
+
+
+def unregister(key, user_id=None):
+    """注销会话"""
+    if not key:
+        return
+    _touched.pop(key, None)
+    try:
+        connection = get_connection()
+        if user_id is None:
+            user_id = _decode(connection.hget(session_key(key), 'user_id'))
+        pipe = connection.pipeline()
+        pipe.delete(session_key(key))
+        if user_id is not None:
+            pipe.zrem(user_key(user_id), key)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f'注销登录会话失败: {str(e)}')
+
+
+def user_session_keys(user_id):
+    """获取用户未过期的会话键"""
+    connection = get_connection()
+    connection.zremrangebyscore(user_key(user_id), '-inf', time.time())
+    return [_decode(key) for key in connection.zrange(user_key(user_id), 0, -1)]
+
+
+def list_sessions():
+    """
+    获取所有未过期的会话，按最后活动时间倒序
+
+    只读取有活动会话的用户：先取用户索引，再用管道批量读取各用户的会话。
+
+    Returns:
+        会话信息字典列表，时间字段为 Unix 时间戳
+    """
+    connection = get_connection()
+    now = time.time()
+    user_ids = [_decode(user_id) for user_id in connection.zrevrange(USERS_KEY, 0, -1)]
+    if not user_ids:
+        return []
+
+    pipe = connection.pipeline()
+    for user_id in user_ids:
+        pipe.zremrangebyscore(user_key(user_id), '-inf', now)
+        pipe.zrange(user_key(user_id), 0, -1)
+    results = pipe.execute()
+
+    keys = []
+    idle_users = []
+    for user_id, session_keys in zip(user_ids, results[1::2]):
+        if not session_keys:
+            idle_users.append(user_id)
+        keys.extend(_decode(key) for key in session_keys)
+    if idle_users:
+        connection.zrem(USERS_KEY, *idle_users)
+    if not keys:
+        return []
+
+    pipe = connection.pipeline()
+    for key in keys:
+        pipe.hgetall(session_key(key))
+    sessions = []
+    for data in pipe.execute():
+        if not data:
+            continue
+        data = {_decode(k): _decode(v) for k, v in data.items()}
+        data['user_id'] = int(data['user_id'])
+        for field in ('login_at', 'last_activity', 'expire_at'):
+            data[field] = float(data[field])
+        sessions.append(data)
+    sessions.sort(key=lambda session: session['last_activity'], reverse=True)
+    return sessions
+
+
+class SessionActivityMiddleware:
+    """更新已登录会话的最后活动时间"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        if session is not None:
+            touch(session)
+        return response
@@ -0,0 +1,20 @@
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.dispatch import receiver
+
+from . import session_registry
+
+
+@receiver(user_logged_in)
+def register_login_session(sender, request, user, **kwargs):
+    """登录时登记会话"""
+    if request is None or not hasattr(request, 'session'):
+        return
+    session_registry.register(request.session, user, request.META.get('REMOTE_ADDR'))
+
+
+@receiver(user_logged_out)
+def unregister_login_session(sender, request, user, **kwargs):
+    """登出时注销会话"""
+    if request is None or not hasattr(request, 'session'):
+        return
+    session_registry.unregister(request.session.session_key, user.pk if user else None)
@@ -0,0 +1,231 @@
+"""
+系统资源采集
+
+系统资源由 apps.system.metrics_sampler 的后台采样线程统一采样（同一份读数同时用于
+Prometheus 指标），本模块注册为采样回调，补充磁盘读写、网络收发速率后
+写入 Redis 中的定长环形缓冲区（列表，LPUSH + LTRIM），所有 worker 共享：
+
+- sysmon:leader:<hostname>    采集锁，同一主机只有一个进程写入
+- sysmon:samples:<hostname>   最近 BUFFER_SIZE 个采样点（JSON），最新的在最前
+
+每隔 PERSIST_INTERVAL 秒把这段时间内的采样取平均写入一行 SystemMonitor，
+监控接口直接读取缓冲区，不再在请求中调用阻塞的 psutil.cpu_percent(interval=1)。
+
+回调由 DeveloperConfig.ready() 注册，不启动线程；采样间隔为
+PROMETHEUS_METRICS['SYSTEM_SAMPLE_INTERVAL']，采样线程只在服务进程中运行。
+"""
+import json
+import logging
+import socket
+import time
+import uuid
+from collections import deque
+
+import psutil
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from apps.system import metrics_sampler
+
+logger = logging.getLogger('apps')
+
+# 默认配置，可通过 settings.SYSTEM_MONITOR 覆盖
+DEFAULT_SYSTEM_MONITOR_SETTINGS = {
+    'ENABLED': True,
+    'BUFFER_SIZE': 240,          # 环形缓冲区长度（按15秒采样间隔保留最近1小时）
+    'PERSIST_INTERVAL': 300,     # 降采样写入数据库的间隔（秒）
+}
+
+LEADER_KEY_PREFIX = 'sysmon:leader:'
+SAMPLES_KEY_PREFIX = 'sysmon:samples:'
+
+MB = 1024 * 1024
+
+
+def get_monitor_settings():
+    """获取系统资源采集配置"""
+    config = dict(DEFAULT_SYSTEM_MONITOR_SETTINGS)
+    config.update(getattr(settings, 'SYSTEM_MONITOR', {}))
+    return config
+
+
+def get_connection():
+    return get_redis_connection('default')
+
+
+def samples_key(hostname=None):
+    return f'{SAMPLES_KEY_PREFIX}{hostname or socket.gethostname()}'
+
+
+def get_sample_interval():
+    """采样间隔（秒），与系统指标采样线程一致"""
+    return settings.PROMETHEUS_METRICS.get('SYSTEM_SAMPLE_INTERVAL', metrics_sampler.DEFAULT_SAMPLE_INTERVAL)
+
+
+def build_point(reading, hostname, rates=None):
+    """由采样线程的读数生成缓冲区中的采样点"""
+    memory = reading['memory']
+    disk = reading['disks'].get('/') or psutil.disk_usage('/')
+    rates = rates or [None, None, None, None]
+    return {
+        'timestamp': reading['timestamp'],
+        'hostname': hostname,
+        'cpu_usage': reading['cpu_usage'],
+        'memory_usage': memory.percent,
+        'memory_used': memory.used,
+        'memory_total': memory.total,
+        'disk_usage': disk.percent,
+        'network_in': rates[0],       # MB/s
+        'network_out': rates[1],      # MB/s
+        'disk_read': rates[2],        # MB/s
+        'disk_write': rates[3],       # MB/s
+    }
+
+
+class SystemCollector:
+    """系统资源采集（采样线程的回调）"""
+
+    def __init__(self, config, interval=None):
+        self.interval = interval or get_sample_interval()
+        self.buffer_size = config['BUFFER_SIZE']
+        self.persist_interval = config['PERSIST_INTERVAL']
+        self.hostname = socket.gethostname()
+        self.token = uuid.uuid4().hex
+        self.local_samples = deque(maxlen=self.buffer_size)
+        self._last_counters = None
+        self._pending = []
+        self._persisted_at = time.monotonic()
+
+    def acquire_leadership(self, connection):
+        """同一主机上只有持有采集锁的进程写入，锁随采样续期"""
+        key = f'{LEADER_KEY_PREFIX}{self.hostname}'
+        ttl = max(int(self.interval * 3), 10)
+        if connection.set(key, self.token, nx=True, ex=ttl):
+            return True
+        owner = connection.get(key)
+        if owner is not None and (owner.decode() if isinstance(owner, bytes) else owner) == self.token:
+            connection.expire(key, ttl)
+            return True
+        return False
+
+    def sample(self, reading):
+        """补充磁盘读写和网络收发速率，速率由两次采样之间的计数差值计算"""
+        net_io = psutil.net_io_counters()
+        disk_io = psutil.disk_io_counters()
+        counters = (
+            reading['timestamp'],
+            net_io.bytes_recv, net_io.bytes_sent,
+            disk_io.read_bytes if disk_io else 0, disk_io.write_bytes if disk_io else 0,
+        )
+
+        rates = [0.0, 0.0, 0.0, 0.0]
+        if self._last_counters is not None:
+            elapsed = counters[0] - self._last_counters[0]
+            if elapsed > 0:
+                rates = [
+                    round(max(current - previous, 0) / elapsed / MB, 4)
+                    for current, previous in zip(counters[1:], self._last_counters[1:])
+                ]
+        self._last_counters = counters
+        return build_point(reading, self.hostname, rates)
+
+    def publish(self, connection, point):
+        """写入共享环形缓冲区"""
+        key = samples_key(self.hostname)
+        pipe = connection.pipeline()
+        pipe.lpush(key, json.dumps(point))
+        pipe.ltrim(key, 0, self.buffer_size - 1)
+        pipe.expire(key, int(self.buffer_size * self.interval))
+        pipe.execute()
+
+    def persist(self):
+        """把累计的采样点取平均后写入 SystemMonitor"""
+        points, self._pending = self._pending, []
+        self._persisted_at = time.monotonic()
+        if not points:
+            return
+        from .models import SystemMonitor
+
+        def average(field):
+            return round(sum(point[field] for point in points) / len(points), 2)
+
+        SystemMonitor.objects.create(
+            component='app_server',
+            cpu_usage=average('cpu_usage'),
+            memory_usage=average('memory_usage'),
+            disk_usage=average('disk_usage'),
+            network_in=average('network_in'),
+            network_out=average('network_out'),
+        )
+
+    def collect(self, reading):
+        """采样回调：本主机的采集锁持有者写入缓冲区"""
+        connection = get_connection()
+        if not self.acquire_leadership(connection):
+            # 其它进程负责写入，丢弃本进程的计数基线
+            self._last_counters = None
+            self._pending = []
+            return
+        point = self.sample(reading)
+        self.local_samples.appendleft(point)
+        self._pending.append(point)
+        self.publish(connection, point)
+        if time.monotonic() - self._persisted_at >= self.persist_interval:
+            self.persist()
+
+
+_collector = None
+
+
+def recent_samples(limit=None, hostname=None):
+    """
+    读取最近的采样点，最新的在最前
+
+    采集关闭时返回空列表；Redis 不可用时退回到本进程的缓冲区（仅采集进程有数据）
+    """
+    if not get_monitor_settings()['ENABLED']:
+        return []
+    end = -1 if limit is None else limit - 1
+    try:
+        return [json.loads(item) for item in get_connection().lrange(samples_key(hostname), 0, end)]
+    except Exception as e:
+        logger.warning(f'读取系统资源采样失败: {str(e)}')
+    if _collector is not None:
+        samples = list(_collector.local_samples)
+        return samples if limit is None else samples[:limit]
+    return []
+
+
+def latest_sample():
+    """
+    获取最新的采样点
+
+    缓冲区尚无数据时使用本进程采样线程的最近读数（不是采样进程时即时读取一次）
+    """
+    samples = recent_samples(limit=1)
+    if samples:
+        return samples[0]
+    return build_point(metrics_sampler.latest_reading(), socket.gethostname())
+
+
+def summarize_samples(samples):
+    """计算一组采样点的平均值和最大值"""
+    if not samples:
+        return {'count': 0}
+    summary = {'count': len(samples)}
+    for field in ('cpu_usage', 'memory_usage', 'disk_usage', 'network_in', 'network_out', 'disk_read', 'disk_write'):
+        values = [sample[field] for sample in samples if sample.get(field) is not None]
+        if values:
+            summary[f'avg_{field}'] = round(sum(values) / len(values), 2)
+            summary[f'max_{field}'] = max(values)
+    return summary
+
+
+def install_system_collector():
+    """在 AppConfig.ready() 中调用，按配置注册为系统指标采样回调"""
+    global _collector
+    config = get_monitor_settings()
+    if not config['ENABLED'] or _collector is not None:
+        return
+    _collector = SystemCollector(config)
+    metrics_sampler.add_listener(_collector.collect)
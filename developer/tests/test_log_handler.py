@@ -0,0 +1,63 @@
+import logging
+from datetime import datetime, timezone as dt_timezone
+from django.test import SimpleTestCase
+from developer.log_handler import DatabaseLogHandler
+
+
+class RecordingHandler(DatabaseLogHandler):
+    """不启动后台线程、写入内存列表的处理器"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.written = []
+    
+    def ensure_worker(self):
+        pass
+    
+    def write(self, entries):
+        self.written.extend(entries)
+        return True
+
+
+class DatabaseLogHandlerTests(SimpleTestCase):
+    """数据库日志处理器测试类"""
+    
+    def make_record(self, level, message, name='apps'):
+        return logging.LogRecord(name, level, __file__, 1, message, None, None)
+    
+    def test_flush_writes_batch(self):
+        handler = RecordingHandler(capacity=10)
+        handler.emit(self.make_record(logging.INFO, 'hello'))
+        handler.emit(self.make_record(logging.ERROR, 'boom'))
+        handler.flush()
+        self.assertEqual([e['message'] for e in handler.written], ['hello', 'boom'])
+        self.assertEqual(len(handler), 0)
+    
+    def test_backpressure_drops_new_records(self):
+        """队列满时丢弃新记录并按级别计数"""
+        handler = RecordingHandler(capacity=2)
+        handler.emit(self.make_record(logging.INFO, 'info-1'))
+        handler.emit(self.make_record(logging.ERROR, 'error-1'))
+        handler.emit(self.make_record(logging.WARNING, 'warning-1'))
+        handler.emit(self.make_record(logging.INFO, 'info-2'))
+        handler.flush()
+        self.assertEqual([e['message'] for e in handler.written], ['info-1', 'error-1'])
+        self.assertEqual(handler.dropped, {'WARNING': 1, 'INFO': 1})
+    
+    def test_timestamp_is_record_creation_time(self):
+        """记录时间取日志产生的时间而不是写库时间"""
+        handler = RecordingHandler()
+        record = self.make_record(logging.INFO, 'hello')
+        record.created = 1700000000.25
+        handler.emit(record)
+        handler.flush()
+        self.assertEqual(
+            handler.written[0]['timestamp'],
+            datetime(2023, 11, 14, 22, 13, 20, 250000, tzinfo=dt_timezone.utc)
+        )
+    
+    def test_ignores_sql_logger(self):
+        """不记录数据库后端的日志，避免写库时递归"""
+        handler = RecordingHandler()
+        handler.emit(self.make_record(logging.DEBUG, 'SELECT 1', name='django.db.backends'))
+        self.assertEqual(len(handler), 0)
@@ -0,0 +1,112 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from developer import metric_rollups
+from developer.metric_rollups import (
+    GROWTH, LatencyHistogram, MetricAccumulator, build_statistics
+)
+from developer.models import APIMetric, APIMetricRollup
+
+
+class LatencyHistogramTests(SimpleTestCase):
+    """响应时间直方图测试"""
+
+    def test_percentile_relative_error(self):
+        """分位数的相对误差不超过分桶比例"""
+        histogram = LatencyHistogram()
+        for value in range(1, 1001):
+            histogram.record(value)
+        for pct, expected in ((50, 500), (95, 950), (99, 990)):
+            self.assertLessEqual(abs(histogram.percentile(pct) - expected) / expected, GROWTH - 1)
+
+    def test_merge_json_buckets(self):
+        """从 JSON 读出的字符串键可以直接合并"""
+        first = LatencyHistogram()
+        first.record(10)
+        second = LatencyHistogram(first.to_json())
+        second.merge(first.to_json())
+        self.assertEqual(second.count, 2)
+        self.assertIsNone(LatencyHistogram().percentile(50))
+
+
+class RollupStatisticsTests(SimpleTestCase):
+    """分钟汇总统计测试"""
+
+    def rows(self):
+        accumulator = MetricAccumulator()
+        accumulator.record('api/orders/', 'GET', 200, 10)
+        accumulator.record('api/orders/', 'GET', 200, 30)
+        accumulator.record('api/orders/<int:pk>/', 'PUT', 500, 200)
+        cells, raw = accumulator.take()
+        self.assertEqual(raw, [])
+        return [
+            {
+                'endpoint': endpoint,
+                'method': method,
+                'count': cell.count,
+                'error_count': cell.error_count,
+                'total_time': cell.total_time,
+                'status_counts': dict(cell.status_counts),
+                'histogram': cell.histogram.to_json(),
+            }
+            for (_, endpoint, method), cell in cells.items()
+        ]
+
+    def test_build_statistics(self):
+        stats = build_statistics(self.rows())
+        self.assertEqual(stats['overall']['total_calls'], 3)
+        self.assertEqual(stats['overall']['error_count'], 1)
+        self.assertAlmostEqual(stats['overall']['avg_response_time'], 80)
+        self.assertEqual(stats['by_status'], [{'status_code': 200, 'count': 2}, {'status_code': 500, 'count': 1}])
+        self.assertEqual(stats['slowest_apis'][0]['endpoint'], 'api/orders/<int:pk>/')
+        self.assertEqual([item['method'] for item in stats['by_method']], ['GET', 'PUT'])
+
+    def test_empty(self):
+        stats = build_statistics([])
+        self.assertEqual(stats['overall']['total_calls'], 0)
+        self.assertEqual(stats['slowest_apis'], [])
+
+
+class AccumulatorFlushTests(TestCase):
+    """汇总写入测试"""
+
+    def raw(self):
+        return {'endpoint': '/api/orders/', 'method': 'GET', 'status_code': 200, 'response_time': 10}
+
+    def test_raw_keeps_request_time(self):
+        """明细的记录时间取请求时间，而不是写入时间"""
+        accumulator = MetricAccumulator()
+        recorded_at = timezone.now() - timedelta(seconds=25)
+        with mock.patch.object(metric_rollups.timezone, 'now', return_value=recorded_at):
+            accumulator.record('api/orders/', 'GET', 200, 10, self.raw())
+        accumulator.flush()
+        self.assertEqual(APIMetric.objects.get().timestamp, recorded_at)
+
+    def test_failed_flush_is_retried(self):
+        """写入失败时数据放回累加器，下次写入不丢失也不重复"""
+        accumulator = MetricAccumulator()
+        clock = mock.patch.object(metric_rollups.time, 'time', return_value=1800000000.0)
+        clock.start()
+        self.addCleanup(clock.stop)
+        accumulator.record('api/orders/', 'GET', 200, 10, self.raw())
+        accumulator.record('api/orders/', 'GET', 500, 30)
+        with mock.patch.object(APIMetric.objects, 'bulk_create', side_effect=RuntimeError('database is locked')):
+            accumulator.flush()
+        self.assertFalse(APIMetricRollup.objects.exists())
+
+        accumulator.record('api/orders/', 'GET', 200, 20)
+        accumulator.flush()
+        self.assertEqual(APIMetric.objects.count(), 1)
+        rollup = APIMetricRollup.objects.get()
+        self.assertEqual((rollup.count, rollup.error_count), (3, 1))
+        self.assertEqual(rollup.status_counts, {'200': 2, '500': 1})
+
+    def test_no_flush_thread_under_tests(self):
+        """测试环境 FLUSH_INTERVAL 为0，不启动写入线程"""
+        with mock.patch.object(metric_rollups, '_accumulator', None):
+            metric_rollups.get_accumulator()
+        self.assertNotIn('api-metric-rollup', [thread.name for thread in threading.enumerate()])
@@ -0,0 +1,63 @@
+import marshal
+import tempfile
+import time
+from django.test import SimpleTestCase, override_settings
+from developer import profiler
+
+
+class SamplingProfilerTests(SimpleTestCase):
+    """采样剖析测试类"""
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = override_settings(SAMPLING_PROFILER={'DIRECTORY': directory.name})
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+    
+    def make_run(self, **overrides):
+        session = {
+            'session_id': 'abc123',
+            'seconds': 60,
+            'requests': 2,
+            'url_pattern': r'^/api/orders/',
+            'interval': 0.005,
+            'started_at': time.time(),
+        }
+        session.update(overrides)
+        return profiler.ProfilingRun(session, profiler.get_profiler_settings())
+    
+    def test_request_limit_writes_results(self):
+        """达到请求数上限后写出折叠调用栈和 cProfile 统计"""
+        run = self.make_run()
+        self.assertTrue(run.matches('/api/orders/1/'))
+        self.assertFalse(run.matches('/api/customers/'))
+        
+        for _ in range(2):
+            profile = run.begin_request()
+            sum(range(1000))
+            run.stacks['main;handler'] += 1
+            run.end_request(profile)
+        
+        self.assertTrue(run.finished)
+        self.assertIsNone(run.begin_request())
+        
+        collapsed = profiler.load_result('abc123', 'collapsed').decode()
+        self.assertEqual(collapsed, 'main;handler 2\n')
+        stats = marshal.loads(profiler.load_result('abc123', 'pstats'))
+        self.assertTrue(stats)
+        self.assertEqual(profiler.list_results()[0]['kinds'], ['collapsed', 'pstats'])
+    
+    def test_sample_only_matching_threads(self):
+        """指定 URL 模式时只采样正在处理匹配请求的线程"""
+        run = self.make_run()
+        run.sample()
+        self.assertEqual(sum(run.stacks.values()), 0)
+        
+        run = self.make_run(url_pattern=None)
+        run.sample()
+        self.assertEqual(run.samples, 1)
+    
+    def test_load_result_rejects_invalid_names(self):
+        self.assertIsNone(profiler.load_result('../etc', 'collapsed'))
+        self.assertIsNone(profiler.load_result('abc123', 'unknown'))
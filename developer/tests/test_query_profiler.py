@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from apps.users.models import User
+from developer.models import QueryProfile
+from developer.query_profiler import QueryProfiler, QueryProfilerMiddleware, fingerprint, normalize_sql
+
+
+class QueryProfilerTests(SimpleTestCase):
+    """ORM查询剖析测试"""
+
+    def record(self, profiler, sql, duration=1.0):
+        profiler.queries.append(('default', sql, duration))
+
+    def test_normalize_sql(self):
+        """字面量和 IN 列表长度不影响查询形状"""
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id = 5 AND name = 'a''b'"),
+            'SELECT * FROM t WHERE id = ? AND name = ?'
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s, %s)')
+        )
+
+    @override_settings(QUERY_PROFILER={'N_PLUS_ONE_THRESHOLD': 3})
+    def test_repeated_shape_flagged_as_n_plus_one(self):
+        """同一查询形状重复达到阈值时标记为 N+1"""
+        profiler = QueryProfiler()
+        self.record(profiler, 'SELECT * FROM inventory')
+        for _ in range(4):
+            self.record(profiler, 'SELECT * FROM material WHERE id = %s')
+
+        summary = profiler.summarize()
+        self.assertEqual(summary['query_count'], 5)
+        self.assertEqual(summary['duplicate_count'], 3)
+        self.assertTrue(summary['n_plus_one'])
+        self.assertEqual(summary['duplicates'][0]['count'], 4)
+
+    @override_settings(QUERY_PROFILER={'N_PLUS_ONE_THRESHOLD': 3, 'SLOWEST_COUNT': 1})
+    def test_slowest_statements(self):
+        """只保留最慢的语句"""
+        profiler = QueryProfiler()
+        self.record(profiler, 'SELECT 1', 1.0)
+        self.record(profiler, 'SELECT * FROM orders', 20.0)
+
+        summary = profiler.summarize()
+        self.assertFalse(summary['n_plus_one'])
+        self.assertEqual(summary['db_time'], 21.0)
+        self.assertEqual([query['sql'] for query in summary['slowest']], ['SELECT * FROM orders'])
+
+
+class QueryProfilerMiddlewareTests(TestCase):
+    """请求头开启剖析的身份校验"""
+
+    def setUp(self):
+        self.middleware = QueryProfilerMiddleware(lambda request: HttpResponse('ok'))
+        self.factory = RequestFactory()
+
+    def get(self, user):
+        request = self.factory.get('/api/test/', HTTP_X_QUERY_PROFILE='1')
+        request.user = user
+        return self.middleware(request)
+
+    @override_settings(DEBUG=False, QUERY_PROFILER={'HEADER_ENABLED': True})
+    def test_anonymous_header_ignored(self):
+        response = self.get(AnonymousUser())
+        self.assertNotIn('X-Query-Count', response)
+        self.assertFalse(QueryProfile.objects.exists())
+
+    @override_settings(DEBUG=False, QUERY_PROFILER={'HEADER_ENABLED': True})
+    def test_staff_header_profiled(self):
+        user = User.objects.create_user(username='profiler', password='profiler-password', is_staff=True)
+        response = self.get(user)
+        self.assertIn('X-Query-Count', response)
+        self.assertEqual(QueryProfile.objects.count(), 1)
+
+    @override_settings(DEBUG=True)
+    def test_header_disabled_by_default(self):
+        self.assertNotIn('X-Query-Count', self.get(AnonymousUser()))
+
+    @override_settings(DEBUG=False, QUERY_PROFILER={'HEADER_ENABLED': True})
+    def test_endpoint_uses_metric_route_template(self):
+        """剖析记录的端点与HTTP指标使用同一路由模板"""
+        def view(request):
+            request.resolver_match = SimpleNamespace(
+                route='api/production/^orders/(?P<pk>[^/.]+)/$', view_name='order-detail'
+            )
+            return HttpResponse('ok')
+
+        self.middleware = QueryProfilerMiddleware(view)
+        self.get(User.objects.create_user(username='profiler', password='profiler-password', is_staff=True))
+        profile = QueryProfile.objects.get()
+        self.assertEqual(profile.endpoint, 'api/production/orders/(?P<pk>[^/.]+)/')
+        self.assertEqual(profile.view_name, 'order-detail')
@@ -0,0 +1,108 @@
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase
+from developer import session_registry
+
+
+class FakeRedis:
+    """模拟 Redis 哈希和有序集合的最小实现"""
+    
+    def __init__(self):
+        self.hashes = {}
+        self.zsets = {}
+    
+    def pipeline(self):
+        self.results = []
+        return self
+    
+    def execute(self):
+        results, self.results = self.results, None
+        return results
+    
+    def _record(self, value):
+        if getattr(self, 'results', None) is not None:
+            self.results.append(value)
+        return value
+    
+    def hset(self, key, field=None, value=None, mapping=None):
+        self.hashes.setdefault(key, {}).update(mapping or {field: value})
+    
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+    
+    def hgetall(self, key):
+        return self._record(dict(self.hashes.get(key, {})))
+    
+    def exists(self, key):
+        return key in self.hashes
+    
+    def expire(self, key, ttl):
+        pass
+    
+    def delete(self, key):
+        self.hashes.pop(key, None)
+    
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+    
+    def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+    
+    def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score <= high]:
+            del zset[member]
+        return self._record(None)
+    
+    def zrange(self, key, start, end):
+        return self._record(sorted(self.zsets.get(key, {}), key=self.zsets.get(key, {}).get))
+    
+    def zrevrange(self, key, start, end):
+        return sorted(self.zsets.get(key, {}), key=self.zsets.get(key, {}).get, reverse=True)
+
+
+class FakeSession(dict):
+    def __init__(self, key, expires_in=3600, **data):
+        super().__init__(**data)
+        self.session_key = key
+        self.expires_in = expires_in
+    
+    def get_expiry_date(self):
+        return datetime.now(tz=dt_timezone.utc) + timedelta(seconds=self.expires_in)
+
+
+class SessionRegistryTests(SimpleTestCase):
+    """登录会话登记测试类"""
+    
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(session_registry, 'get_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        session_registry._touched.clear()
+    
+    def test_register_and_list(self):
+        session_registry.register(FakeSession('s1'), SimpleNamespace(pk=1), '10.0.0.1')
+        session_registry.register(FakeSession('s2'), SimpleNamespace(pk=2), '10.0.0.2')
+        sessions = session_registry.list_sessions()
+        self.assertEqual({s['session_key'] for s in sessions}, {'s1', 's2'})
+        self.assertEqual(session_registry.user_session_keys(1), ['s1'])
+    
+    def test_unregister_and_expiry(self):
+        session_registry.register(FakeSession('s1'), SimpleNamespace(pk=1), None)
+        session_registry.register(FakeSession('s2', expires_in=-10), SimpleNamespace(pk=2), None)
+        session_registry.unregister('s1')
+        self.assertEqual(session_registry.list_sessions(), [])
+        # 没有会话的用户从索引中移除
+        self.assertEqual(self.redis.zsets[session_registry.USERS_KEY], {})
+    
+    def test_touch_is_throttled(self):
+        session = FakeSession('s1', _auth_user_id='1')
+        session_registry.touch(session)
+        first = float(self.redis.hashes['sessions:registry:s1']['last_activity'])
+        session_registry.touch(session)
+        self.assertEqual(float(self.redis.hashes['sessions:registry:s1']['last_activity']), first)
+        self.assertLessEqual(first, time.time())
@@ -0,0 +1,124 @@
+import time
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from apps.system import metrics_sampler
+from developer import system_collector
+
+
+class FakeRedis:
+    """模拟 Redis 列表和锁的最小实现"""
+    
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+    
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return False
+        self.values[key] = value
+        return True
+    
+    def get(self, key):
+        return self.values.get(key)
+    
+    def expire(self, key, ttl):
+        return True
+    
+    def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+    
+    def pipeline(self):
+        return self
+    
+    def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+    
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists[key][start:end + 1]
+    
+    def execute(self):
+        return []
+
+
+class SystemCollectorTests(SimpleTestCase):
+    """系统资源采集测试类"""
+    
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(system_collector, 'get_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        config = dict(system_collector.DEFAULT_SYSTEM_MONITOR_SETTINGS, BUFFER_SIZE=3, PERSIST_INTERVAL=3600)
+        self.collector = system_collector.SystemCollector(config, interval=15)
+    
+    def reading(self, timestamp=None, cpu_usage=25.0):
+        """采样线程交给回调的读数"""
+        return {
+            'timestamp': timestamp or time.time(),
+            'cpu_usage': cpu_usage,
+            'memory': SimpleNamespace(percent=40.0, used=400, total=1000, available=600),
+            'disks': {'/': SimpleNamespace(percent=60.0, total=100, used=60, free=40)},
+        }
+    
+    def test_ring_buffer_is_bounded(self):
+        """缓冲区只保留最近 BUFFER_SIZE 个采样点，最新的在最前"""
+        for n in range(5):
+            self.collector.collect(self.reading(timestamp=1000.0 + n))
+        samples = system_collector.recent_samples(hostname=self.collector.hostname)
+        self.assertEqual(len(samples), 3)
+        self.assertGreaterEqual(samples[0]['timestamp'], samples[-1]['timestamp'])
+    
+    def test_only_leader_samples(self):
+        """采集锁被其它进程持有时不采样"""
+        self.redis.set(f'{system_collector.LEADER_KEY_PREFIX}{self.collector.hostname}', 'other')
+        self.collector.collect(self.reading())
+        self.assertEqual(system_collector.recent_samples(hostname=self.collector.hostname), [])
+    
+    def test_point_uses_sampler_reading(self):
+        """CPU等数值取自采样线程的读数，回调不再调用 cpu_percent"""
+        with mock.patch.object(system_collector.psutil, 'cpu_percent') as cpu_percent:
+            self.collector.collect(self.reading(cpu_usage=33.0))
+        cpu_percent.assert_not_called()
+        point = system_collector.recent_samples(hostname=self.collector.hostname)[0]
+        self.assertEqual(point['cpu_usage'], 33.0)
+        self.assertEqual(point['memory_usage'], 40.0)
+        self.assertEqual(point['disk_usage'], 60.0)
+        self.assertEqual(point['network_in'], 0.0)
+    
+    def test_summarize_samples(self):
+        samples = [
+            {'cpu_usage': 10, 'memory_usage': 50, 'disk_usage': 30, 'network_in': None},
+            {'cpu_usage': 30, 'memory_usage': 70, 'disk_usage': 30, 'network_in': 1.5},
+        ]
+        summary = system_collector.summarize_samples(samples)
+        self.assertEqual(summary['count'], 2)
+        self.assertEqual(summary['avg_cpu_usage'], 20)
+        self.assertEqual(summary['max_memory_usage'], 70)
+        self.assertEqual(summary['avg_network_in'], 1.5)
+        self.assertEqual(system_collector.summarize_samples([]), {'count': 0})
+    
+    @override_settings(SYSTEM_MONITOR={'ENABLED': False})
+    def test_disabled_reads_nothing(self):
+        """采集关闭时不读取 Redis，最新采样点取自采样线程的读数"""
+        with mock.patch.object(system_collector, 'get_connection') as get_connection, \
+                mock.patch.object(metrics_sampler, 'latest_reading', return_value=self.reading(cpu_usage=5.0)):
+            self.assertEqual(system_collector.recent_samples(), [])
+            self.assertEqual(system_collector.latest_sample()['cpu_usage'], 5.0)
+        get_connection.assert_not_called()
+    
+    @override_settings(SYSTEM_MONITOR={'ENABLED': False})
+    def test_install_can_be_disabled(self):
+        """ENABLED 关闭时不注册采样回调"""
+        with mock.patch.object(system_collector, '_collector', None), \
+                mock.patch.object(metrics_sampler, 'add_listener') as add_listener:
+            system_collector.install_system_collector()
+        add_listener.assert_not_called()
+    
+    def test_install_registers_listener_without_thread(self):
+        """ready() 只注册回调，不启动线程"""
+        with mock.patch.object(system_collector, '_collector', None), \
+                mock.patch.object(metrics_sampler, 'add_listener') as add_listener:
+            system_collector.install_system_collector()
+            add_listener.assert_called_once_with(system_collector._collector.collect)
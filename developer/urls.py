@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     SystemMonitorViewSet, APIMetricViewSet, SystemLogViewSet,
     ConfigItemViewSet, WebSocketSessionViewSet, WebSocketMessageViewSet,
-    APITestView, SystemHealthView, SessionManagementView, DebugModeView
+    APITestView, SystemHealthView, SessionManagementView, DebugModeView,
+    ProfilerView, ProfilerResultView
 )
 
 router = DefaultRouter()
@@ -21,4 +22,6 @@ urlpatterns = [
     path('health/', SystemHealthView.as_view(), name='system-health'),
     path('sessions/', SessionManagementView.as_view(), name='session-management'),
     path('debug-mode/', DebugModeView.as_view(), name='debug-mode'),
+    path('profiler/', ProfilerView.as_view(), name='profiler'),
+    path('profiler/<str:session_id>/<str:kind>/', ProfilerResultView.as_view(), name='profiler-result'),
 ]
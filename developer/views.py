@@ -3,25 +3,34 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
-from django.db.models import Avg, Count, Sum, Max, Min
+from django.db.models import Avg, Count, Sum, Max, Min, Q
 from django.core.paginator import Paginator
 from django.db import connection
 from django.core.cache import cache
-from datetime import timedelta
+from django.http import HttpResponse
+from datetime import datetime, timedelta, timezone as dt_timezone
 import psutil
-import socket
 import json
+import re
 import requests
 import time
+import uuid
 
 from .models import (
     SystemMonitor, APIMetric, SystemLog, ConfigItem,
-    WebSocketSession, WebSocketMessage
+    WebSocketSession, WebSocketMessage, QueryProfile, APIMetricRollup
 )
 from .serializers import (
     SystemMonitorSerializer, APIMetricSerializer, SystemLogSerializer,
-    ConfigItemSerializer, WebSocketSessionSerializer, WebSocketMessageSerializer
+    ConfigItemSerializer, WebSocketSessionSerializer, WebSocketMessageSerializer,
+    QueryProfileSerializer
 )
+from .metric_rollups import build_statistics
+from .system_collector import latest_sample, recent_samples, summarize_samples
+from .query_profiler import QUERY_PROFILE_CACHE_KEY, get_profiler_settings
+from . import profiler, session_registry
+from apps.system.pagination import CountFreeCursorPagination
+from apps.websocket import presence
 
 
 class DeveloperPermission(permissions.BasePermission):
@@ -44,35 +53,34 @@ class SystemMonitorViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def current(self, request):
-        """获取当前系统状态"""
+        """获取当前系统状态（读取后台采集的最新采样点）"""
         try:
-            # 获取当前系统资源使用情况
-            cpu_usage = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            sample = latest_sample()
             net_io = psutil.net_io_counters()
             
             data = {
-                'cpu_usage': cpu_usage,
-                'memory_usage': memory.percent,
-                'disk_usage': disk.percent,
+                'cpu_usage': sample['cpu_usage'],
+                'memory_usage': sample['memory_usage'],
+                'disk_usage': sample['disk_usage'],
                 'network_stats': {
                     'bytes_sent': net_io.bytes_sent,
                     'bytes_recv': net_io.bytes_recv,
+                    'network_in': sample['network_in'],
+                    'network_out': sample['network_out'],
                 },
-                'hostname': socket.gethostname(),
+                'disk_io': {
+                    'read': sample['disk_read'],
+                    'write': sample['disk_write'],
+                },
+                'hostname': sample['hostname'],
+                'sampled_at': datetime.fromtimestamp(sample['timestamp'], tz=dt_timezone.utc).isoformat(),
                 'timestamp': timezone.now().isoformat(),
             }
             
-            # 保存到数据库
-            SystemMonitor.objects.create(
-                component='app_server',
-                cpu_usage=cpu_usage,
-                memory_usage=memory.percent,
-                disk_usage=disk.percent,
-                network_in=net_io.bytes_recv / (1024 * 1024),  # 转换为MB
-                network_out=net_io.bytes_sent / (1024 * 1024)  # 转换为MB
-            )
+            # 可选返回最近的采样序列，供前端绘制曲线
+            points = request.query_params.get('points')
+            if points:
+                data['series'] = list(reversed(recent_samples(limit=min(int(points), 720))))
             
             return Response(data)
         except Exception as e:
@@ -81,7 +89,7 @@ class SystemMonitorViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """获取系统监控数据汇总"""
-        # 计算过去24小时的数据
+        # 计算过去24小时的数据（降采样后的记录）
         last_day = timezone.now() - timedelta(days=1)
         summary = SystemMonitor.objects.filter(timestamp__gte=last_day).aggregate(
             avg_cpu=Avg('cpu_usage'),
@@ -101,7 +109,9 @@ class SystemMonitorViewSet(viewsets.ModelViewSet):
         
         return Response({
             'summary': summary,
-            'components': components
+            'components': components,
+            # 环形缓冲区中最近一段时间的实时汇总
+            'recent': summarize_samples(recent_samples())
         })
 
 
@@ -110,6 +120,8 @@ class APIMetricViewSet(viewsets.ModelViewSet):
     queryset = APIMetric.objects.all()
     serializer_class = APIMetricSerializer
     permission_classes = [DeveloperPermission]
+    pagination_class = CountFreeCursorPagination
+    ordering = ('-timestamp', '-id')
     filterset_fields = ['method', 'status_code', 'endpoint']
     
     @action(detail=False, methods=['get'])
@@ -119,43 +131,50 @@ class APIMetricViewSet(viewsets.ModelViewSet):
         days = int(request.query_params.get('days', 1))
         start_time = timezone.now() - timedelta(days=days)
         
-        # 总体统计
-        overall = APIMetric.objects.filter(timestamp__gte=start_time).aggregate(
-            total_calls=Count('id'),
-            avg_response_time=Avg('response_time'),
-            success_count=Count('id', filter=models.Q(status_code__lt=400)),
-            error_count=Count('id', filter=models.Q(status_code__gte=400))
-        )
-        
-        # 计算成功率
-        if overall['total_calls'] > 0:
-            overall['success_rate'] = (overall['success_count'] / overall['total_calls']) * 100
-        else:
-            overall['success_rate'] = 0
-        
-        # 按方法分组
-        by_method = APIMetric.objects.filter(timestamp__gte=start_time).values('method').annotate(
-            count=Count('id'),
-            avg_time=Avg('response_time')
-        )
-        
-        # 按状态码分组
-        by_status = APIMetric.objects.filter(timestamp__gte=start_time).values('status_code').annotate(
-            count=Count('id')
-        )
+        # 基于分钟汇总计算，不扫描明细表
+        rows = APIMetricRollup.objects.filter(bucket__gte=start_time).values(
+            'endpoint', 'method', 'count', 'error_count', 'total_time', 'status_counts', 'histogram'
+        ).order_by()
         
-        # 最慢的接口
-        slowest_apis = APIMetric.objects.filter(timestamp__gte=start_time).values('endpoint', 'method').annotate(
-            avg_time=Avg('response_time'),
-            count=Count('id')
-        ).order_by('-avg_time')[:10]
+        return Response(build_statistics(rows.iterator()))
+    
+    @action(detail=False, methods=['get'])
+    def query_profiles(self, request):
+        """获取ORM查询剖析记录，可按 endpoint、n_plus_one 过滤"""
+        queryset = QueryProfile.objects.select_related('user')
+        
+        endpoint = request.query_params.get('endpoint')
+        if endpoint:
+            queryset = queryset.filter(endpoint__icontains=endpoint)
+        n_plus_one = request.query_params.get('n_plus_one')
+        if n_plus_one is not None:
+            queryset = queryset.filter(n_plus_one=n_plus_one.lower() in ('1', 'true'))
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = QueryProfileSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = QueryProfileSerializer(queryset[:100], many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def query_summary(self, request):
+        """按接口汇总查询剖析结果，疑似N+1的接口排在前面"""
+        days = int(request.query_params.get('days', 1))
+        start_time = timezone.now() - timedelta(days=days)
         
-        return Response({
-            'overall': overall,
-            'by_method': by_method,
-            'by_status': by_status,
-            'slowest_apis': slowest_apis
-        })
+        summary = QueryProfile.objects.filter(timestamp__gte=start_time).values(
+            'endpoint', 'view_name', 'method'
+        ).annotate(
+            samples=Count('id'),
+            avg_queries=Avg('query_count'),
+            max_queries=Max('query_count'),
+            avg_db_time=Avg('db_time'),
+            n_plus_one_count=Count('id', filter=Q(n_plus_one=True))
+        ).order_by('-n_plus_one_count', '-avg_queries')[:50]
+        
+        return Response(summary)
 
 
 class SystemLogViewSet(viewsets.ModelViewSet):
@@ -254,25 +273,70 @@ class WebSocketSessionViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def active(self, request):
-        """获取活跃的WebSocket会话"""
-        active_sessions = WebSocketSession.objects.filter(is_active=True)
-        serializer = self.get_serializer(active_sessions, many=True)
-        return Response(serializer.data)
+        """
+        获取活跃的WebSocket会话（从 Redis 在线状态登记读取）
+        
+        会话记录延迟落库，尚未落库的会话 id 为 null，可以用 session_id 调用 close 关闭
+        """
+        try:
+            sessions = presence.list_sessions()
+        except Exception as e:
+            return Response({'detail': f'读取在线状态失败: {str(e)}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
+        session_pks = {
+            str(session_id): pk
+            for session_id, pk in WebSocketSession.objects.filter(
+                session_id__in=[session['session_id'] for session in sessions]
+            ).values_list('session_id', 'pk')
+        }
+        data = [
+            {
+                'id': session_pks.get(session['session_id']),
+                'session_id': session['session_id'],
+                'user': session['user_id'],
+                'user_display': session['username'],
+                'client_ip': session['client_ip'] or None,
+                'server': session['server'],
+                'connected_at': datetime.fromtimestamp(session['connected_at'], tz=dt_timezone.utc),
+                'disconnected_at': None,
+                'is_active': True,
+                'last_activity': datetime.fromtimestamp(session['last_activity'], tz=dt_timezone.utc),
+                'duration': None,
+            }
+            for session in sessions
+        ]
+        return Response(data)
     
     @action(detail=True, methods=['post'])
     def close(self, request, pk=None):
-        """关闭指定的WebSocket会话"""
-        session = self.get_object()
+        """
+        关闭指定的WebSocket会话
         
-        if not session.is_active:
-            return Response({'detail': '会话已经关闭'}, status=status.HTTP_400_BAD_REQUEST)
+        pk 可以是会话记录的主键，也可以是 active 返回的 session_id（会话记录尚未落库时）
+        """
+        try:
+            session_id = uuid.UUID(pk)
+        except ValueError:
+            session_id = None
         
-        # 标记会话为关闭状态
-        session.is_active = False
-        session.disconnected_at = timezone.now()
-        session.save()
+        if session_id is None:
+            session = self.get_object()
+            if not session.is_active:
+                return Response({'detail': '会话已经关闭'}, status=status.HTTP_400_BAD_REQUEST)
+            session_id = session.session_id
         
-        # TODO: 实际关闭WebSocket连接的逻辑，需要与WebSocket服务集成
+        try:
+            closed = presence.close_session(session_id)
+        except Exception as e:
+            return Response({'detail': f'关闭连接失败: {str(e)}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
+        # 标记会话为关闭状态（消费者断开时会再次更新断开时间）
+        now = timezone.now()
+        updated = WebSocketSession.objects.filter(session_id=session_id, is_active=True).update(
+            is_active=False, disconnected_at=now, last_activity=now
+        )
+        if not closed and not updated:
+            return Response({'detail': '会话不存在或已经关闭'}, status=status.HTTP_404_NOT_FOUND)
         
         return Response({'detail': '会话已关闭'}, status=status.HTTP_200_OK)
 
@@ -282,6 +346,8 @@ class WebSocketMessageViewSet(viewsets.ModelViewSet):
     queryset = WebSocketMessage.objects.all()
     serializer_class = WebSocketMessageSerializer
     permission_classes = [DeveloperPermission]
+    pagination_class = CountFreeCursorPagination
+    ordering = ('-timestamp', '-id')
     filterset_fields = ['session', 'direction']
     search_fields = ['message']
     
@@ -392,12 +458,7 @@ class SystemHealthView(APIView):
         services = {
             'database': self._check_database(),
             'cache': self._check_cache(),
-            'system_resources': {
-                'status': 'healthy',
-                'cpu_usage': psutil.cpu_percent(),
-                'memory_usage': psutil.virtual_memory().percent,
-                'disk_usage': psutil.disk_usage('/').percent
-            }
+            'system_resources': self._check_system_resources()
         }
         
         # 确定整体系统状态
@@ -411,6 +472,16 @@ class SystemHealthView(APIView):
         
         return Response(response_data)
     
+    def _check_system_resources(self):
+        """系统资源使用情况（读取后台采集的最新采样点）"""
+        sample = latest_sample()
+        return {
+            'status': 'healthy',
+            'cpu_usage': sample['cpu_usage'],
+            'memory_usage': sample['memory_usage'],
+            'disk_usage': sample['disk_usage']
+        }
+    
     def _check_database(self):
         """检查数据库状态"""
         try:
@@ -484,46 +555,56 @@ class SessionManagementView(APIView):
     permission_classes = [DeveloperPermission]
     
     def get(self, request):
-        """获取当前活跃会话列表"""
-        # 注意：这里只是示例，实际实现需要根据会话存储方式调整
-        from django.contrib.sessions.models import Session
+        """获取当前活跃会话列表（读取按用户索引的会话登记表）"""
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        
+        sessions = session_registry.list_sessions()
+        users = User.objects.in_bulk({session['user_id'] for session in sessions})
         
         active_sessions = []
-        for session in Session.objects.filter(expire_date__gt=timezone.now()):
-            session_data = session.get_decoded()
-            user_id = session_data.get('_auth_user_id')
-            
-            if user_id:
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                try:
-                    user = User.objects.get(pk=user_id)
-                    active_sessions.append({
-                        'session_key': session.session_key,
-                        'user': user.username,
-                        'ip_address': session_data.get('ip', 'unknown'),
-                        'last_activity': session.expire_date - timedelta(seconds=settings.SESSION_COOKIE_AGE),
-                        'expire_date': session.expire_date
-                    })
-                except User.DoesNotExist:
-                    pass
+        for session in sessions:
+            user = users.get(session['user_id'])
+            if user is None:
+                continue
+            active_sessions.append({
+                'session_key': session['session_key'],
+                'user_id': user.pk,
+                'user': user.username,
+                'ip_address': session['ip_address'] or 'unknown',
+                'login_at': datetime.fromtimestamp(session['login_at'], tz=dt_timezone.utc),
+                'last_activity': datetime.fromtimestamp(session['last_activity'], tz=dt_timezone.utc),
+                'expire_date': datetime.fromtimestamp(session['expire_at'], tz=dt_timezone.utc)
+            })
         
         return Response(active_sessions)
     
     def post(self, request):
-        """终止用户会话"""
+        """终止用户会话，传入 session_key 终止单个会话，传入 user_id 终止该用户的全部会话"""
+        from importlib import import_module
+        from django.conf import settings
+        
         session_key = request.data.get('session_key')
+        user_id = request.data.get('user_id')
         
-        if not session_key:
-            return Response({'detail': '需要提供会话密钥'}, status=status.HTTP_400_BAD_REQUEST)
+        if not session_key and not user_id:
+            return Response({'detail': '需要提供会话密钥或用户ID'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            from django.contrib.sessions.models import Session
-            session = Session.objects.get(session_key=session_key)
-            session.delete()
-            return Response({'status': 'success', 'detail': '会话已终止'})
-        except Session.DoesNotExist:
+        session_keys = [session_key] if session_key else session_registry.user_session_keys(user_id)
+        store_class = import_module(settings.SESSION_ENGINE).SessionStore
+        
+        terminated = 0
+        for key in session_keys:
+            store = store_class(session_key=key)
+            if store.exists(key):
+                store.delete(key)
+                terminated += 1
+            session_registry.unregister(key, user_id)
+        
+        if session_key and not terminated:
             return Response({'detail': '会话不存在'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({'status': 'success', 'detail': '会话已终止', 'terminated': terminated})
 
 
 class DebugModeView(APIView):
@@ -545,8 +626,14 @@ class DebugModeView(APIView):
             # 实际应用中可能需要重启服务或其他方式
             cache.set('DEBUG_MODE', bool(enable), None)
             
+            # 查询剖析默认跟随调试模式，也可以单独通过 query_profiling 参数控制
+            query_profiling = request.data.get('query_profiling', enable)
+            cache.set(QUERY_PROFILE_CACHE_KEY, bool(query_profiling), None)
+            
             current_state = {
                 'debug_mode': bool(enable),
+                'query_profiling': bool(query_profiling),
+                'query_profile_sample_rate': get_profiler_settings()['SAMPLE_RATE'],
                 'settings_debug': settings.DEBUG,
                 'timestamp': timezone.now()
             }
@@ -554,3 +641,50 @@ class DebugModeView(APIView):
             return Response(current_state)
         except Exception as e:
             return Response({'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ProfilerView(APIView):
+    """线上采样剖析视图"""
+    permission_classes = [DeveloperPermission]
+    
+    def get(self, request):
+        """获取当前剖析会话和已有结果"""
+        return Response({
+            'session': profiler.current_session(),
+            'results': profiler.list_results()
+        })
+    
+    def post(self, request):
+        """开启剖析会话"""
+        try:
+            session = profiler.arm(
+                seconds=request.data.get('seconds', 30),
+                requests=request.data.get('requests'),
+                url_pattern=request.data.get('url_pattern'),
+                interval=request.data.get('interval'),
+                user=request.user.username
+            )
+        except (TypeError, ValueError, re.error) as e:
+            return Response({'detail': f'参数错误: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(session, status=status.HTTP_201_CREATED)
+    
+    def delete(self, request):
+        """停止当前剖析会话"""
+        profiler.disarm()
+        return Response({'status': 'success', 'detail': '剖析会话已停止'})
+
+
+class ProfilerResultView(APIView):
+    """剖析结果下载视图"""
+    permission_classes = [DeveloperPermission]
+    
+    def get(self, request, session_id, kind):
+        """下载折叠调用栈（collapsed）或 cProfile 统计（pstats）"""
+        content = profiler.load_result(session_id, kind)
+        if content is None:
+            return Response({'detail': '剖析结果不存在'}, status=status.HTTP_404_NOT_FOUND)
+        
+        content_type = 'text/plain; charset=utf-8' if kind == 'collapsed' else 'application/octet-stream'
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{session_id}{profiler.RESULT_KINDS[kind]}"'
+        return response
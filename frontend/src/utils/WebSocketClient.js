@@ -10,6 +10,9 @@ class WebSocketClient {
     this.reconnectAttempts = 0;
     this.maxReconnectAttempts = 5;
     this.reconnectTimeout = null;
+    // 心跳间隔需小于服务端在线状态的过期时间（WEBSOCKET_PRESENCE.TTL，默认90秒）
+    this.heartbeatInterval = 30000;
+    this.heartbeatTimer = null;
     this.messageCallbacks = [];
     this.connectionCallbacks = [];
     this.errorCallbacks = [];
@@ -43,6 +46,7 @@ class WebSocketClient {
         console.log('WebSocket连接已建立');
         this.isConnected = true;
         this.reconnectAttempts = 0;
+        this._startHeartbeat();
         this._notifyConnectionCallbacks(true);
       };
 
@@ -58,6 +62,7 @@ class WebSocketClient {
       this.socket.onclose = (event) => {
         console.log('WebSocket连接已关闭', event.code, event.reason);
         this.isConnected = false;
+        this._stopHeartbeat();
         this._notifyConnectionCallbacks(false);
         
         // 尝试重连
@@ -93,6 +98,7 @@ class WebSocketClient {
       clearTimeout(this.reconnectTimeout);
       this.reconnectTimeout = null;
     }
+    this._stopHeartbeat();
     
     if (this.socket) {
       this.socket.close();
@@ -163,6 +169,30 @@ class WebSocketClient {
     }
   }
 
+  /**
+   * 定时发送 ping，续期服务端的在线状态
+   * @private
+   */
+  _startHeartbeat() {
+    this._stopHeartbeat();
+    this.heartbeatTimer = setInterval(() => {
+      if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+        this.socket.send(JSON.stringify({ type: 'ping' }));
+      }
+    }, this.heartbeatInterval);
+  }
+
+  /**
+   * 停止心跳
+   * @private
+   */
+  _stopHeartbeat() {
+    if (this.heartbeatTimer) {
+      clearInterval(this.heartbeatTimer);
+      this.heartbeatTimer = null;
+    }
+  }
+
   /**
    * 通知所有消息回调
    * @param {Object} message - 收到的消息
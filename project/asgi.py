@@ -18,6 +18,10 @@ django.setup()
 
 # 导入WebSocket路由
 from apps.websocket.routing import websocket_urlpatterns
+from apps.system.metrics_sampler import install_system_metrics_sampler
+
+# 服务进程中启动系统资源后台采样（管理命令和测试不加载此模块）
+install_system_metrics_sampler()
 
 application = ProtocolTypeRouter({
     'http': get_asgi_application(),
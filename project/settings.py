@@ -25,6 +25,10 @@ SECRET_KEY = 'django-insecure-_r95zwxh-x19(n%=gk=0as(h2v%6x&#fih(qc$o##4^k-xs9fw
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# 是否在运行测试（manage.py test），测试进程中不启动写库的后台线程、不导出链路追踪
+import sys
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 ALLOWED_HOSTS = ['*']
 
 # 日志配置
@@ -53,6 +57,13 @@ LOGGING = {
             'backupCount': 5,
             'formatter': 'verbose',
         },
+        'database': {
+            'class': 'developer.log_handler.DatabaseLogHandler',
+            'level': 'INFO',
+            'capacity': 10000,  # 队列容量，满时丢弃新记录
+            'flush_interval': 0.5,  # 批量写入间隔（秒）
+            'retention_days': 30,  # SystemLog保留天数
+        },
     },
     'loggers': {
         'django': {
@@ -61,7 +72,7 @@ LOGGING = {
             'propagate': True,
         },
         'apps': {
-            'handlers': ['console', 'file'],
+            'handlers': ['console', 'file', 'database'],
             'level': 'DEBUG',
             'propagate': True,
         },
@@ -159,6 +170,9 @@ SWAGGER_SETTINGS = {
 PROMETHEUS_METRICS = {
     'DIRECTORY': BASE_DIR / 'metrics',
     'EXPORT_TYPE': 'multiprocess',
+    'SYSTEM_SAMPLER_ENABLED': True,  # 是否在服务进程（WSGI/ASGI入口）中开启系统资源指标后台采样
+    'SYSTEM_SAMPLE_INTERVAL': 15,  # 系统资源指标后台采样间隔（秒）
+    'MAX_ENDPOINT_LABELS': 500,  # HTTP指标endpoint标签的最大数量，超出归入other
 }
 
 # 设置Prometheus多进程模式的环境变量
@@ -166,6 +180,7 @@ import os
 os.environ.setdefault('prometheus_multiproc_dir', str(PROMETHEUS_METRICS['DIRECTORY']))
 
 MIDDLEWARE = [
+    'apps.system.tracing.TracingMiddleware',  # 链路追踪（头部采样，Server-Timing）
     # 'apps.system.middleware.MonitoringMiddleware',  # 临时注释用于调试
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -173,10 +188,14 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'developer.session_registry.SessionActivityMiddleware',  # 登录会话活动时间登记
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'simple_history.middleware.HistoryRequestMiddleware',  # 历史记录中间件
     'api.middleware.APIVersionHeaderMiddleware',  # API版本控制中间件
+    'developer.query_profiler.QueryProfilerMiddleware',  # ORM查询剖析（按需开启）
+    'developer.metric_rollups.APIMetricMiddleware',  # API调用指标分钟汇总
+    'developer.profiler.SamplingProfilerMiddleware',  # 线上采样剖析（开发者控制台开启）
 ]
 
 # CORS配置
@@ -261,6 +280,46 @@ CHANNEL_LAYERS = {
 }
 
 
+# WebSocket消息日志配置
+WEBSOCKET_MESSAGE_LOG = {
+    'MODE': 'all',  # none / errors / sample / all
+    'SAMPLE_RATE': 10,  # sample模式下每N条记录1条
+    'BUFFER_SIZE': 1000,  # 单个连接的缓冲区容量
+    'BATCH_SIZE': 100,  # 达到该数量时立即批量写入
+    'FLUSH_INTERVAL': 2.0,  # 定时写入间隔（秒）
+}
+
+# WebSocket事件分发配置（模型信号在事务提交后由后台线程发布）
+WEBSOCKET_DISPATCH = {
+    'MODE': 'thread',  # thread: 后台线程发布；sync: 提交后同步发布
+    'BATCH_DELAY': 0.05,  # 合并重复事件的等待时间（秒）
+    'ORDER_UPDATE_WINDOW': 0.25,  # 同一订单更新事件的合并窗口（秒）
+    'ORDER_FLUSH_ON_STATUS_CHANGE': True,  # 订单状态变化时立即发送
+}
+
+# WebSocket事件流配置（断线重连补发）
+WEBSOCKET_STREAMS = {
+    'ENABLED': True,
+    'MAXLEN': 1000,  # 每个事件流保留的最大事件数
+    'TTL': 24 * 60 * 60,  # 事件流保留时间（秒）
+    'GROUP_PREFIXES': ('user_', 'alerts_'),
+}
+
+# WebSocket在线状态配置（Redis心跳登记）
+WEBSOCKET_PRESENCE = {
+    'ENABLED': True,
+    'TTL': 90,  # 心跳过期时间（秒）
+    'TOUCH_INTERVAL': 10,  # 最小续期间隔（秒）
+}
+
+# WebSocket帧编码配置（客户端请求 erp.msgpack 子协议时使用 msgpack 二进制帧）
+WEBSOCKET_FRAMING = {
+    'MSGPACK_ENABLED': True,
+    'COMPRESS_THRESHOLD': 1024,  # 超过该字节数的帧使用zlib压缩
+    'CACHE_SIZE': 256,  # 每个worker缓存的已编码事件帧数量
+    'MAX_DECOMPRESSED_SIZE': 1024 * 1024,  # 客户端压缩帧解压后的最大字节数
+}
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
@@ -340,7 +399,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'apps.system.renderers.ORJSONRenderer',
     ),
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.JSONParser',
@@ -376,6 +435,89 @@ CACHES = {
     }
 }
 
+# 全局搜索分面计数配置
+SEARCH_FACETS = {
+    'CACHE_TTL': 60,  # 分面计数缓存时间（秒）
+    'APPROX_THRESHOLD': 1000,  # 超过该数量返回近似计数，如 "1000+"
+    'APPROX_MODE': 'capped',  # capped 或 planner（使用PostgreSQL执行计划估算）
+}
+
+# ORM查询剖析配置（请求头 X-Query-Profile: 1 或开发者控制台调试模式开启）
+QUERY_PROFILER = {
+    'ENABLED': True,
+    'HEADER_ENABLED': False,  # 是否允许通过请求头开启剖析（仅 DEBUG 或管理员/开发者生效）
+    'SAMPLE_RATE': 0.1,  # 调试模式下的采样比例
+    'N_PLUS_ONE_THRESHOLD': 5,  # 同一查询形状重复多少次视为 N+1
+}
+
+# API调用指标汇总配置（统计基于分钟汇总，明细只保留采样）
+API_METRICS = {
+    'ENABLED': True,
+    'FLUSH_INTERVAL': 0 if TESTING else 30,  # 汇总写入间隔（秒），为0时不启动写入线程
+    'RAW_SAMPLE_RATE': 0.01,  # 明细随机采样比例
+    'RAW_SLOW_THRESHOLD': 1000,  # 超过该响应时间（毫秒）的请求总是保留明细
+}
+
+# 系统资源采集配置（后台线程采样，环形缓冲区保存在Redis中）
+SYSTEM_MONITOR = {
+    'ENABLED': True,  # 是否把系统指标采样线程的读数写入环形缓冲区（采样间隔见 PROMETHEUS_METRICS）
+    'BUFFER_SIZE': 240,  # 环形缓冲区长度（按15秒采样间隔保留最近1小时）
+    'PERSIST_INTERVAL': 300,  # 降采样写入SystemMonitor的间隔（秒）
+}
+
+# 线上采样剖析配置（开发者控制台 /api/developer/profiler/ 开启）
+SAMPLING_PROFILER = {
+    'DIRECTORY': BASE_DIR / 'profiles',  # 火焰图和cProfile结果目录
+    'SAMPLE_INTERVAL': 0.01,  # 默认采样间隔（秒）
+    'MAX_SECONDS': 300,  # 单次会话最长时间（秒）
+    'MAX_REQUESTS': 200,  # 单次会话最多剖析的请求数
+}
+
+# 链路追踪配置（采样的请求导出OTLP/JSON并返回Server-Timing头）
+TRACING = {
+    'ENABLED': not TESTING,  # 测试进程中关闭，避免测试请求的span导出到本地文件
+    'SAMPLE_RATE': 0.01,  # 头部采样比例
+    'TRUSTED_UPSTREAMS': ['127.0.0.1', '::1'],  # 跟随其traceparent采样标志的来源（如网关），其他来源限频
+    'EXPORT_FILE': BASE_DIR / 'logs' / 'traces.jsonl',  # 未配置采集器时导出到本地文件
+    'EXPORT_ENDPOINT': None,  # OTLP/HTTP采集器地址，如 http://127.0.0.1:4318/v1/traces
+}
+
+# 查询集自动优化配置（按序列化器字段推导select_related/prefetch_related/only）
+QUERYSET_OPTIMIZER = {
+    'ENABLED': True,
+    'USE_ONLY': True,  # 是否只查询序列化器用到的列
+}
+
+# 稀疏字段集配置（列表/详情接口通过 ?fields= / ?omit= 只返回部分字段）
+SPARSE_FIELDSETS = {
+    'ENABLED': True,
+    'FIELDS_PARAM': 'fields',  # 要返回的字段
+    'OMIT_PARAM': 'omit',  # 要去掉的字段
+}
+
+# 大表游标分页配置（日志、扫码记录、接口指标等列表不执行 COUNT(*)）
+CURSOR_PAGINATION = {
+    'COUNT_MODE': 'capped',  # capped: 只统计到阈值；estimated: pg_class.reltuples/执行计划估算；none: 不返回总数
+    'COUNT_THRESHOLD': 1000,  # capped 模式统计的最大行数
+    'MAX_PAGE_SIZE': 100,  # page_size 参数的上限
+}
+
+# 条件请求配置（基础数据接口返回 ETag/Last-Modified，未变化时返回304）
+CONDITIONAL_GET = {
+    'ENABLED': True,
+    # 维护版本号的模型（保存/删除时递增）
+    'MODELS': [
+        'materials.Material', 'materials.Location', 'materials.Supplier', 'materials.MaterialSupplier',
+        'materials.Contact', 'warehouse.Warehouse', 'supplier.Supplier', 'customer.Customer',
+        'equipment.Equipment',
+    ],
+}
+
+# 编译序列化器配置（列表接口使用 values_list 投影和生成的行转换函数）
+COMPILED_SERIALIZERS = {
+    'ENABLED': True,
+}
+
 # Celery配置
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/2'
 CELERY_RESULT_BACKEND = 'django-db'
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
 application = get_wsgi_application()
+
+# 服务进程中启动系统资源后台采样（管理命令和测试不加载此模块）
+from apps.system.metrics_sampler import install_system_metrics_sampler
+
+install_system_metrics_sampler()
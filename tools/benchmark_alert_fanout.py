@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+系统告警推送基准测试
+对比逐用户 group_send 与单次广播组 group_send 的耗时
+"""
+
+import argparse
+import asyncio
+import time
+
+from channels.layers import InMemoryChannelLayer
+
+
+def create_layer(redis_host=None):
+    """创建通道层，默认使用内存通道层"""
+    if redis_host:
+        from channels_redis.core import RedisChannelLayer
+        host, _, port = redis_host.partition(':')
+        return RedisChannelLayer(hosts=[(host, int(port or 6379))], capacity=10000)
+    return InMemoryChannelLayer(capacity=10000)
+
+
+async def setup_clients(layer, users):
+    """模拟在线用户：每个用户一个通道，同时加入个人组和告警广播组"""
+    channels = []
+    for user_id in range(users):
+        channel = await layer.new_channel()
+        await layer.group_add(f'user_{user_id}', channel)
+        await layer.group_add('alerts_all', channel)
+        channels.append(channel)
+    return channels
+
+
+async def drain(layer, channels):
+    """接收所有通道中的消息，确认每个用户都收到告警"""
+    received = 0
+    for channel in channels:
+        await layer.receive(channel)
+        received += 1
+    return received
+
+
+async def per_user_fanout(layer, users, message):
+    """旧方式：逐个用户发送"""
+    for user_id in range(users):
+        await layer.group_send(f'user_{user_id}', message)
+
+
+async def broadcast_fanout(layer, message):
+    """新方式：向广播组发送一次"""
+    await layer.group_send('alerts_all', message)
+
+
+async def run_benchmark(users, rounds, redis_host=None):
+    layer = create_layer(redis_host)
+    channels = await setup_clients(layer, users)
+    message = {
+        'type': 'alert_message',
+        'data': {'id': 1, 'title': '基准测试告警', 'severity': 'high'}
+    }
+
+    results = {}
+    for name, send in (
+        ('per_user', lambda: per_user_fanout(layer, users, message)),
+        ('broadcast', lambda: broadcast_fanout(layer, message)),
+    ):
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await send()
+            timings.append(time.perf_counter() - start)
+            assert await drain(layer, channels) == users
+        results[name] = timings
+
+    await layer.flush()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='系统告警推送基准测试')
+    parser.add_argument('--users', type=int, default=3000, help='模拟在线用户数')
+    parser.add_argument('--rounds', type=int, default=5, help='每种方式重复次数')
+    parser.add_argument('--redis', help='Redis地址（host:port），不指定时使用内存通道层')
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.users, args.rounds, args.redis))
+
+    print(f"用户数: {args.users}, 重复次数: {args.rounds}, 通道层: {'redis' if args.redis else 'in-memory'}")
+    for name, timings in results.items():
+        avg = sum(timings) / len(timings)
+        print(f"{name:>10}: 平均发送耗时 {avg * 1000:.2f} ms, 最大 {max(timings) * 1000:.2f} ms")
+
+    per_user_avg = sum(results['per_user']) / len(results['per_user'])
+    broadcast_avg = sum(results['broadcast']) / len(results['broadcast'])
+    if broadcast_avg > 0:
+        print(f"广播方式提速: {per_user_avg / broadcast_avg:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+列表序列化基准测试
+对比热点列表接口的两条路径每秒处理的行数：
+    drf:      优化后的查询集 + ModelSerializer(many=True) + JSONRenderer
+    compiled: values_list 投影 + 编译序列化器 + ORJSONRenderer
+
+使用内存 SQLite 数据库，不依赖 MySQL/Redis:
+    python tools/benchmark_serializers.py --rows 5000 --rounds 5
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    """初始化 Django，使用内存数据库和本地缓存"""
+    sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+    from django.conf import settings
+    settings.DATABASES = {
+        'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    }
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def seed(rows):
+    """批量创建库存、条码和扫码记录"""
+    from apps.customer.models import Customer
+    from apps.materials.models import Inventory, Location, Material
+    from apps.production.models import Order
+    from apps.scanning.models import Barcode, ScanningHistory
+    from apps.users.models import User
+    from apps.warehouse.models import Warehouse
+
+    user = User.objects.create_user(username='benchmark', password='benchmark-password')
+    warehouse = Warehouse.objects.create(
+        name='成品仓', address='一号路', contact_person='张三', contact_phone='13800000000', area=100
+    )
+    customer = Customer.objects.create(
+        name='客户', contact_person='李四', contact_phone='13800000001', address='二号路', created_by=user
+    )
+    order = Order.objects.create(
+        order_number='O1', customer=customer, product_name='衬衫', quantity=10,
+        unit_price=10, total_amount=100, delivery_date=date(2024, 1, 1), created_by=user
+    )
+    materials = Material.objects.bulk_create([
+        Material(code=f'M{n}', name=f'面料{n}', category='面料', unit='米', created_by=user)
+        for n in range(rows)
+    ])
+    locations = Location.objects.bulk_create([
+        Location(code=f'L{n}', name=f'库位{n}', warehouse=warehouse, created_by=user)
+        for n in range(rows)
+    ])
+    Inventory.objects.bulk_create([
+        Inventory(material=material, location=location, quantity=n, created_by=user)
+        for n, (material, location) in enumerate(zip(materials, locations))
+    ])
+    barcodes = Barcode.objects.bulk_create([
+        Barcode(
+            barcode_number=f'B{n}', barcode_type='material', material=material,
+            warehouse=warehouse, order=order, created_by=user
+        )
+        for n, material in enumerate(materials)
+    ])
+    ScanningHistory.objects.bulk_create([
+        ScanningHistory(
+            barcode=barcode, operation_type='material_inbound',
+            location_barcode=barcodes[(n + 1) % rows], created_by=user
+        )
+        for n, barcode in enumerate(barcodes)
+    ])
+
+
+def targets():
+    """基准测试的列表接口：(名称, 查询集, 序列化器类)"""
+    from apps.materials.models import Inventory
+    from apps.materials.serializers import InventorySerializer
+    from apps.scanning.models import Barcode, ScanningHistory
+    from apps.scanning.serializers import BarcodeSerializer, ScanningHistorySerializer
+
+    return [
+        ('inventory', Inventory.objects.filter(is_deleted=False), InventorySerializer),
+        ('barcodes', Barcode.objects.filter(is_deleted=False), BarcodeSerializer),
+        ('scan-records', ScanningHistory.objects.all(), ScanningHistorySerializer),
+    ]
+
+
+def measure(func, rounds):
+    """执行多轮，返回最短耗时（秒）和最后一次的输出"""
+    best, output = None, None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        output = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def run_benchmark(rows, rounds):
+    from rest_framework.renderers import JSONRenderer
+
+    from apps.system.compiled_serializers import CompiledSerializer
+    from apps.system.queryset_optimizer import get_plan
+    from apps.system.renderers import ORJSONRenderer
+
+    json_renderer, orjson_renderer = JSONRenderer(), ORJSONRenderer()
+    results = []
+    for name, queryset, serializer_class in targets():
+        optimized = get_plan(serializer_class).apply(queryset, use_only=True)
+        compiled = CompiledSerializer(serializer_class)
+
+        drf_time, _ = measure(
+            lambda: json_renderer.render(serializer_class(list(optimized.all()), many=True).data), rounds
+        )
+        compiled_time, _ = measure(
+            lambda: orjson_renderer.render(compiled.serialize(queryset.all())), rounds
+        )
+        # 只比较序列化，不含查询
+        instances = list(optimized.all())
+        values = list(compiled.prepare(queryset.all()))
+        drf_serialize, drf_data = measure(lambda: serializer_class(instances, many=True).data, rounds)
+        compiled_serialize, compiled_data = measure(lambda: compiled.serialize_rows(values), rounds)
+
+        results.append({
+            'name': name,
+            'drf': rows / drf_time,
+            'compiled': rows / compiled_time,
+            'drf_serialize': rows / drf_serialize,
+            'compiled_serialize': rows / compiled_serialize,
+            'identical': orjson_renderer.render(drf_data) == orjson_renderer.render(compiled_data),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列表序列化基准测试')
+    parser.add_argument('--rows', type=int, default=5000, help='每个接口的行数')
+    parser.add_argument('--rounds', type=int, default=5, help='每种方式重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.rows)
+    results = run_benchmark(args.rows, args.rounds)
+
+    print(f"行数: {args.rows}, 重复次数: {args.rounds}（单位: 行/秒）")
+    print(f"{'接口':<14}{'drf':>12}{'compiled':>12}{'提速':>8}{'仅序列化drf':>14}{'仅序列化compiled':>18}{'输出一致':>10}")
+    for item in results:
+        speedup = item['compiled'] / item['drf'] if item['drf'] else 0
+        print(
+            f"{item['name']:<14}{item['drf']:>12.0f}{item['compiled']:>12.0f}{speedup:>7.1f}x"
+            f"{item['drf_serialize']:>14.0f}{item['compiled_serialize']:>18.0f}{str(item['identical']):>10}"
+        )
+
+
+if __name__ == '__main__':
+    main()
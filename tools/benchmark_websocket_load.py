@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""
+WebSocket推送负载测试工具
+模拟 N 个客户端连接 NotificationConsumer，驱动通知、告警和订单更新的突发推送，
+统计连接速率、推送延迟分位数和每个连接的内存占用，用于评估单个 Daphne/Uvicorn
+worker 能承载的连接数。
+
+两种运行方式：
+1. 进程内（默认）：使用 channels 的 WebsocketCommunicator 和内存通道层，
+   关闭消息日志、事件流和在线状态登记，不需要 Redis 和数据库。
+2. 本地服务器：--url 指定运行中的服务器，通过 --redis 连接同一个 Redis
+   通道层发送事件。
+
+示例:
+    python tools/benchmark_websocket_load.py --clients 500 --events 20
+    python tools/benchmark_websocket_load.py --url ws://127.0.0.1:8000/ws/notifications/ \\
+        --token <jwt> --redis 127.0.0.1:6379 --clients 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 事件类型 -> (通道层消息类型, WebSocket帧类型)
+EVENT_KINDS = {
+    'notification': ('notification_message', 'notification'),
+    'alert': ('alert_message', 'alert'),
+    'order_update': ('order_update', 'order_update'),
+}
+
+
+def setup_django(redis_host=None):
+    """初始化 Django，进程内模式下使用内存通道层并关闭外部依赖"""
+    sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+    from django.conf import settings
+    if redis_host:
+        host, _, port = redis_host.partition(':')
+        settings.CHANNEL_LAYERS = {
+            'default': {
+                'BACKEND': 'channels_redis.core.RedisChannelLayer',
+                'CONFIG': {'hosts': [(host, int(port or 6379))]},
+            },
+        }
+    else:
+        settings.CHANNEL_LAYERS = {
+            'default': {
+                'BACKEND': 'channels.layers.InMemoryChannelLayer',
+                'CONFIG': {'capacity': 10000},
+            },
+        }
+        settings.WEBSOCKET_MESSAGE_LOG = {'MODE': 'none'}
+        settings.WEBSOCKET_STREAMS = {'ENABLED': False}
+        settings.WEBSOCKET_PRESENCE = {'ENABLED': False}
+    import django
+    django.setup()
+
+
+def percentile(values, pct):
+    """计算分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+class InProcessClients:
+    """使用 WebsocketCommunicator 的进程内客户端"""
+
+    def __init__(self, clients):
+        from channels.testing import WebsocketCommunicator
+        from apps.websocket.consumers import NotificationConsumer
+
+        class BenchmarkConsumer(NotificationConsumer):
+            """不写数据库的消费者，只测量连接和推送开销"""
+
+            async def save_websocket_session_summary(self):
+                pass
+
+        self.application = BenchmarkConsumer.as_asgi()
+        self.communicator_class = WebsocketCommunicator
+        self.count = clients
+        self.communicators = []
+        self.clock = time.perf_counter
+
+    def user_ids(self):
+        return list(range(1, self.count + 1))
+
+    async def connect(self):
+        for user_id in self.user_ids():
+            communicator = self.communicator_class(self.application, '/ws/notifications/')
+            communicator.scope['user'] = SimpleNamespace(
+                id=user_id, username=f'bench_{user_id}', role='staff',
+                is_authenticated=True, is_active=True, is_staff=False, is_superuser=False
+            )
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise RuntimeError(f'客户端 {user_id} 连接失败')
+            await communicator.receive_json_from()  # connection_established
+            self.communicators.append(communicator)
+
+    async def receive(self, index, timeout):
+        return await self.communicators[index].receive_json_from(timeout=timeout)
+
+    async def close(self):
+        for communicator in self.communicators:
+            await communicator.disconnect()
+
+
+class ServerClients:
+    """连接本地服务器的真实 WebSocket 客户端"""
+
+    def __init__(self, clients, url, token, user_id):
+        self.count = clients
+        self.url = f'{url}?token={token}' if token else url
+        self.user = user_id
+        self.connections = []
+        # 跨进程测量延迟使用墙钟时间
+        self.clock = time.time
+
+    def user_ids(self):
+        # 所有客户端使用同一个令牌，属于同一个用户组
+        return [self.user]
+
+    async def connect(self):
+        import websockets
+        for _ in range(self.count):
+            connection = await websockets.connect(self.url)
+            json.loads(await connection.recv())  # connection_established
+            self.connections.append(connection)
+
+    async def receive(self, index, timeout):
+        return json.loads(await asyncio.wait_for(self.connections[index].recv(), timeout))
+
+    async def close(self):
+        for connection in self.connections:
+            await connection.close()
+
+
+async def drive_burst(clients, kind, events):
+    """向所有客户端推送一组事件，返回每条消息的投递延迟（秒）"""
+    from channels.layers import get_channel_layer
+    from apps.websocket.groups import ALERTS_ALL_GROUP, user_group
+
+    layer = get_channel_layer()
+    message_type, frame_type = EVENT_KINDS[kind]
+    latencies = []
+
+    async def collect(index):
+        received = 0
+        while received < events:
+            frame = await clients.receive(index, timeout=30)
+            if frame.get('type') != frame_type:
+                continue
+            latencies.append(clients.clock() - frame['data']['sent_at'])
+            received += 1
+
+    receivers = [asyncio.ensure_future(collect(index)) for index in range(clients.count)]
+    for n in range(events):
+        data = {'id': n, 'title': f'负载测试 {kind} {n}', 'status': 'processing', 'sent_at': clients.clock()}
+        message = {'type': message_type, 'data': data}
+        if kind == 'alert':
+            await layer.group_send(ALERTS_ALL_GROUP, message)
+        else:
+            for user_id in clients.user_ids():
+                await layer.group_send(user_group(user_id), message)
+    await asyncio.gather(*receivers)
+    return latencies
+
+
+async def run(args):
+    if args.url:
+        clients = ServerClients(args.clients, args.url, args.token, args.user_id)
+    else:
+        clients = InProcessClients(args.clients)
+
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    await clients.connect()
+    connect_time = time.perf_counter() - start
+    memory_after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    report = {
+        'clients': args.clients,
+        'mode': 'server' if args.url else 'in-process',
+        'connect_seconds': round(connect_time, 3),
+        'connect_rate': round(args.clients / connect_time, 1) if connect_time else None,
+        'memory_per_connection_kb': round((memory_after - memory_before) / args.clients / 1024, 2),
+        'bursts': {},
+    }
+
+    for kind in args.kinds:
+        start = time.perf_counter()
+        latencies = await drive_burst(clients, kind, args.events)
+        elapsed = time.perf_counter() - start
+        report['bursts'][kind] = {
+            'delivered': len(latencies),
+            'seconds': round(elapsed, 3),
+            'messages_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 2),
+                'p95': round(percentile(latencies, 95) * 1000, 2),
+                'p99': round(percentile(latencies, 99) * 1000, 2),
+                'max': round(max(latencies) * 1000, 2) if latencies else 0,
+                'mean': round(statistics.mean(latencies) * 1000, 2) if latencies else 0,
+            },
+        }
+
+    await clients.close()
+    return report
+
+
+def print_report(report):
+    print(f"模式: {report['mode']}, 客户端数: {report['clients']}")
+    print(f"连接耗时: {report['connect_seconds']}s, 连接速率: {report['connect_rate']} 个/秒")
+    print(f"每连接内存（Python堆）: {report['memory_per_connection_kb']} KB")
+    for kind, burst in report['bursts'].items():
+        latency = burst['latency_ms']
+        print(
+            f"{kind:>13}: 投递 {burst['delivered']} 条, {burst['messages_per_second']} 条/秒, "
+            f"延迟 p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms max={latency['max']}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebSocket推送负载测试工具')
+    parser.add_argument('--clients', type=int, default=100, help='模拟客户端数')
+    parser.add_argument('--events', type=int, default=10, help='每种事件推送次数')
+    parser.add_argument('--kinds', nargs='+', choices=list(EVENT_KINDS), default=list(EVENT_KINDS),
+                        help='推送的事件类型')
+    parser.add_argument('--url', help='本地服务器WebSocket地址，不指定时使用进程内模式')
+    parser.add_argument('--token', help='服务器模式下的JWT令牌')
+    parser.add_argument('--user-id', type=int, help='服务器模式下令牌对应的用户ID')
+    parser.add_argument('--redis', help='服务器模式下通道层使用的Redis地址（host:port）')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+    args = parser.parse_args()
+
+    if args.url and (not args.redis or args.user_id is None):
+        parser.error('服务器模式需要同时指定 --redis 和 --user-id')
+
+    setup_django(args.redis if args.url else None)
+    report = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
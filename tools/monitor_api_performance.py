@@ -2,6 +2,21 @@
 """
 API性能监控工具
 用于监控API端点的响应时间和错误率，并生成性能报告
+
+回归检测模式（--gate）：
+按端点套件（tools/api_performance_suite.json）并发压测，先预热再执行固定次数的请求，
+计算 p50/p95/p99 及其 bootstrap 置信区间，与基线 JSON 比较，
+出现统计显著的变慢时以非零状态退出，可直接作为 CI 的性能门禁。
+--local 在临时 SQLite 数据库上迁移并填充测试数据后启动本地服务器，不依赖外部环境。
+
+示例:
+    # 在本地服务器上生成基线
+    python tools/monitor_api_performance.py --gate --local --save-baseline perf_baseline.json
+    # 与基线比较，p95/p99 显著变慢超过10%时退出码为1
+    python tools/monitor_api_performance.py --gate --local --baseline perf_baseline.json
+    # 对运行中的服务器执行
+    python tools/monitor_api_performance.py --gate --url http://127.0.0.1:8000 --token <jwt> \\
+        --baseline perf_baseline.json
 """
 
 import requests
@@ -11,6 +26,11 @@ import argparse
 import sys
 import csv
 import os
+import socket
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from tabulate import tabulate
 import matplotlib.pyplot as plt
@@ -381,6 +401,421 @@ class APIPerformanceMonitor:
         
         print(f"性能图表已生成到目录: {charts_dir}")
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SUITE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_performance_suite.json')
+
+# 参与比较的分位数
+PERCENTILES = (50, 95, 99)
+
+# 退出码
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_ERRORS = 2
+
+SUCCESS_STATUS = (200, 201, 204)
+
+# --local 模式使用的配置：在项目配置基础上替换数据库、缓存和通道层，关闭后台采集
+LOCAL_SETTINGS_TEMPLATE = """from project.settings import *  # noqa
+
+DATABASES = {{
+    'default': {{
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': {database!r},
+    }}
+}}
+CACHES = {{
+    'default': {{'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+}}
+CHANNEL_LAYERS = {{
+    'default': {{'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+}}
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+SESSION_REGISTRY = {{'ENABLED': False}}
+SYSTEM_MONITOR = {{'ENABLED': False}}
+PROMETHEUS_METRICS = dict(PROMETHEUS_METRICS, SYSTEM_SAMPLER_ENABLED=False)
+TRACING = {{'ENABLED': False}}
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+"""
+
+
+def load_suite(path=None):
+    """
+    读取端点套件
+
+    套件格式:
+        {
+            "warmup": 20, "iterations": 200, "concurrency": 8,
+            "endpoints": [{"name": "物料列表", "method": "GET", "path": "/api/materials/materials/",
+                           "params": {...}, "data": {...}}]
+        }
+    """
+    with open(path or DEFAULT_SUITE_FILE, encoding='utf-8') as f:
+        suite = json.load(f)
+    names = set()
+    for endpoint in suite.get('endpoints', []):
+        if 'name' not in endpoint or 'path' not in endpoint:
+            raise ValueError(f"端点缺少 name 或 path: {endpoint}")
+        if endpoint['name'] in names:
+            raise ValueError(f"端点名称重复: {endpoint['name']}")
+        names.add(endpoint['name'])
+        endpoint['method'] = endpoint.get('method', 'GET').upper()
+    if not names:
+        raise ValueError('端点套件为空')
+    return suite
+
+
+def bootstrap_percentile(samples, pct, confidence=0.95, resamples=2000, seed=0):
+    """
+    计算分位数及其 bootstrap 置信区间（百分位法）
+
+    Returns:
+        (分位数, 区间下限, 区间上限)
+    """
+    values = np.asarray(samples, dtype=float)
+    if values.size == 0:
+        return None, None, None
+    point = float(np.percentile(values, pct))
+    if values.size == 1:
+        return point, point, point
+    rng = np.random.default_rng(seed)
+    estimates = np.empty(resamples)
+    # 分块重采样，控制内存占用
+    chunk = max(1, 1000000 // values.size)
+    for start in range(0, resamples, chunk):
+        size = min(chunk, resamples - start)
+        indexes = rng.integers(0, values.size, size=(size, values.size))
+        estimates[start:start + size] = np.percentile(values[indexes], pct, axis=1)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(estimates, [alpha, 1 - alpha])
+    return point, float(low), float(high)
+
+
+def summarize_latencies(samples, errors, confidence=0.95, resamples=2000):
+    """汇总一个端点的响应时间样本"""
+    total = len(samples) + errors
+    summary = {
+        'count': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / total * 100, 2) if total else 0.0,
+        'mean': round(float(np.mean(samples)), 3) if samples else None,
+    }
+    for pct in PERCENTILES:
+        value, low, high = bootstrap_percentile(samples, pct, confidence, resamples)
+        summary[f'p{pct}'] = {
+            'value': round(value, 3) if value is not None else None,
+            'low': round(low, 3) if low is not None else None,
+            'high': round(high, 3) if high is not None else None,
+        }
+    return summary
+
+
+def compare_to_baseline(current, baseline, threshold=0.1, percentiles=(95, 99)):
+    """
+    与基线比较
+
+    某个分位数同时满足以下条件时判定为变慢：
+    1. 本次置信区间下限高于基线置信区间上限（区间不重叠，差异统计显著）；
+    2. 本次分位数比基线高出 threshold 以上（差异有实际意义）。
+    反过来的情况记为变快。
+
+    Returns:
+        比较结果列表，每项包含 endpoint、metric、baseline、current、change、status
+    """
+    rows = []
+    for name, stats in current['endpoints'].items():
+        base = baseline.get('endpoints', {}).get(name)
+        for pct in percentiles:
+            metric = f'p{pct}'
+            now = stats.get(metric) or {}
+            if base is None or not (base.get(metric) or {}).get('value') or now.get('value') is None:
+                rows.append({'endpoint': name, 'metric': metric, 'baseline': None,
+                             'current': now.get('value'), 'change': None, 'status': 'new'})
+                continue
+            before = base[metric]
+            change = now['value'] / before['value'] - 1
+            if now['low'] > before['high'] and change > threshold:
+                status = 'regression'
+            elif now['high'] < before['low'] and change < -threshold:
+                status = 'improvement'
+            else:
+                status = 'ok'
+            rows.append({'endpoint': name, 'metric': metric, 'baseline': before['value'],
+                         'current': now['value'], 'change': round(change * 100, 1), 'status': status})
+    return rows
+
+
+class RegressionGate:
+    """API性能回归检测"""
+
+    def __init__(self, base_url, suite, token=None, concurrency=None, warmup=None, iterations=None,
+                 confidence=0.95, resamples=2000, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.suite = suite
+        self.token = token
+        self.concurrency = concurrency or suite.get('concurrency', 8)
+        self.warmup = warmup if warmup is not None else suite.get('warmup', 20)
+        self.iterations = iterations or suite.get('iterations', 200)
+        self.confidence = confidence
+        self.resamples = resamples
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get_session(self):
+        """每个线程使用独立的 requests.Session（连接复用且线程安全）"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            if self.token:
+                session.headers['Authorization'] = f'Bearer {self.token}'
+            self._local.session = session
+        return session
+
+    def request(self, endpoint):
+        """
+        发送一次请求
+
+        Returns:
+            (响应时间毫秒, 错误信息)，成功时错误信息为 None
+        """
+        start = time.perf_counter()
+        try:
+            response = self.get_session().request(
+                endpoint['method'],
+                f"{self.base_url}{endpoint['path']}",
+                params=endpoint.get('params'),
+                json=endpoint.get('data'),
+                timeout=self.timeout,
+            )
+            # 读取完整响应体，计入序列化和传输时间
+            response.content
+        except requests.exceptions.RequestException as e:
+            return None, type(e).__name__
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code not in SUCCESS_STATUS:
+            return elapsed, f'HTTP {response.status_code}'
+        return elapsed, None
+
+    def run_endpoint(self, executor, endpoint):
+        """预热后并发执行固定次数的请求，端点之间串行，避免相互干扰"""
+        if self.warmup:
+            list(executor.map(lambda _: self.request(endpoint), range(self.warmup)))
+        results = list(executor.map(lambda _: self.request(endpoint), range(self.iterations)))
+        samples = [elapsed for elapsed, error in results if error is None]
+        errors = [error for _, error in results if error is not None]
+        summary = summarize_latencies(samples, len(errors), self.confidence, self.resamples)
+        if errors:
+            summary['error_types'] = sorted(set(errors))
+        return summary
+
+    def run(self):
+        """执行整个套件"""
+        print(f"开始回归检测 - 目标: {self.base_url}")
+        print(f"端点数量: {len(self.suite['endpoints'])}, 并发数: {self.concurrency}, "
+              f"预热: {self.warmup}, 迭代: {self.iterations}")
+        report = {
+            'generated_at': datetime.now().isoformat(),
+            'base_url': self.base_url,
+            'concurrency': self.concurrency,
+            'warmup': self.warmup,
+            'iterations': self.iterations,
+            'confidence': self.confidence,
+            'endpoints': {},
+        }
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for endpoint in self.suite['endpoints']:
+                summary = self.run_endpoint(executor, endpoint)
+                summary['method'] = endpoint['method']
+                summary['path'] = endpoint['path']
+                report['endpoints'][endpoint['name']] = summary
+                p95 = summary['p95']['value']
+                print(f"{endpoint['name']} ({endpoint['method']} {endpoint['path']}): "
+                      f"p50={summary['p50']['value']}ms p95={p95}ms p99={summary['p99']['value']}ms "
+                      f"错误率={summary['error_rate']}%")
+        return report
+
+
+def print_comparison(rows):
+    """打印与基线的比较结果"""
+    labels = {'regression': '变慢', 'improvement': '变快', 'ok': '持平', 'new': '无基线'}
+    table_data = [
+        [
+            row['endpoint'], row['metric'],
+            f"{row['baseline']:.2f}ms" if row['baseline'] is not None else 'N/A',
+            f"{row['current']:.2f}ms" if row['current'] is not None else 'N/A',
+            f"{row['change']:+.1f}%" if row['change'] is not None else 'N/A',
+            labels[row['status']],
+        ]
+        for row in rows
+    ]
+    print(tabulate(table_data, headers=['端点', '指标', '基线', '本次', '变化', '结论'], tablefmt='grid'))
+
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed_database(rows):
+    """
+    填充测试数据（在 --local 创建的数据库中执行）
+
+    Returns:
+        测试用户的访问令牌
+    """
+    sys.path.insert(0, BASE_DIR)
+    import django
+    django.setup()
+    from django.contrib.auth import get_user_model
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from apps.users.models import User
+    from apps.materials.models import Material, Supplier
+    from apps.notification.models import Notification
+
+    # 认证使用 AUTH_USER_MODEL，业务表的 created_by 指向 apps.users.User，两边各建一个同名用户
+    auth_user = get_user_model().objects.filter(username='perf').first()
+    if auth_user is None:
+        auth_user = get_user_model().objects.create_superuser(
+            username='perf', password='perf-password', email='perf@example.com'
+        )
+    user = User.objects.filter(username='perf').first()
+    if user is None:
+        user = User.objects.create_superuser(username='perf', password='perf-password', email='perf@example.com')
+    if not Material.objects.exists():
+        categories = ['面料', '辅料', '包装']
+        Material.objects.bulk_create([
+            Material(
+                code=f'M{i:06d}', name=f'{categories[i % 3]}{i}', category=categories[i % 3],
+                unit='米', unit_price=i % 100, created_by=user,
+            )
+            for i in range(rows)
+        ])
+        Supplier.objects.bulk_create([
+            Supplier(
+                code=f'S{i:05d}', name=f'供应商{i}', contact_person=f'联系人{i}',
+                contact_phone='13800000000', address='测试地址', created_by=user,
+            )
+            for i in range(max(rows // 10, 1))
+        ])
+        Notification.objects.bulk_create([
+            Notification(title=f'通知{i}', content='性能测试通知', user=auth_user, is_read=i % 2 == 0)
+            for i in range(rows)
+        ])
+    return str(RefreshToken.for_user(auth_user).access_token)
+
+
+class LocalServer:
+    """在临时 SQLite 数据库上启动本地服务器"""
+
+    def __init__(self, rows=1000, workdir=None, port=None):
+        self.rows = rows
+        self.workdir = workdir or tempfile.mkdtemp(prefix='api_perf_')
+        self.port = port or find_free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        self.token = None
+        self.process = None
+        os.makedirs(self.workdir, exist_ok=True)
+        with open(os.path.join(self.workdir, 'perf_settings.py'), 'w') as f:
+            f.write(LOCAL_SETTINGS_TEMPLATE.format(database=os.path.join(self.workdir, 'db.sqlite3')))
+        self.env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='perf_settings',
+            PYTHONPATH=os.pathsep.join(filter(None, [self.workdir, BASE_DIR, os.environ.get('PYTHONPATH')])),
+            prometheus_multiproc_dir=os.path.join(self.workdir, 'prometheus'),
+        )
+        os.makedirs(self.env['prometheus_multiproc_dir'], exist_ok=True)
+
+    def manage(self, *args):
+        subprocess.run([sys.executable, os.path.join(BASE_DIR, 'manage.py'), *args],
+                       env=self.env, cwd=BASE_DIR, check=True, stdout=subprocess.DEVNULL)
+
+    def __enter__(self):
+        print(f"准备本地数据库: {self.workdir}")
+        self.manage('migrate', '--run-syncdb', '--noinput')
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--seed', str(self.rows)],
+            env=self.env, cwd=BASE_DIR, check=True, stdout=subprocess.PIPE, text=True,
+        ).stdout
+        self.token = output.strip().splitlines()[-1]
+
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(BASE_DIR, 'manage.py'), 'runserver', '--noreload',
+             f'127.0.0.1:{self.port}'],
+            env=self.env, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'本地服务器启动失败，退出码 {self.process.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                print(f"本地服务器已启动: {self.base_url}")
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError('等待本地服务器启动超时')
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def run_gate(args):
+    """执行回归检测，返回退出码"""
+    suite = load_suite(args.suite)
+
+    def execute(base_url, token):
+        gate = RegressionGate(
+            base_url, suite, token=token, concurrency=args.concurrency, warmup=args.warmup,
+            iterations=args.iterations, confidence=args.confidence, resamples=args.resamples,
+        )
+        return gate.run()
+
+    if args.local:
+        with LocalServer(rows=args.seed_rows, workdir=args.local_dir) as server:
+            report = execute(server.base_url, server.token)
+    else:
+        report = execute(args.url, args.token)
+
+    os.makedirs(args.output, exist_ok=True)
+    report_file = os.path.join(args.output, f"api_regression_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n检测结果已保存: {report_file}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存: {args.save_baseline}")
+
+    exit_code = EXIT_OK
+    failing = [name for name, stats in report['endpoints'].items() if stats['error_rate'] > args.max_error_rate]
+    if failing:
+        print(f"\n错误率超过 {args.max_error_rate}% 的端点: {', '.join(failing)}")
+        exit_code = EXIT_ERRORS
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare_to_baseline(report, baseline, args.threshold)
+        print()
+        print_comparison(rows)
+        regressions = [row for row in rows if row['status'] == 'regression']
+        if regressions:
+            print(f"\n发现 {len(regressions)} 项显著变慢（阈值 {args.threshold * 100:.0f}%，"
+                  f"置信度 {args.confidence * 100:.0f}%）")
+            exit_code = exit_code or EXIT_REGRESSION
+        else:
+            print("\n未发现显著变慢")
+    return exit_code
+
+
 def main():
     parser = argparse.ArgumentParser(description='API性能监控工具')
     parser.add_argument('--url', default='https://yagtpotihswf.sealosbja.site', help='API基础URL')
@@ -388,9 +823,33 @@ def main():
     parser.add_argument('--interval', type=int, default=60, help='监控间隔（秒）')
     parser.add_argument('--duration', type=int, default=3600, help='监控持续时间（秒）')
     parser.add_argument('--output', default='./api_performance', help='输出目录')
-    
+    # 回归检测
+    parser.add_argument('--gate', action='store_true', help='执行性能回归检测')
+    parser.add_argument('--suite', help='端点套件JSON文件，默认 tools/api_performance_suite.json')
+    parser.add_argument('--concurrency', type=int, help='并发数（覆盖套件配置）')
+    parser.add_argument('--warmup', type=int, help='每个端点的预热请求数（覆盖套件配置）')
+    parser.add_argument('--iterations', type=int, help='每个端点的计时请求数（覆盖套件配置）')
+    parser.add_argument('--confidence', type=float, default=0.95, help='置信水平')
+    parser.add_argument('--resamples', type=int, default=2000, help='bootstrap 重采样次数')
+    parser.add_argument('--baseline', help='用于比较的基线JSON文件')
+    parser.add_argument('--save-baseline', help='把本次结果保存为基线')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定变慢的最小相对变化（0.1 表示10%%）')
+    parser.add_argument('--max-error-rate', type=float, default=1.0, help='允许的最大错误率（%%）')
+    parser.add_argument('--local', action='store_true', help='在临时SQLite数据库上启动本地服务器')
+    parser.add_argument('--local-dir', help='本地数据库和配置目录，默认创建临时目录')
+    parser.add_argument('--seed-rows', type=int, default=1000, help='本地数据库填充的物料和通知数量')
+    parser.add_argument('--seed', type=int, metavar='ROWS', help=argparse.SUPPRESS)
+
     args = parser.parse_args()
-    
+
+    if args.seed is not None:
+        # 由 LocalServer 在子进程中调用，最后一行输出访问令牌
+        print(seed_database(args.seed))
+        return
+
+    if args.gate:
+        sys.exit(run_gate(args))
+
     monitor = APIPerformanceMonitor(
         args.url, 
         args.token, 